@@ -0,0 +1,46 @@
+"""Benchmark the time it takes to import GIMKit in a fresh interpreter.
+
+`import gimkit` should stay cheap, as the model backends (outlines, openai and
+llguidance) are only imported when first used. Pass a budget in milliseconds to fail
+when the median import time of the core package exceeds it, e.g. in CI.
+
+Run with: `uv run python benchmarks/bench_import_time.py [budget_ms]`
+"""
+
+import statistics
+import subprocess
+import sys
+
+
+REPEAT = 7
+STATEMENTS = {
+    "python": "pass",
+    "gimkit": "import gimkit",
+    "gimkit.models": "import gimkit.models; gimkit.models.from_openai",
+}
+
+
+def measure_ms(statement: str) -> float:
+    code = (
+        "import time\n"
+        "start = time.perf_counter()\n"
+        f"{statement}\n"
+        "print((time.perf_counter() - start) * 1e3)\n"
+    )
+    times = [
+        float(subprocess.run([sys.executable, "-c", code], check=True, capture_output=True).stdout)
+        for _ in range(REPEAT)
+    ]
+    return statistics.median(times)
+
+
+def main() -> None:
+    results = {name: measure_ms(statement) for name, statement in STATEMENTS.items()}
+    print("  ".join(f"{name}={ms:7.1f}ms" for name, ms in results.items()))
+
+    if len(sys.argv) > 1 and results["gimkit"] > float(sys.argv[1]):
+        sys.exit(f"`import gimkit` took {results['gimkit']:.1f}ms, over {sys.argv[1]}ms budget.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Benchmark MaskedTag memory footprint and construction cost.
+
+Compares the slotted `MaskedTag` with an equivalent dict-backed dataclass, and the
+validating constructor with the trusted path used when copying tags of a `Query`.
+
+Run with: `uv run python benchmarks/bench_masked_tag.py`
+"""
+
+import timeit
+import tracemalloc
+
+from dataclasses import dataclass
+from typing import Any
+
+from gimkit.schemas import MaskedTag
+
+
+@dataclass
+class DictMaskedTag:
+    """A dict-backed stand-in with the same fields as MaskedTag."""
+
+    id: int | str | None = None
+    name: str | None = None
+    desc: str | None = None
+    regex: str | None = None
+    content: str | None = None
+
+
+NUM_TAGS = 100_000
+FIELDS: dict[str, Any] = {"id": 3, "name": "city", "desc": "A city name", "regex": r"[A-Z][a-z]+"}
+
+
+def measure_bytes_per_tag(factory) -> float:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tags = [factory(content=f"c{i}") for i in range(NUM_TAGS)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    # Subtract the content strings and the list itself, which both variants share.
+    shared = sum(len(tag.content) + 49 + 8 for tag in tags)
+    return (allocated - shared) / NUM_TAGS
+
+
+def main() -> None:
+    slotted = measure_bytes_per_tag(lambda content: MaskedTag(**FIELDS, content=content))
+    dict_backed = measure_bytes_per_tag(lambda content: DictMaskedTag(**FIELDS, content=content))
+    print(f"memory/tag:  dict-backed={dict_backed:6.1f}B  slotted={slotted:6.1f}B")
+
+    tag = MaskedTag(**FIELDS, content="Paris")
+    number = 200_000
+    validated = min(
+        timeit.repeat(lambda: MaskedTag(**FIELDS, content="Paris"), number=number, repeat=3)
+    )
+    trusted = min(
+        timeit.repeat(
+            lambda: MaskedTag._trusted(tag.id, tag.name, tag.desc, tag.regex, "Paris"),
+            number=number,
+            repeat=3,
+        )
+    )
+    print(
+        f"construction: validated={validated / number * 1e6:6.2f}us  "
+        f"trusted={trusted / number * 1e6:6.2f}us  speedup={validated / trusted:5.2f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark `schemas.parse_parts` against the previous three-pass regex implementation.
+
+Run with: `uv run python benchmarks/bench_parse_parts.py`
+"""
+
+import timeit
+
+from functools import partial
+
+from gimkit.exceptions import InvalidFormatError
+from gimkit.guides import guide as g
+from gimkit.schemas import (
+    TAG_END_PATTERN,
+    TAG_FULL_PATTERN,
+    TAG_OPEN_PATTERN,
+    ContextPart,
+    MaskedTag,
+    parse_parts,
+)
+
+
+def regex_parse_parts(s: str) -> list[ContextPart]:
+    """The previous implementation, which runs three full `finditer` passes."""
+    open_matches = list(TAG_OPEN_PATTERN.finditer(s))
+    end_matches = list(TAG_END_PATTERN.finditer(s))
+    full_matches = list(TAG_FULL_PATTERN.finditer(s))
+    if not (len(open_matches) == len(end_matches) == len(full_matches)):
+        raise InvalidFormatError(f"Mismatched or nested masked tags in {s}")
+
+    parts: list[ContextPart] = []
+    last_end = 0
+    for match in full_matches:
+        start, end = match.span()
+        if start > last_end:
+            parts.append(s[last_end:start])
+        parts.append(MaskedTag(**match.groupdict()))
+        last_end = end
+    if last_end < len(s):
+        parts.append(s[last_end:])
+    return parts
+
+
+def build_document(num_tags: int, text_len: int) -> str:
+    filler = ("lorem ipsum dolor sit amet " * (text_len // 27 + 1))[:text_len]
+    return "".join(
+        filler + str(g(name=f"t{i}", desc="a word", regex=r"\w+")) for i in range(num_tags)
+    )
+
+
+def main() -> None:
+    for num_tags, text_len in [(10, 100), (1_000, 1_000), (100, 50_000), (5_000, 500)]:
+        doc = build_document(num_tags, text_len)
+        assert regex_parse_parts(doc) == parse_parts(doc)
+        number = max(1, 2_000_000 // len(doc))
+        old = min(timeit.repeat(partial(regex_parse_parts, doc), number=number, repeat=3))
+        new = min(timeit.repeat(partial(parse_parts, doc), number=number, repeat=3))
+        print(
+            f"tags={num_tags:>5} size={len(doc) / 1e6:6.2f}MB  "
+            f"regex={old / number * 1e3:8.3f}ms  scanner={new / number * 1e3:8.3f}ms  "
+            f"speedup={old / new:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
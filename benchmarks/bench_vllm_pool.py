@@ -0,0 +1,65 @@
+"""Benchmark the throughput of `from_vllm_pool` as endpoints are added.
+
+Each endpoint is a local stub that serves one request at a time with a fixed latency,
+like a saturated server, so the throughput should grow linearly with the number of
+endpoints while the requests stay evenly spread.
+
+Run with: `uv run python benchmarks/bench_vllm_pool.py`
+"""
+
+import asyncio
+import time
+
+from typing import Any
+from unittest.mock import MagicMock
+
+from openai import AsyncOpenAI
+
+from gimkit.guides import guide
+from gimkit.models.vllm_pool import from_vllm_pool
+
+
+LATENCY = 0.005
+NUM_CALLS = 256
+RESPONSE = '<|GIM_RESPONSE|><|MASKED id="m_0"|>world<|/MASKED|><|/GIM_RESPONSE|>'
+
+
+def make_stub_client(name: str) -> AsyncOpenAI:
+    client = AsyncOpenAI(api_key="stub", base_url=f"http://{name}/v1")
+    lock = asyncio.Lock()
+
+    async def create(**kwargs: Any) -> Any:
+        async with lock:
+            await asyncio.sleep(LATENCY)
+        response = MagicMock()
+        response.choices = [MagicMock()]
+        response.choices[0].message.content = RESPONSE
+        response.choices[0].message.refusal = None
+        return response
+
+    client.chat.completions.create = create  # type: ignore[method-assign]
+    return client
+
+
+async def run(num_endpoints: int) -> None:
+    pool = from_vllm_pool([make_stub_client(f"s{i}") for i in range(num_endpoints)])
+    start = time.perf_counter()
+    async for item in pool.amap(["Hello, " + guide()] * NUM_CALLS, concurrency=64):
+        if not item.ok:
+            raise RuntimeError("Stub call failed") from item.error
+    elapsed = time.perf_counter() - start
+    requests = [stats.requests for stats in pool.stats()]
+    print(
+        f"from_vllm_pool: endpoints={num_endpoints:2d}  "
+        f"throughput={NUM_CALLS / elapsed:8.1f} calls/s  "
+        f"requests/endpoint={min(requests)}-{max(requests)}"
+    )
+
+
+def main() -> None:
+    for num_endpoints in (1, 2, 4, 8):
+        asyncio.run(run(num_endpoints))
+
+
+if __name__ == "__main__":
+    main()
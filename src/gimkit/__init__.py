@@ -1,18 +1,37 @@
-from importlib.metadata import PackageNotFoundError, version
+from typing import TYPE_CHECKING, Any
 
 from gimkit.guides import guide
-from gimkit.models import from_openai, from_vllm, from_vllm_offline
 
 
-try:
-    __version__ = version("gimkit")
-except PackageNotFoundError:  # pragma: no cover
-    __version__ = "unknown"
+if TYPE_CHECKING:
+    from gimkit.models import from_openai, from_vllm, from_vllm_offline, from_vllm_pool
+
+    __version__: str
 
 
 __all__ = [
     "from_openai",
     "from_vllm",
     "from_vllm_offline",
+    "from_vllm_pool",
     "guide",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    # Model backends pull in outlines and the openai SDK, and reading the package metadata
+    # is slow too, so both only happen on first use to keep `import gimkit` cheap.
+    if name == "__version__":
+        from importlib.metadata import PackageNotFoundError, version
+
+        try:
+            __version__ = version("gimkit")
+        except PackageNotFoundError:  # pragma: no cover
+            __version__ = "unknown"
+        globals()["__version__"] = __version__
+        return __version__
+    if name in ("from_openai", "from_vllm", "from_vllm_offline", "from_vllm_pool"):
+        from gimkit import models
+
+        return getattr(models, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,311 @@
+"""Bounded caches shared across GIMKit.
+
+`LRUCache` is a small thread-safe least-recently-used mapping with hit/miss counters,
+used to memoize compiled regexes, grammars and other per-structure artifacts.
+`DiskCache` persists text values in a directory so they survive process restarts, and
+`ResponseCache` stores raw model responses with expiry and optional SQLite persistence."""
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from pathlib import Path
+from typing import Any, Generic, NamedTuple, TypeVar
+
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class CacheInfo(NamedTuple):
+    """Statistics of a cache, mirroring `functools.lru_cache().cache_info()`.
+
+    A `maxsize` of None means the cache is unbounded.
+    """
+
+    hits: int
+    misses: int
+    maxsize: int | None
+    currsize: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class LRUCache(Generic[K, V]):
+    """A thread-safe mapping that evicts the least recently used entry once full.
+
+    None is used to signal a miss, so it should not be stored as a value. Inspect a
+    cache with `cache.info()`, resize it with `cache.maxsize = n` and empty it with
+    `cache.clear()`.
+
+    Args:
+        maxsize (int): The maximum number of entries. A size of 0 disables caching.
+    """
+
+    def __init__(self, maxsize: int = 128) -> None:
+        if maxsize < 0:
+            raise ValueError(f"maxsize should be a non-negative integer, got {maxsize}.")
+        self._maxsize = maxsize
+        self._data: OrderedDict[K, V] = OrderedDict()
+        self._lock = threading.RLock()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def maxsize(self) -> int:
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, maxsize: int) -> None:
+        if maxsize < 0:
+            raise ValueError(f"maxsize should be a non-negative integer, got {maxsize}.")
+        with self._lock:
+            self._maxsize = maxsize
+            self._evict()
+
+    def get(self, key: K) -> V | None:
+        """Return the cached value for `key` (marking it as recently used), or None."""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self._misses += 1
+                return None
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: K, value: V) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self._evict()
+
+    def get_or_create(self, key: K, factory: Callable[[], V]) -> V:
+        """Return the cached value for `key`, creating and caching it with `factory` on a miss.
+
+        The factory runs outside the lock, so concurrent misses on the same key may each
+        call it; exceptions raised by the factory are propagated and nothing is cached.
+        """
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.put(key, value)
+        return value
+
+    def pop(self, key: K) -> V | None:
+        with self._lock:
+            return self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all entries and reset the hit/miss counters."""
+        with self._lock:
+            self._data.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._maxsize, len(self._data))
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _evict(self) -> None:
+        while len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+
+
+class DiskCache:
+    """A directory of text values keyed by strings, shared by processes and restarts.
+
+    Each value is stored in a file named after the SHA-256 of its key and written
+    atomically, so concurrent writers never expose partial files.
+
+    Args:
+        directory (str | os.PathLike): The directory to store files in. It is created on
+            first write.
+    """
+
+    def __init__(self, directory: str | os.PathLike[str]) -> None:
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: str) -> str | None:
+        """Return the stored value for `key`, or None if absent or unreadable."""
+        try:
+            value = self._path(key).read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError):
+            value = None
+        with self._lock:
+            if value is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return value
+
+    def put(self, key: str, value: str) -> None:
+        """Store `value` for `key`. Failures to write are ignored, as for any cache."""
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(value)
+                os.replace(tmp_path, self._path(key))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError:
+            pass
+
+    def clear(self) -> None:
+        """Remove all stored values and reset the hit/miss counters."""
+        if self.directory.is_dir():
+            for path in self.directory.glob("*.txt"):
+                path.unlink(missing_ok=True)
+        with self._lock:
+            self._hits = 0
+            self._misses = 0
+
+    def info(self) -> CacheInfo:
+        """Return the hit/miss counters. The size counts stored files and is unbounded."""
+        currsize = len(list(self.directory.glob("*.txt"))) if self.directory.is_dir() else 0
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, None, currsize)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.txt"
+
+
+# A raw model response: one text, or one text per sample.
+RawResponse = str | list[str]
+
+
+class ResponseCache:
+    """An exact-match cache of raw model responses, keyed by a hash of the request.
+
+    Recently used entries are kept in memory, up to `maxsize`. With a `path`, entries
+    are also written to an SQLite database, which is shared by processes and survives
+    restarts; entries missing from memory are then looked up there.
+
+    Args:
+        maxsize (int): The maximum number of entries kept in memory.
+        ttl (float | None): The default time to live of entries in seconds, or None for
+            entries that never expire.
+        path (str | os.PathLike | None): The SQLite database file, or None to keep
+            entries in memory only.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float | None = None,
+        path: str | os.PathLike[str] | None = None,
+    ) -> None:
+        self.ttl = ttl
+        self._memory: LRUCache[str, tuple[float | None, RawResponse]] = LRUCache(maxsize)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._db: sqlite3.Connection | None = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Hash JSON-serializable request parts into a key. Other objects use their repr."""
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=repr)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> RawResponse | None:
+        """Return the unexpired response stored for `key`, or None."""
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is None and self._db is not None:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+            if row is not None:
+                entry = (row[1], json.loads(row[0]))
+                self._memory.put(key, entry)
+
+        value = None
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= now:
+                self.pop(key)
+                value = None
+        with self._lock:
+            if value is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return value
+
+    def put(self, key: str, value: RawResponse, ttl: float | None = None) -> None:
+        """Store a response. `ttl` overrides the default time to live of the cache."""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        self._memory.put(key, (expires_at, value))
+        if self._db is not None:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), expires_at),
+                )
+
+    def pop(self, key: str) -> None:
+        """Remove the response stored for `key`, if any."""
+        self._memory.pop(key)
+        if self._db is not None:
+            with self._lock:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def prune(self) -> None:
+        """Delete expired entries from the database."""
+        if self._db is not None:
+            with self._lock:
+                self._db.execute(
+                    "DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                    (time.time(),),
+                )
+
+    def clear(self) -> None:
+        """Remove all entries, including persisted ones, and reset the hit/miss counters."""
+        self._memory.clear()
+        with self._lock:
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+            self._hits = 0
+            self._misses = 0
+
+    def info(self) -> CacheInfo:
+        """Return the hit/miss counters. The size counts the entries held in memory."""
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._memory.maxsize, len(self._memory))
+
+    def close(self) -> None:
+        """Close the database. Entries are then only kept in memory."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import warnings
 
-from typing import TYPE_CHECKING, Literal, cast, overload
+from typing import TYPE_CHECKING, Any, Literal, cast, overload
 
 from gimkit.exceptions import InvalidFormatError
 from gimkit.schemas import (
@@ -12,9 +12,6 @@ from gimkit.schemas import (
     RESPONSE_PREFIX,
     RESPONSE_SUFFIX,
     TAG_END,
-    TAG_END_PATTERN,
-    TAG_FULL_PATTERN,
-    TAG_OPEN_PATTERN,
     ContextInput,
     ContextPart,
     MaskedTag,
@@ -24,36 +21,106 @@ from gimkit.schemas import (
 
 
 if TYPE_CHECKING:
-    from collections.abc import Iterator
+    from collections.abc import Callable, Iterator, Sequence
+
+
+def _counting_changes(method: Callable[..., Any]) -> Callable[..., Any]:
+    def wrapper(self: _Parts, *args: Any, **kwargs: Any) -> Any:
+        self.version += 1
+        return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class _Parts(list[ContextPart]):
+    """The parts list of a context, counting its changes so tag indexes know when to rebuild."""
+
+    version = 0
+
+
+for _method in (
+    "__setitem__",
+    "__delitem__",
+    "__iadd__",
+    "__imul__",
+    "append",
+    "extend",
+    "insert",
+    "pop",
+    "remove",
+    "clear",
+    "sort",
+    "reverse",
+):
+    setattr(_Parts, _method, _counting_changes(getattr(list, _method)))
 
 
 class Context:
     class TagsView:
-        def __init__(self, parts: list[ContextPart]):
-            self._parts = parts
+        """A view over the masked tags of a list of parts, indexed by position and by name.
 
-        @property
-        def _tags_by_index(self) -> list[int]:
-            return [i for i, part in enumerate(self._parts) if isinstance(part, MaskedTag)]
+        The index is built on first use and rebuilt lazily once the parts list has
+        changed, so lookups by position and by name are O(1). Tags renamed in place are
+        caught by checking the name of the tag found, and lookups of a missing name
+        rebuild the index before failing. The last tag with a given name wins, except
+        after a tag is renamed in place to the name of an earlier tag, which is only
+        picked up once the index is rebuilt.
+        """
 
-        @property
-        def _tags_by_name(self) -> dict[str, int]:
-            return {
-                part.name: i
-                for i, part in enumerate(self._parts)
-                if isinstance(part, MaskedTag) and part.name is not None
-            }
+        def __init__(self, parts: _Parts):
+            self._parts = parts
+            self._positions: list[int] = []
+            self._tags: list[MaskedTag] = []
+            self._names: dict[str, int] = {}
+            self._indexed_version = -1
+
+        def _rebuild_index(self) -> None:
+            positions = []
+            tags: list[MaskedTag] = []
+            names = {}
+            for i, part in enumerate(self._parts):
+                if isinstance(part, MaskedTag):
+                    if part.name is not None:
+                        names[part.name] = len(tags)
+                    positions.append(i)
+                    tags.append(part)
+            self._positions = positions
+            self._tags = tags
+            self._names = names
+            self._indexed_version = self._parts.version
+
+        def _refresh(self) -> None:
+            if self._indexed_version != self._parts.version:
+                self._rebuild_index()
+
+        def _index_by_name(self, name: str) -> int:
+            self._refresh()
+            tag_index = self._names.get(name)
+            if tag_index is None or self._tags[tag_index].name != name:
+                # A tag was renamed in place.
+                self._rebuild_index()
+                tag_index = self._names.get(name)
+                if tag_index is None:
+                    raise KeyError(f"Tag name '{name}' does not exist.")
+            return tag_index
+
+        def _replace(self, tag_index: int, value: ContextPart) -> None:
+            old = self._tags[tag_index]
+            self._parts[self._positions[tag_index]] = value
+            if isinstance(value, MaskedTag) and value.name == old.name:
+                # The index still holds, so only the tag itself changes.
+                self._tags[tag_index] = value
+                self._indexed_version = self._parts.version
 
         def __setitem__(self, key: int | str, value: ContextPart) -> None:
             if not isinstance(value, ContextPart):
                 raise TypeError("New value must be a ContextPart (str or MaskedTag)")
             if isinstance(key, int):
-                self._parts[self._tags_by_index[key]] = value
+                self._refresh()
+                self._tags[key]  # Validates the key
+                self._replace(key % len(self._tags), value)
             elif isinstance(key, str):
-                if key in self._tags_by_name:
-                    self._parts[self._tags_by_name[key]] = value
-                else:
-                    raise KeyError(f"Tag name '{key}' does not exist.")
+                self._replace(self._index_by_name(key), value)
             else:
                 raise TypeError("Key must be int or str")
 
@@ -64,23 +131,21 @@ class Context:
         def __getitem__(self, key: slice) -> list[MaskedTag]: ...
 
         def __getitem__(self, key: int | str | slice) -> MaskedTag | list[MaskedTag]:
-            if isinstance(key, int):
-                return cast("MaskedTag", self._parts[self._tags_by_index[key]])
-            elif isinstance(key, slice):
-                return [cast("MaskedTag", self._parts[i]) for i in self._tags_by_index[key]]
+            if isinstance(key, int | slice):
+                self._refresh()
+                return self._tags[key]
             elif isinstance(key, str):
-                if key in self._tags_by_name:
-                    return cast("MaskedTag", self._parts[self._tags_by_name[key]])
-                else:
-                    raise KeyError(f"Tag name '{key}' does not exist.")
+                tag_index = self._index_by_name(key)  # May rebuild `_tags`
+                return self._tags[tag_index]
             raise TypeError("Key must be int, slice, or str")
 
         def __len__(self) -> int:
-            return len(self._tags_by_index)
+            self._refresh()
+            return len(self._tags)
 
         def __iter__(self) -> Iterator[MaskedTag]:
-            for i in self._tags_by_index:
-                yield cast("MaskedTag", self._parts[i])
+            self._refresh()
+            return iter(self._tags[:])
 
     def __init__(self, prefix: str, suffix: str, *args: ContextInput) -> None:
         _inner_parts = self._process_context_inputs(*args)
@@ -109,7 +174,18 @@ class Context:
 
         self._prefix = prefix
         self._suffix = suffix
-        self._parts = [prefix, *_inner_parts, suffix]
+        self._parts = _Parts([prefix, *_inner_parts, suffix])
+        self._tags_view: Context.TagsView | None = None
+
+    @classmethod
+    def _from_inner_parts(cls, prefix: str, suffix: str, inner_parts: list[ContextPart]) -> Context:
+        """Build a context from already-validated parts, bypassing `__init__`."""
+        context = cls.__new__(cls)
+        context._prefix = prefix
+        context._suffix = suffix
+        context._parts = _Parts([prefix, *inner_parts, suffix])
+        context._tags_view = None
+        return context
 
     @property
     def parts(self) -> list[ContextPart]:
@@ -117,7 +193,9 @@ class Context:
 
     @property
     def tags(self) -> TagsView:
-        return Context.TagsView(self._parts)
+        if self._tags_view is None or self._tags_view._parts is not self._parts:
+            self._tags_view = Context.TagsView(self._parts)
+        return self._tags_view
 
     def to_string(
         self,
@@ -197,6 +275,14 @@ class Query(Context):
                 if part.content == "":
                     part.content = None
 
+    @classmethod
+    def _from_parts(cls, parts: list[ContextPart]) -> Query:
+        """Build a Query from parts that already satisfy the checks done in `__init__`.
+
+        Tags must have sequential ids starting from 0, unique names, and no empty content.
+        """
+        return cast("Query", cls._from_inner_parts(QUERY_PREFIX, QUERY_SUFFIX, parts))
+
     def infill(self, response: Response | ContextInput) -> Result:
         """Fills tags in this query (self) with content from the provided response."""
         return infill(self, response)
@@ -224,6 +310,11 @@ class Result(Context):
     def __init__(self, *args: ContextInput) -> None:
         super().__init__("", "", *args)
 
+    @classmethod
+    def _from_parts(cls, parts: list[ContextPart]) -> Result:
+        """Build a Result from already-parsed parts, skipping input processing and checks."""
+        return cast("Result", cls._from_inner_parts("", "", parts))
+
     def __str__(self) -> str:
         return self.to_string(infill_mode=True)
 
@@ -254,18 +345,84 @@ def _repair_missing_endings(response_str: str) -> str:
             repaired = repaired[: -len(prefix)] + TAG_END
             break
 
-    # Count opening and closing tags to see if any are missing
-    open_matches = list(TAG_OPEN_PATTERN.finditer(repaired))
-    end_matches = list(TAG_END_PATTERN.finditer(repaired))
-    full_matches = list(TAG_FULL_PATTERN.finditer(repaired))
-    if len(open_matches) == len(end_matches) + 1 and len(full_matches) == len(end_matches):
-        repaired += TAG_END
+    # Add a closing tag if exactly the last opening tag is left unclosed
+    try:
+        parse_parts(repaired)
+    except InvalidFormatError:
+        try:
+            parse_parts(repaired + TAG_END)
+        except InvalidFormatError:
+            pass
+        else:
+            repaired += TAG_END
 
     # Wrap with RESPONSE_PREFIX and RESPONSE_SUFFIX
     repaired = RESPONSE_PREFIX + repaired + RESPONSE_SUFFIX
     return repaired
 
 
+def _parse_response(response: Response | ContextInput, strict: bool, stacklevel: int) -> Response:
+    """Build a Response, repairing missing ending tags of a string response if not strict."""
+    if isinstance(response, Response):
+        return response
+    if strict or not isinstance(response, str):
+        return Response(response)
+
+    # When strict=False, try to repair missing endings before parsing
+    try:
+        return Response(response)
+    except InvalidFormatError:
+        repaired = _repair_missing_endings(response)
+        if repaired == response:
+            raise
+        warnings.warn(
+            "Response has missing ending tags. Attempting automatic repair.",
+            stacklevel=stacklevel + 1,
+        )
+        return Response(repaired)
+
+
+def _merge(
+    query_parts: list[ContextPart],
+    num_query_tags: int,
+    response: Response,
+    strict: bool,
+    stacklevel: int,
+) -> Result:
+    """Merge the inner parts of a query with the tags of a response in a single pass."""
+    response_tags = response.tags[:]
+    if num_query_tags != len(response_tags):
+        msg = (
+            "Mismatch in number of tags between query and response. "
+            f"Query has {num_query_tags} tag(s), response has {len(response_tags)} tag(s)."
+        )
+        if strict:
+            raise InvalidFormatError(msg)
+        else:
+            warnings.warn(msg + " Will merge as many as possible.", stacklevel=stacklevel + 1)
+
+    result_parts: list[ContextPart] = []
+    num_merged = min(num_query_tags, len(response_tags))
+    tag_index = 0
+    for part in query_parts:
+        if isinstance(part, MaskedTag):
+            if tag_index < num_merged:
+                r_tag = response_tags[tag_index]
+                part = MaskedTag._trusted(
+                    id=part.id,
+                    name=part.name,
+                    desc=part.desc,
+                    regex=part.regex,
+                    content=r_tag.content if r_tag.content is not None else part.content,
+                )
+            tag_index += 1
+        elif not part:
+            continue
+        result_parts.append(part)
+
+    return Result._from_parts(result_parts)
+
+
 def infill(
     query: Query | ContextInput, response: Response | ContextInput, strict: bool = False
 ) -> Result:
@@ -285,50 +442,38 @@ def infill(
     """
     if not isinstance(query, Query):
         query = Query(query)
+    response = _parse_response(response, strict, stacklevel=2)
+    return _merge(query.parts[1:-1], len(query.tags), response, strict, stacklevel=2)
 
-    # When strict=False, try to repair missing endings before parsing
-    if not strict and isinstance(response, str):
-        response_str = response
-        try:
-            response = Response(response_str)
-        except InvalidFormatError:
-            # Try to repair missing endings
-            repaired = _repair_missing_endings(response_str)
-            if repaired != response_str:
-                warnings.warn(
-                    "Response has missing ending tags. Attempting automatic repair.",
-                    stacklevel=2,
-                )
-                response = Response(repaired)
-            else:
-                raise
-    elif not isinstance(response, Response):
-        response = Response(response)
 
-    query_tags = list(query.tags)
-    response_tags = list(response.tags)
-    if len(query_tags) != len(response_tags):
-        msg = (
-            "Mismatch in number of tags between query and response. "
-            f"Query has {len(query_tags)} tag(s), response has {len(response_tags)} tag(s)."
-        )
-        if strict:
-            raise InvalidFormatError(msg)
-        else:
-            warnings.warn(msg + " Will merge as many as possible.", stacklevel=2)
+def infill_many(
+    query: Query | ContextInput,
+    responses: Sequence[Response | ContextInput],
+    strict: bool = False,
+) -> list[Result]:
+    """Infill the same query with each of the given responses.
 
-    result_parts: list[ContextPart] = []
-    for part in query.parts[1:-1]:  # Exclude prefix and suffix
-        if isinstance(part, MaskedTag) and query_tags and response_tags:
-            q_tag = query_tags.pop(0)
-            r_tag = response_tags.pop(0)
-            part = MaskedTag(
-                id=q_tag.id,
-                name=q_tag.name,
-                desc=q_tag.desc,
-                regex=q_tag.regex,
-                content=r_tag.content if r_tag.content is not None else q_tag.content,
-            )
-        result_parts.append(part)
+    The query is parsed and validated once and its tag layout is reused for every
+    response, which makes it the preferred entry point when sampling several completions.
+
+    Args:
+        query: The query containing masked tags to be filled
+        responses: The responses containing content to fill the tags
+        strict: If True, raises errors on format mismatches. If False, attempts to repair
+                missing ending tags in a best-effort manner.
+
+    Returns:
+        A list of Result objects, one per response and in the same order.
 
-    return Result(result_parts)
+    Raises:
+        InvalidFormatError: If strict=True and there are format mismatches
+    """
+    if not isinstance(query, Query):
+        query = Query(query)
+    query_parts = query.parts[1:-1]
+    num_query_tags = len(query.tags)
+    results = []
+    for response in responses:
+        parsed_response = _parse_response(response, strict, stacklevel=2)
+        results.append(_merge(query_parts, num_query_tags, parsed_response, strict, stacklevel=2))
+    return results
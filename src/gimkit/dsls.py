@@ -1,18 +1,152 @@
 """Define DSL builders for various output types.
 
 - `build_cfg` constructs a context-free grammar (CFG) using LLGuidance syntax
-- `build_json_schema` constructs a JSON schema representing the response structure."""
+- `build_json_schema` constructs a JSON schema representing the response structure
+- `build_json_validator` returns a precompiled check of decoded JSON responses."""
 
+import json
+import os
+
+from typing import TYPE_CHECKING, Any
+
+from gimkit.caches import DiskCache, LRUCache
 from gimkit.contexts import Query
+from gimkit.exceptions import InvalidFormatError
 from gimkit.schemas import (
     RESPONSE_PREFIX,
     RESPONSE_SUFFIX,
     TAG_END,
     TAG_OPEN_LEFT,
     TAG_OPEN_RIGHT,
+    compile_regex,
+)
+
+
+if TYPE_CHECKING:
+    import re
+
+
+# ─── CFG Cache ────────────────────────────────────────────────────────────────
+
+# Bump when the grammar layout produced by `_build_cfg` changes, so that grammars
+# persisted on disk by older versions are not reused.
+_CFG_FORMAT_VERSION = 1
+
+# Process-wide cache of validated grammars keyed by `cfg_signature`.
+CFG_CACHE: LRUCache[tuple[str | None, ...], str] = LRUCache(maxsize=128)
+
+_cfg_disk_cache: DiskCache | None = None
+
+
+def set_cfg_cache_dir(directory: str | os.PathLike[str] | None) -> None:
+    """Persist built grammars in `directory` so new processes start with a warm cache.
+
+    The directory can also be set with the `GIMKIT_CFG_CACHE_DIR` environment variable.
+    Pass None to disable the on-disk layer.
+    """
+    global _cfg_disk_cache
+    _cfg_disk_cache = DiskCache(directory) if directory is not None else None
+
+
+def get_cfg_disk_cache() -> DiskCache | None:
+    """Return the on-disk grammar cache, or None if it is disabled."""
+    return _cfg_disk_cache
+
+
+def cfg_signature(query: Query) -> tuple[str | None, ...]:
+    """Return the structural signature that fully determines the CFG of a query."""
+    return tuple(tag.regex for tag in query.tags)
+
+
+if os.environ.get("GIMKIT_CFG_CACHE_DIR"):
+    set_cfg_cache_dir(os.environ["GIMKIT_CFG_CACHE_DIR"])
+
+
+# ─── JSON Schema Cache ────────────────────────────────────────────────────────
+
+
+def json_schema_signature(query: Query) -> tuple[tuple[str | None, str | None], ...]:
+    """Return the structural signature that fully determines the JSON schema of a query."""
+    return tuple((tag.regex, tag.desc) for tag in query.tags)
+
+
+class JsonResponseValidator:
+    """The JSON schema of a tag structure, with a precompiled check of decoded responses.
+
+    Checking a response is equivalent to validating it against `schema`: the fields
+    must be exactly "m_0" to "m_{n-1}", each holding a string that fully matches the
+    regex of its tag, if any.
+
+    Args:
+        signature: The structure to validate, as returned by `json_schema_signature`.
+    """
+
+    def __init__(self, signature: tuple[tuple[str | None, str | None], ...]) -> None:
+        properties: dict[str, dict[str, str]] = {}
+        self._fields: dict[str, re.Pattern[str] | None] = {}
+        for i, (regex, desc) in enumerate(signature):
+            field_name = f"m_{i}"
+            field_schema = {"type": "string"}
+
+            # Add regex pattern if specified
+            if regex is not None:
+                field_schema["pattern"] = f"^({regex})$"
+
+            # Add description if available
+            if desc is not None:
+                field_schema["description"] = desc
+
+            properties[field_name] = field_schema
+            self._fields[field_name] = compile_regex(regex) if regex is not None else None
+
+        self.schema: dict = {
+            "type": "object",
+            "properties": properties,
+            "required": list(properties),
+            "additionalProperties": False,
+        }
+
+    def errors(self, response: Any) -> list[str]:
+        """Return the reasons why a decoded JSON response is invalid, if any."""
+        if not isinstance(response, dict):
+            return [f"Expected a JSON object, got {type(response).__name__}."]
+        errors = []
+        for field_name, pattern in self._fields.items():
+            if field_name not in response:
+                errors.append(f"Missing field {field_name}.")
+                continue
+            value = response[field_name]
+            if not isinstance(value, str):
+                errors.append(f"Field {field_name} should be a string, got {type(value).__name__}.")
+            elif pattern is not None and not pattern.fullmatch(value):
+                errors.append(f"Field {field_name} does not match regex `{pattern.pattern}`.")
+        errors.extend(
+            f"Unexpected field {field_name}."
+            for field_name in response
+            if field_name not in self._fields
+        )
+        return errors
+
+    def validate(self, response: Any) -> None:
+        """Check a decoded JSON response.
+
+        Raises:
+            InvalidFormatError: If the response does not conform to the schema.
+        """
+        if errors := self.errors(response):
+            raise InvalidFormatError("Invalid JSON response: " + " ".join(errors))
+
+
+# Process-wide cache of JSON response validators (which hold their schema) keyed by
+# `json_schema_signature`.
+JSON_SCHEMA_CACHE: LRUCache[tuple[tuple[str | None, str | None], ...], JsonResponseValidator] = (
+    LRUCache(maxsize=128)
 )
 
 
+# ─── Builders ─────────────────────────────────────────────────────────────────
+
+
 def get_grammar_spec(grammar: str) -> str:
     from llguidance import grammar_from
 
@@ -37,6 +171,9 @@ def build_cfg(query: Query) -> str:
     """Build an LLGuidance context-free grammar (CFG) string based on the query object.
 
     Constructs a flattened grammar structure compatible with LLGuidance's suffix/capture logic.
+    The grammar only depends on the regexes of the tags, so it is cached in `CFG_CACHE`
+    (and in the directory set by `set_cfg_cache_dir`, if any) under that signature, and
+    validation only runs when a new signature is seen.
 
     Ref:
     - https://github.com/guidance-ai/llguidance/blob/main/docs/syntax.md: Incomplete documentation of llguidance grammar syntax
@@ -50,7 +187,29 @@ def build_cfg(query: Query) -> str:
     >>> '%llguidance {}\nstart: "<|GIM_RESPONSE|>" REGEX "<|MASKED id=\\"m_0\\"|>" m_0 REGEX "<|MASKED id=\\"m_1\\"|>" m_1 REGEX "<|/GIM_RESPONSE|>"\nREGEX: /\\s*/\nm_0[capture, suffix="<|/MASKED|>"]: T_0\nm_1[capture, suffix="<|/MASKED|>"]: T_1\nT_0: /中国|法国/\nT_1: /\\./\n'
     ```
     """
-    num_tags = len(query.tags)
+    signature = cfg_signature(query)
+    grammar = CFG_CACHE.get(signature)
+    if grammar is None:
+        grammar = _build_cfg_with_disk_cache(signature)
+        CFG_CACHE.put(signature, grammar)
+    return grammar
+
+
+def _build_cfg_with_disk_cache(regexes: tuple[str | None, ...]) -> str:
+    disk_cache = _cfg_disk_cache
+    if disk_cache is None:
+        return _build_cfg(regexes)
+    key = json.dumps([_CFG_FORMAT_VERSION, regexes], ensure_ascii=False)
+    # Grammars are only stored after validation, so loading one skips validation.
+    grammar = disk_cache.get(key)
+    if grammar is None:
+        grammar = _build_cfg(regexes)
+        disk_cache.put(key, grammar)
+    return grammar
+
+
+def _build_cfg(regexes: tuple[str | None, ...]) -> str:
+    num_tags = len(regexes)
 
     # 1. Header declaration
     lines = ["%llguidance {}"]
@@ -85,9 +244,9 @@ def build_cfg(query: Query) -> str:
     unique_pattern_terminals: dict[str, str] = {}
     terminal_definitions: list[str] = []
 
-    for i, tag in enumerate(query.tags):
+    for i, regex in enumerate(regexes):
         # Note: When used with suffix, using greedy match /(?s:.*)/ instead of /(?s:.)*?/ is correct and legal.
-        pattern = f"/{tag.regex}/" if tag.regex else "/(?s:.*)/"
+        pattern = f"/{regex}/" if regex else "/(?s:.*)/"
 
         # Get or create a shared terminal for this pattern
         if pattern not in unique_pattern_terminals:
@@ -126,30 +285,14 @@ def build_json_schema(query: Query) -> dict:
     The JSON schema represents the response structure where each masked tag
     becomes a field in the JSON object. The field name is "m_{id}" to match
     the tag id, and patterns are applied when regex is specified.
-    """
-    properties = {}
-    required_fields = []
-
-    for tag in query.tags:
-        field_name = f"m_{tag.id}"
-        field_schema = {"type": "string"}
 
-        # Add regex pattern if specified
-        if tag.regex is not None:
-            field_schema["pattern"] = f"^({tag.regex})$"
-
-        # Add description if available
-        if tag.desc is not None:
-            field_schema["description"] = tag.desc
-
-        properties[field_name] = field_schema
-        required_fields.append(field_name)
+    Schemas are cached by `json_schema_signature`, so the returned dict is shared
+    between calls and must not be modified.
+    """
+    return build_json_validator(query).schema
 
-    schema = {
-        "type": "object",
-        "properties": properties,
-        "required": required_fields,
-        "additionalProperties": False,
-    }
 
-    return schema
+def build_json_validator(query: Query) -> JsonResponseValidator:
+    """Return the cached validator of decoded JSON responses to the query."""
+    signature = json_schema_signature(query)
+    return JSON_SCHEMA_CACHE.get_or_create(signature, lambda: JsonResponseValidator(signature))
@@ -4,3 +4,7 @@ class GIMError(Exception):
 
 class InvalidFormatError(GIMError):
     """Exception raised for invalid GIM query/response format."""
+
+
+class DeadlineExceededError(GIMError, TimeoutError):
+    """Exception raised when a request is still queued once its deadline has passed."""
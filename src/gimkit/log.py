@@ -1,35 +1,51 @@
 import logging
+import threading
 
 from logging.config import dictConfig
 from sys import stdout
 
 
-dictConfig(
-    {
-        "version": 1,
-        "disable_existing_loggers": False,
-        "formatters": {
-            "no_datetime": {
-                "format": "%(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(funcName)s - %(message)s"
-            },
+_LOGGING_CONFIG = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "no_datetime": {
+            "format": "%(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(funcName)s - %(message)s"
         },
-        "handlers": {
-            "console": {
-                "level": logging.DEBUG,
-                "class": "logging.StreamHandler",
-                "stream": stdout,
-                "formatter": "no_datetime",
-            },
+    },
+    "handlers": {
+        "console": {
+            "level": logging.DEBUG,
+            "class": "logging.StreamHandler",
+            "stream": stdout,
+            "formatter": "no_datetime",
         },
-        "root": {
-            "level": logging.WARNING,
-            "handlers": ["console"],
-        },
-    }
-)
+    },
+    "root": {
+        "level": logging.WARNING,
+        "handlers": ["console"],
+    },
+}
+
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def _configure_logging() -> None:
+    # Configured on first use rather than at import, so importing GIMKit has no side effects
+    # on logging until something actually logs through it.
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        dictConfig(_LOGGING_CONFIG)
+        _configured = True
 
 
 def get_logger(name: str | None = None) -> logging.Logger:
+    if not _configured:
+        _configure_logging()
     parent_logger = logging.getLogger("")
     if name:
         return parent_logger.getChild(name)
@@ -1,6 +1,46 @@
-from .openai import from_openai
-from .vllm import from_vllm
-from .vllm_offline import from_vllm_offline
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
 
 
-__all__ = ["from_openai", "from_vllm", "from_vllm_offline"]
+if TYPE_CHECKING:
+    from .base import BatchItem
+    from .cascade import AsyncCascade, Cascade
+    from .openai import from_openai
+    from .utils import PreparedQuery, prepare_query
+    from .vllm import from_vllm
+    from .vllm_offline import from_vllm_offline
+    from .vllm_pool import from_vllm_pool
+
+
+__all__ = [
+    "AsyncCascade",
+    "BatchItem",
+    "Cascade",
+    "PreparedQuery",
+    "from_openai",
+    "from_vllm",
+    "from_vllm_offline",
+    "from_vllm_pool",
+    "prepare_query",
+]
+
+# Each backend is imported on first access, so that using one does not pay for the others.
+_LAZY_ATTRS = {
+    "AsyncCascade": ".cascade",
+    "BatchItem": ".base",
+    "Cascade": ".cascade",
+    "PreparedQuery": ".utils",
+    "from_openai": ".openai",
+    "from_vllm": ".vllm",
+    "from_vllm_offline": ".vllm_offline",
+    "from_vllm_pool": ".vllm_pool",
+    "prepare_query": ".utils",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_ATTRS:
+        value = getattr(import_module(_LAZY_ATTRS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
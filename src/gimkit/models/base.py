@@ -1,56 +1,795 @@
-from typing import Any, Literal, cast
+import asyncio
+import time
+
+from collections.abc import AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, ClassVar, Generic, Literal, TypeAlias, TypeVar, cast
 
 from outlines.generator import Generator
 from outlines.models.base import AsyncModel, Model
+from outlines.types.dsl import CFG, JsonSchema
 
+from gimkit.caches import LRUCache, RawResponse, ResponseCache
 from gimkit.contexts import Query, Result
+from gimkit.exceptions import DeadlineExceededError
 from gimkit.log import get_logger
-from gimkit.models.utils import get_outlines_model_input, get_outlines_output_type, infill_responses
+from gimkit.models.limits import (
+    AIMDLimiter,
+    HedgePolicy,
+    Priority,
+    RateLimiter,
+    check_deadline,
+)
+from gimkit.models.utils import (
+    ModelInput,
+    PreparedQuery,
+    ProgressiveInfill,
+    infill_responses,
+    prepare_query,
+)
 from gimkit.schemas import ContextInput
 
 
 logger = get_logger(__name__)
 
+# Key of a cached generator: the kind of output type, its grammar or schema, and the backend.
+GeneratorKey: TypeAlias = tuple[str, str | None, str | None, str | None]
+
+_T = TypeVar("_T")
+
+
+class GeneratorCacheMixin:
+    """Keep a bounded cache of Outlines generators on a model.
+
+    Generators only depend on the output type and backend, and output types only
+    depend on the tag structure of queries, so repeated calls with the same structure
+    reuse one generator instead of setting up a new one. The cache is an `LRUCache` at
+    `model.generator_cache`.
+    """
+
+    generator_cache_size: ClassVar[int] = 32
+
+    @property
+    def generator_cache(self) -> LRUCache[GeneratorKey, Any]:
+        cache = self.__dict__.get("_generator_cache")
+        if cache is None:
+            cache = self.__dict__.setdefault(
+                "_generator_cache", LRUCache(maxsize=self.generator_cache_size)
+            )
+        return cache
+
+
+def generator_key(output_type: CFG | JsonSchema | None, backend: str | None) -> GeneratorKey:
+    """Return the key identifying the generator of an output type and backend."""
+    if output_type is None:
+        return ("none", None, None, backend)
+    if isinstance(output_type, CFG):
+        return ("cfg", output_type.definition, None, backend)
+    return ("json", output_type.schema, output_type.whitespace_pattern, backend)
+
+
+def _get_generator(
+    model: Model | AsyncModel, output_type: CFG | JsonSchema | None, backend: str | None
+) -> Any:
+    if not isinstance(model, GeneratorCacheMixin):
+        return Generator(model, output_type, backend)
+    return model.generator_cache.get_or_create(
+        generator_key(output_type, backend), lambda: Generator(model, output_type, backend)
+    )
+
+
+class ResponseCacheMixin:
+    """Let a model reuse the raw responses of identical requests.
+
+    Caching is opt-in: assign a `gimkit.caches.ResponseCache` to `model.response_cache`
+    (several models can share one). Requests are keyed by the model class and name, the
+    prepared model input, the output type, the backend and the inference kwargs, so a
+    hit returns a Result without calling the model. Each call also accepts a
+    `use_cache` keyword: False bypasses the cache, and "refresh" calls the model and
+    overwrites the cached response.
+
+    Models sharing a cache are told apart by the base URL of their client, or by the
+    model path of their vLLM engine for offline models. Set `model.cache_namespace` to
+    key them by a name of your own instead.
+    """
+
+    response_cache: ResponseCache | None = None
+    cache_namespace: str | None = None
+
+
+UseCache: TypeAlias = bool | Literal["refresh"]
+
+
+def _cache_namespace(model: Any) -> str | None:
+    """Identify what serves a model, so that models sharing a cache do not collide."""
+    namespace = getattr(model, "cache_namespace", None)
+    if namespace is not None:
+        return str(namespace)
+    client = getattr(model, "client", None)
+    if client is not None:
+        return str(client.base_url)
+    engine = getattr(model, "model", None)
+    if engine is None:
+        return None
+    # Offline models hold a `vllm.LLM`, whose model path identifies the weights.
+    try:
+        return str(engine.llm_engine.model_config.model)
+    except AttributeError:
+        return f"{type(engine).__name__}@{id(engine):x}"
+
+
+def _request_key(
+    model: Any, prepared: PreparedQuery, backend: str | None, inference_kwargs: dict[str, Any]
+) -> str:
+    """Hash everything that determines the response of a request."""
+    return ResponseCache.make_key(
+        type(model).__name__,
+        _cache_namespace(model),
+        getattr(model, "model_name", None),
+        getattr(prepared.model_input, "messages", prepared.model_input),
+        generator_key(prepared.outlines_output_type, backend),
+        inference_kwargs,
+    )
+
+
+def _lookup_response(
+    model: Any,
+    prepared: PreparedQuery,
+    backend: str | None,
+    inference_kwargs: dict[str, Any],
+    use_cache: UseCache = True,
+) -> tuple[str | None, RawResponse | None]:
+    """Return the cache key of a request and its cached response, if any.
+
+    The key is None when the response should not be stored.
+    """
+    cache = getattr(model, "response_cache", None)
+    if cache is None or use_cache is False:
+        return None, None
+    key = _request_key(model, prepared, backend, inference_kwargs)
+    raw_responses = cache.get(key) if use_cache != "refresh" else None
+    if raw_responses is not None:
+        logger.debug(f"Cached responses of {model}: {raw_responses}")
+    return key, raw_responses
+
+
+def _store_response(model: Any, key: str | None, raw_responses: RawResponse) -> None:
+    if key is not None and model.response_cache is not None:
+        model.response_cache.put(key, raw_responses)
+
+
+class ConcurrencyLimitMixin:
+    """Let an async model adapt its number of requests in flight to the server.
+
+    Limiting is opt-in: assign a `gimkit.models.limits.AIMDLimiter` to `model.limiter`
+    (models calling the same server can share one). Calls then wait for a slot before
+    sending their request, and their latency and errors adjust the limit. Responses
+    served from the response cache or shared with a coalesced call take no slot.
+
+    Each call also accepts a `priority` keyword (a `gimkit.models.limits.Priority`, or
+    any int: lower values are served first) and a `deadline` keyword (a
+    `time.monotonic()` time). Waiting calls are dispatched by priority, then by
+    earliest deadline, and a call still waiting at its deadline raises a
+    `DeadlineExceededError` without being sent. Deadlines are checked before sending
+    even without a limiter.
+    """
+
+    limiter: AIMDLimiter | None = None
+
+
+async def _limited(
+    model: Any,
+    call: Callable[[], Awaitable[_T]],
+    priority: int = Priority.NORMAL,
+    deadline: float | None = None,
+) -> _T:
+    """Await `call()` within the concurrency limit of the model, if any.
+
+    Raises:
+        DeadlineExceededError: If the deadline passes before the call is sent.
+    """
+    limiter = getattr(model, "limiter", None)
+    if limiter is None:
+        check_deadline(deadline, priority)
+        return await call()
+    started_at = await limiter.acquire(priority, deadline)
+    error: BaseException | None = None
+    try:
+        return await call()
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        limiter.release(started_at, error)
+
+
+class HedgingMixin:
+    """Let an async model duplicate slow requests to cut tail latency.
+
+    Hedging is opt-in: assign a `gimkit.models.limits.HedgePolicy` to `model.hedging`.
+    A request still running after the hedge delay of the policy is sent again, the
+    first successful response is used and the other request is cancelled. If one of
+    them fails, the other is awaited. Each request takes its own limiter slot and is
+    charged to the rate limits, and the policy bounds how much extra load the hedges
+    add. Pools send the hedge to
+    another endpoint; streams are not hedged.
+    """
+
+    hedging: HedgePolicy | None = None
+
+
+async def _hedged(model: Any, attempt: Callable[[], Awaitable[_T]]) -> _T:
+    """Await `attempt()`, hedging it with a second attempt under the policy of the model."""
+    policy: HedgePolicy | None = getattr(model, "hedging", None)
+    if policy is None:
+        return await attempt()
+
+    delay = policy.start()
+    started_at = time.monotonic()
+    hedge: asyncio.Future[_T] | None = None
+    pending = {asyncio.ensure_future(attempt())}
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done and policy.try_hedge():
+                logger.debug(f"Hedging a request to {model} after {delay:.3f}s.")
+                hedge = asyncio.ensure_future(attempt())
+                pending.add(hedge)
+        errors: list[BaseException] = []
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if (error := task.exception()) is None:
+                    # Time the call, not the winning request: when the hedge wins, this is
+                    # how long the original request ran before it was cancelled.
+                    policy.record(time.monotonic() - started_at, hedge=task is hedge)
+                    return task.result()
+                errors.append(error)
+        raise errors[0]
+    finally:
+        # Losers and abandoned requests release their slots as they are cancelled.
+        for task in pending:
+            task.cancel()
+
+
+class RateLimitMixin:
+    """Let a model stay within the request and token rate limits of its endpoint.
+
+    Rate limiting is opt-in: assign a `gimkit.models.limits.RateLimiter` to
+    `model.rate_limiter` (models sharing an API key should share one). Requests then
+    wait for admission, and calls rejected with a 429 are retried once the endpoint
+    allows it. Disable the retries of the client (`max_retries=0`) so that 429s reach
+    the rate limiter. Streams wait for admission but are not retried.
+    """
+
+    rate_limiter: RateLimiter | None = None
+
+
+def _rate_limited(
+    model: Any,
+    prepared: PreparedQuery,
+    inference_kwargs: dict[str, Any],
+    call: Callable[[], RawResponse],
+) -> RawResponse:
+    """Call `call()` within the rate limits of the model, if any."""
+    rate_limiter: RateLimiter | None = getattr(model, "rate_limiter", None)
+    if rate_limiter is None:
+        return call()
+    estimate = rate_limiter.estimate(prepared, inference_kwargs)
+    attempt = 0
+    while True:
+        time.sleep(rate_limiter.reserve(estimate))
+        try:
+            raw_responses = call()
+        except Exception as e:
+            # The request reached the endpoint but produced no completion.
+            rate_limiter.settle(estimate, "")
+            delay = rate_limiter.backoff(e, attempt)
+            if delay is None:
+                raise
+            logger.warning(f"Rate limited by {model}, retrying in {delay:.1f}s.")
+            attempt += 1
+            continue
+        rate_limiter.settle(estimate, raw_responses)
+        return raw_responses
+
+
+async def _arate_limited(
+    model: Any,
+    prepared: PreparedQuery,
+    inference_kwargs: dict[str, Any],
+    call: Callable[[], Awaitable[RawResponse]],
+) -> RawResponse:
+    """Await `call()` within the rate limits of the model, if any."""
+    rate_limiter: RateLimiter | None = getattr(model, "rate_limiter", None)
+    if rate_limiter is None:
+        return await call()
+    estimate = rate_limiter.estimate(prepared, inference_kwargs)
+    attempt = 0
+    while True:
+        try:
+            await asyncio.sleep(rate_limiter.reserve(estimate))
+        except asyncio.CancelledError:
+            rate_limiter.cancel(estimate)
+            raise
+        try:
+            raw_responses = await call()
+        except DeadlineExceededError:
+            # The request was dropped while queued for a slot, before it was sent.
+            rate_limiter.cancel(estimate)
+            raise
+        except asyncio.CancelledError:
+            # The request may have been sent, as hedges that lose are, so it still counts.
+            rate_limiter.settle(estimate, "")
+            raise
+        except Exception as e:
+            # The request reached the endpoint but produced no completion.
+            rate_limiter.settle(estimate, "")
+            delay = rate_limiter.backoff(e, attempt)
+            if delay is None:
+                raise
+            logger.warning(f"Rate limited by {model}, retrying in {delay:.1f}s.")
+            attempt += 1
+            continue
+        rate_limiter.settle(estimate, raw_responses)
+        return raw_responses
+
+
+def _admit_stream(
+    model: Any, prepared: PreparedQuery, inference_kwargs: dict[str, Any]
+) -> tuple[float, Callable[[str], None], Callable[[], None]]:
+    """Reserve a stream within the rate limits of the model, if any.
+
+    Return how long to wait before starting it, a function to call with the response
+    received, and a function to call instead if the stream is dropped before it starts.
+    """
+    rate_limiter: RateLimiter | None = getattr(model, "rate_limiter", None)
+    if rate_limiter is None:
+        return 0.0, lambda text: None, lambda: None
+    estimate = rate_limiter.estimate(prepared, inference_kwargs)
+    return (
+        rate_limiter.reserve(estimate),
+        partial(rate_limiter.settle, estimate),
+        partial(rate_limiter.cancel, estimate),
+    )
+
+
+class _InFlight:
+    """A request being generated, with the number of callers awaiting it."""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future[RawResponse]) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class RequestCoalescingMixin:
+    """Let concurrent identical calls of an async model share one request.
+
+    While a request is in flight, identical calls (keyed like the response cache)
+    await its response instead of sending their own, and each gets its own Result
+    infilled from it. Only deterministic calls, made with `temperature=0`, are
+    coalesced, as the others are expected to differ. Calls with a different priority or
+    deadline are not coalesced either, so that each is scheduled as requested. If every
+    caller is cancelled, the shared request is cancelled too. Set
+    `model.coalesce_requests = False` to disable.
+    """
+
+    coalesce_requests: bool = True
+
+    @property
+    def inflight_requests(self) -> dict[tuple[int, str, int, float | None], _InFlight]:
+        inflight = self.__dict__.get("_inflight_requests")
+        if inflight is None:
+            inflight = self.__dict__.setdefault("_inflight_requests", {})
+        return inflight
+
+
+async def _coalesce(
+    model: Any,
+    prepared: PreparedQuery,
+    backend: str | None,
+    inference_kwargs: dict[str, Any],
+    generate: Callable[[], Awaitable[RawResponse]],
+    priority: int = Priority.NORMAL,
+    deadline: float | None = None,
+) -> RawResponse:
+    """Await `generate()`, sharing it with identical deterministic calls in flight.
+
+    `generate` applies the priority and deadline of the call, so they are part of the key.
+    """
+    if (
+        not isinstance(model, RequestCoalescingMixin)
+        or not model.coalesce_requests
+        or inference_kwargs.get("temperature") != 0
+    ):
+        return await generate()
+
+    inflight = model.inflight_requests
+    # Futures are bound to an event loop, so loops do not share requests.
+    key = (
+        id(asyncio.get_running_loop()),
+        _request_key(model, prepared, backend, inference_kwargs),
+        priority,
+        deadline,
+    )
+    entry = inflight.get(key)
+    if entry is None:
+        entry = inflight[key] = _InFlight(asyncio.ensure_future(generate()))
+        entry.task.add_done_callback(lambda _: inflight.pop(key, None))
+    else:
+        logger.debug(f"Coalescing a request to {model} with one in flight.")
+    entry.waiters += 1
+    try:
+        return await asyncio.shield(entry.task)
+    finally:
+        entry.waiters -= 1
+        if entry.waiters == 0 and not entry.task.done():
+            entry.task.cancel()
+
 
 def _call(
     self: Model,
-    model_input: ContextInput | Query,
+    model_input: ContextInput | Query | PreparedQuery,
     output_type: Literal["cfg", "json"] | None = "cfg",
     backend: str | None = None,
     use_gim_prompt: bool = False,
     include_grammar: bool = False,
     **inference_kwargs: Any,
 ) -> Result | list[Result]:
-    outlines_model_input = get_outlines_model_input(
-        model_input, output_type, use_gim_prompt, include_grammar
-    )
-    logger.debug(f"Outlines model input of {self}: {outlines_model_input}")
-    outlines_output_type = get_outlines_output_type(model_input, output_type)
-    generator = Generator(self, outlines_output_type, backend)
-    raw_responses = generator(outlines_model_input, **inference_kwargs)
-    logger.debug(f"Raw responses of {self}: {raw_responses}")
+    prepared = prepare_query(model_input, output_type, use_gim_prompt, include_grammar)
+    use_cache = inference_kwargs.pop("use_cache", True)
+    key, raw_responses = _lookup_response(self, prepared, backend, inference_kwargs, use_cache)
+    if raw_responses is None:
+        logger.debug(f"Outlines model input of {self}: {prepared.model_input}")
+        generator = _get_generator(self, prepared.outlines_output_type, backend)
+        raw_responses = _rate_limited(
+            self,
+            prepared,
+            inference_kwargs,
+            lambda: cast("RawResponse", generator(prepared.model_input, **inference_kwargs)),
+        )
+        logger.debug(f"Raw responses of {self}: {raw_responses}")
+        _store_response(self, key, raw_responses)
     return infill_responses(
-        model_input, cast("str | list[str]", raw_responses), json_responses=(output_type == "json")
+        prepared.query,
+        raw_responses,
+        json_responses=(prepared.output_type == "json"),
     )
 
 
 async def _acall(
     self: AsyncModel,
-    model_input: ContextInput | Query,
+    model_input: ContextInput | Query | PreparedQuery,
     output_type: Literal["cfg", "json"] | None = "cfg",
     backend: str | None = None,
     use_gim_prompt: bool = False,
     include_grammar: bool = False,
     **inference_kwargs: Any,
 ) -> Result | list[Result]:
-    outlines_model_input = get_outlines_model_input(
-        model_input, output_type, use_gim_prompt, include_grammar
-    )
-    logger.debug(f"Outlines model input of {self}: {outlines_model_input}")
-    outlines_output_type = get_outlines_output_type(model_input, output_type)
-    generator = Generator(self, outlines_output_type, backend)
-    raw_responses = await generator(outlines_model_input, **inference_kwargs)
-    logger.debug(f"Raw responses of {self}: {raw_responses}")
+    prepared = prepare_query(model_input, output_type, use_gim_prompt, include_grammar)
+    use_cache = inference_kwargs.pop("use_cache", True)
+    priority = inference_kwargs.pop("priority", Priority.NORMAL)
+    deadline = inference_kwargs.pop("deadline", None)
+    key, raw_responses = _lookup_response(self, prepared, backend, inference_kwargs, use_cache)
+
+    async def generate() -> RawResponse:
+        logger.debug(f"Outlines model input of {self}: {prepared.model_input}")
+        generator = _get_generator(self, prepared.outlines_output_type, backend)
+
+        async def call() -> RawResponse:
+            return cast("RawResponse", await generator(prepared.model_input, **inference_kwargs))
+
+        # Each attempt of a hedged call is a request of its own against the rate limits.
+        raw_responses = await _hedged(
+            self,
+            lambda: _arate_limited(
+                self, prepared, inference_kwargs, lambda: _limited(self, call, priority, deadline)
+            ),
+        )
+        logger.debug(f"Raw responses of {self}: {raw_responses}")
+        _store_response(self, key, raw_responses)
+        return raw_responses
+
+    if raw_responses is None:
+        raw_responses = await _coalesce(
+            self, prepared, backend, inference_kwargs, generate, priority, deadline
+        )
     return infill_responses(
-        model_input, cast("str | list[str]", raw_responses), json_responses=(output_type == "json")
+        prepared.query,
+        raw_responses,
+        json_responses=(prepared.output_type == "json"),
+    )
+
+
+def _stream(
+    self: Model,
+    model_input: ContextInput | Query | PreparedQuery,
+    output_type: Literal["cfg", "json"] | None = "cfg",
+    backend: str | None = None,
+    use_gim_prompt: bool = False,
+    include_grammar: bool = False,
+    **inference_kwargs: Any,
+) -> Iterator[Result]:
+    prepared = prepare_query(model_input, output_type, use_gim_prompt, include_grammar)
+    use_cache = inference_kwargs.pop("use_cache", True)
+    key, raw_responses = _lookup_response(self, prepared, backend, inference_kwargs, use_cache)
+    if isinstance(raw_responses, str):
+        yield infill_responses(
+            prepared.query, raw_responses, json_responses=(prepared.output_type == "json")
+        )
+        return
+    logger.debug(f"Outlines model input of {self}: {prepared.model_input}")
+    generator = _get_generator(self, prepared.outlines_output_type, backend)
+    wait, settle, _ = _admit_stream(self, prepared, inference_kwargs)
+    time.sleep(wait)
+    infill = ProgressiveInfill(prepared)
+    try:
+        deltas = generator.stream(prepared.model_input, **inference_kwargs)
+        for delta in cast("Iterator[str]", deltas):
+            if (partial_result := infill.feed(delta)) is not None:
+                yield partial_result
+    finally:
+        # Interrupted streams only count the text received.
+        settle(infill.text)
+    result = infill.finish()
+    _store_response(self, key, infill.text)
+    yield result
+
+
+async def _astream(
+    self: AsyncModel,
+    model_input: ContextInput | Query | PreparedQuery,
+    output_type: Literal["cfg", "json"] | None = "cfg",
+    backend: str | None = None,
+    use_gim_prompt: bool = False,
+    include_grammar: bool = False,
+    **inference_kwargs: Any,
+) -> AsyncIterator[Result]:
+    prepared = prepare_query(model_input, output_type, use_gim_prompt, include_grammar)
+    use_cache = inference_kwargs.pop("use_cache", True)
+    priority = inference_kwargs.pop("priority", Priority.NORMAL)
+    deadline = inference_kwargs.pop("deadline", None)
+    key, raw_responses = _lookup_response(self, prepared, backend, inference_kwargs, use_cache)
+    if isinstance(raw_responses, str):
+        yield infill_responses(
+            prepared.query, raw_responses, json_responses=(prepared.output_type == "json")
+        )
+        return
+    logger.debug(f"Outlines model input of {self}: {prepared.model_input}")
+    generator = _get_generator(self, prepared.outlines_output_type, backend)
+    wait, settle, cancel = _admit_stream(self, prepared, inference_kwargs)
+    try:
+        await asyncio.sleep(wait)
+        # Streams take no slot of the limiter, but their deadline still applies.
+        check_deadline(deadline, priority)
+    except (DeadlineExceededError, asyncio.CancelledError):
+        cancel()
+        raise
+    infill = ProgressiveInfill(prepared)
+    try:
+        deltas = generator.stream(prepared.model_input, **inference_kwargs)
+        async for delta in cast("AsyncIterator[str]", deltas):
+            if (partial_result := infill.feed(delta)) is not None:
+                yield partial_result
+    finally:
+        # Interrupted streams only count the text received.
+        settle(infill.text)
+    result = infill.finish()
+    _store_response(self, key, infill.text)
+    yield result
+
+
+@dataclass(frozen=True, slots=True)
+class BatchItem(Generic[_T]):
+    """The outcome of one input of a batch: either a result or the error it raised."""
+
+    index: int
+    """The position of the input in the batch."""
+    input: _T
+    result: Result | list[Result] | None = None
+    error: Exception | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+async def _aiter(iterable: Iterable[_T]) -> AsyncIterator[_T]:
+    for item in iterable:
+        yield item
+
+
+async def _amap(
+    call: Callable[[_T], Awaitable[Result | list[Result]]],
+    model_inputs: Iterable[_T] | AsyncIterable[_T],
+    concurrency: int,
+    ordered: bool,
+) -> AsyncIterator[BatchItem[_T]]:
+    """Run `call` over the inputs with at most `concurrency` calls in flight.
+
+    Inputs are pulled lazily, only when a slot frees up, so arbitrarily long inputs are
+    processed in bounded memory. In ordered mode, items completed ahead of their turn
+    also hold a slot until they are yielded. A failing call is reported in its item
+    without affecting the others, and closing the iterator early cancels the calls still
+    in flight.
+    """
+    if concurrency < 1:
+        raise ValueError(f"concurrency should be a positive integer, got {concurrency}.")
+
+    async def run(index: int, model_input: _T) -> BatchItem[_T]:
+        try:
+            return BatchItem(index, model_input, result=await call(model_input))
+        except Exception as e:  # noqa: BLE001
+            return BatchItem(index, model_input, error=e)
+
+    inputs = (
+        aiter(model_inputs) if isinstance(model_inputs, AsyncIterable) else _aiter(model_inputs)
     )
+
+    pending: set[asyncio.Task[BatchItem[_T]]] = set()
+    completed: dict[int, BatchItem[_T]] = {}
+    num_submitted = 0
+    num_yielded = 0
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) + len(completed) < concurrency:
+                try:
+                    model_input = await anext(inputs)
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                pending.add(asyncio.ensure_future(run(num_submitted, model_input)))
+                num_submitted += 1
+
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                item = task.result()
+                if ordered:
+                    completed[item.index] = item
+                else:
+                    yield item
+            while num_yielded in completed:
+                yield completed.pop(num_yielded)
+                num_yielded += 1
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def _map(
+    call: Callable[[_T], Result | list[Result]],
+    model_inputs: Iterable[_T],
+    max_workers: int,
+    ordered: bool,
+) -> Iterator[BatchItem[_T]]:
+    """Run `call` over the inputs in a thread pool of `max_workers` threads.
+
+    This is the synchronous counterpart of `_amap`, with the same lazy consumption of
+    inputs, ordering and error reporting. The pool is owned by the iterator: it is shut
+    down, cancelling calls not started yet, once the iterator is exhausted or closed.
+    """
+    if max_workers < 1:
+        raise ValueError(f"max_workers should be a positive integer, got {max_workers}.")
+
+    def run(index: int, model_input: _T) -> BatchItem[_T]:
+        try:
+            return BatchItem(index, model_input, result=call(model_input))
+        except Exception as e:  # noqa: BLE001
+            return BatchItem(index, model_input, error=e)
+
+    inputs = iter(model_inputs)
+    pending: set[Future[BatchItem[_T]]] = set()
+    completed: dict[int, BatchItem[_T]] = {}
+    num_submitted = 0
+    num_yielded = 0
+    exhausted = False
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gimkit-map")
+    try:
+        while True:
+            while not exhausted and len(pending) + len(completed) < max_workers:
+                try:
+                    model_input = next(inputs)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.add(executor.submit(run, num_submitted, model_input))
+                num_submitted += 1
+
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = future.result()
+                if ordered:
+                    completed[item.index] = item
+                else:
+                    yield item
+            while num_yielded in completed:
+                yield completed.pop(num_yielded)
+                num_yielded += 1
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class MapMixin:
+    """Let a synchronous model be called on many inputs from a thread pool, see `map`."""
+
+    def map(
+        self,
+        model_inputs: Iterable[ModelInput],
+        max_workers: int = 8,
+        ordered: bool = False,
+        **call_kwargs: Any,
+    ) -> Iterator[BatchItem[ModelInput]]:
+        """Call the model on every input from a thread pool, yielding items as they finish.
+
+        Keyword arguments are passed to every call. Inputs are consumed lazily, and an
+        input whose call fails yields an item carrying the error instead of stopping the
+        others. With `ordered=True`, items are yielded in input order. The pool is shut
+        down once the iterator is exhausted or closed.
+        """
+        call = partial(cast("Callable[..., Result | list[Result]]", self), **call_kwargs)
+        return _map(call, model_inputs, max_workers, ordered)
+
+
+class AsyncMapMixin:
+    """Let an async model be called on many inputs concurrently, see `amap`."""
+
+    def amap(
+        self,
+        model_inputs: Iterable[ModelInput] | AsyncIterable[ModelInput],
+        concurrency: int = 8,
+        ordered: bool = False,
+        **call_kwargs: Any,
+    ) -> AsyncIterator[BatchItem[ModelInput]]:
+        """Call the model on every input with bounded concurrency, yielding items as they finish.
+
+        Keyword arguments are passed to every call. Inputs are consumed lazily, and an
+        input whose call fails yields an item carrying the error instead of stopping the
+        others. With `ordered=True`, items are yielded in input order.
+        """
+        call = partial(cast("Callable[..., Awaitable[Result | list[Result]]]", self), **call_kwargs)
+        return _amap(call, model_inputs, concurrency, ordered)
+
+
+class StreamMixin:
+    """Let a synchronous model stream its responses, see `stream`.
+
+    Models add the defaults and options of their backend to requests in `_call_kwargs`.
+    """
+
+    def _call_kwargs(self, call_kwargs: dict[str, Any]) -> dict[str, Any]:
+        return call_kwargs
+
+    def stream(self, model_input: ModelInput, **call_kwargs: Any) -> Iterator[Result]:
+        """Stream the response, yielding a partial Result each time tags are completed.
+
+        Keyword arguments are those of a call to the model, and the last Result yielded
+        is the same as the one returned by the call.
+        """
+        return _stream(cast("Model", self), model_input, **self._call_kwargs(call_kwargs))
+
+
+class AsyncStreamMixin:
+    """Let an async model stream its responses, see `astream`.
+
+    Models add the defaults and options of their backend to requests in `_call_kwargs`.
+    """
+
+    def _call_kwargs(self, call_kwargs: dict[str, Any]) -> dict[str, Any]:
+        return call_kwargs
+
+    def astream(self, model_input: ModelInput, **call_kwargs: Any) -> AsyncIterator[Result]:
+        """Stream the response, yielding a partial Result each time tags are completed.
+
+        Keyword arguments are those of a call to the model, and the last Result yielded
+        is the same as the one returned by the call.
+        """
+        return _astream(cast("AsyncModel", self), model_input, **self._call_kwargs(call_kwargs))
@@ -0,0 +1,282 @@
+"""Fill the easy tags of a query with a cheap model, and escalate the others.
+
+A cascade calls its models in turn, from the cheapest to the strongest. The first
+model fills every tag of the query, and each filled tag is checked against its regex
+and the validator registered for its name, if any. Only the tags that fail are sent to
+the next model, in a query where the accepted tags are written out as plain text: the
+stronger model sees them as context without generating them again. The last model's
+content is kept whether it passes or not."""
+
+import inspect
+import threading
+import time
+
+from collections.abc import (
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Iterator,
+    Mapping,
+    Sequence,
+)
+from functools import partial
+from typing import Any, Generic, NamedTuple, TypeAlias, TypeVar, cast
+
+from gimkit.contexts import Query, Result
+from gimkit.log import get_logger
+from gimkit.models.base import BatchItem, _amap, _map
+from gimkit.schemas import ContextInput, ContextPart, MaskedTag
+
+
+logger = get_logger(__name__)
+
+Validator: TypeAlias = Callable[[str], bool]
+SyncTier: TypeAlias = Callable[..., Result | list[Result]]
+AsyncTier: TypeAlias = Callable[..., Awaitable[Result | list[Result]]]
+
+_M = TypeVar("_M", SyncTier, AsyncTier)
+
+
+class TierStats(NamedTuple):
+    """The work done by one model of a cascade."""
+
+    calls: int
+    """The number of calls made to the model."""
+    tags: int
+    """The number of tags the model was asked to fill."""
+    accepted: int
+    """The number of tags it filled that passed validation."""
+    seconds: float
+    """The total time spent in calls to the model."""
+
+
+class CascadeResult(Result):
+    """A Result of a cascade, recording which model filled each tag."""
+
+    tiers: list[int]
+    """For each tag, the index in the cascade of the model that filled it."""
+    accepted: list[bool]
+    """For each tag, whether its content passed validation."""
+
+
+class _Escalation:
+    """The state of one cascade call: the content of each tag and the tags left to fill."""
+
+    def __init__(self, query: Query) -> None:
+        self.query = query
+        num_tags = len(query.tags)
+        self.contents: list[str | None] = [None] * num_tags
+        self.tiers = [0] * num_tags
+        self.accepted = [False] * num_tags
+        self.pending = list(range(num_tags))
+
+    def next_query(self) -> Query:
+        """Return the query of the pending tags, with the accepted ones inlined as text."""
+        if len(self.pending) == len(self.contents):
+            return self.query
+        pending = set(self.pending)
+        parts: list[ContextPart] = []
+        tag_index = 0
+        num_pending = 0
+        for part in self.query.parts[1:-1]:
+            if isinstance(part, MaskedTag):
+                if tag_index in pending:
+                    parts.append(
+                        MaskedTag._trusted(num_pending, part.name, part.desc, part.regex, None)
+                    )
+                    num_pending += 1
+                    tag_index += 1
+                    continue
+                part = cast("str", self.contents[tag_index])
+                tag_index += 1
+            if parts and isinstance(parts[-1], str):
+                parts[-1] += part
+            elif part:
+                parts.append(part)
+        return Query._from_parts(parts)
+
+    def update(
+        self, tier: int, result: Result | list[Result], accepts: Callable[[MaskedTag], bool]
+    ) -> tuple[int, int]:
+        """Record the tags filled by a model, and return how many were asked and accepted."""
+        if not isinstance(result, Result):
+            raise TypeError("A cascade expects one result per call, got a list of results.")
+        num_tags = len(self.pending)
+        still_pending = []
+        for tag_index, tag in zip(self.pending, result.tags, strict=True):
+            self.contents[tag_index] = tag.content
+            self.tiers[tag_index] = tier
+            self.accepted[tag_index] = accepts(tag)
+            if not self.accepted[tag_index]:
+                still_pending.append(tag_index)
+        self.pending = still_pending
+        return num_tags, num_tags - len(still_pending)
+
+    def result(self) -> CascadeResult:
+        parts: list[ContextPart] = []
+        tag_index = 0
+        for part in self.query.parts[1:-1]:
+            if isinstance(part, MaskedTag):
+                content = self.contents[tag_index]
+                part = MaskedTag._trusted(
+                    part.id,
+                    part.name,
+                    part.desc,
+                    part.regex,
+                    content=content if content is not None else part.content,
+                )
+                tag_index += 1
+            elif not part:
+                continue
+            parts.append(part)
+        result = cast("CascadeResult", CascadeResult._from_parts(parts))
+        result.tiers = self.tiers
+        result.accepted = self.accepted
+        return result
+
+
+class _CascadeBase(Generic[_M]):
+    def __init__(
+        self, models: Sequence[_M], validators: Mapping[str, Validator] | None = None
+    ) -> None:
+        if not models:
+            raise ValueError("A cascade needs at least one model.")
+        self._models: list[_M] = list(models)
+        self.validators = dict(validators or {})
+        self._stats = [TierStats(0, 0, 0, 0.0)] * len(self._models)
+        self._lock = threading.Lock()
+
+    @property
+    def models(self) -> list[_M]:
+        """The models of the cascade, from the cheapest to the strongest."""
+        return list(self._models)
+
+    def stats(self) -> list[TierStats]:
+        """Return the work done by each model of the cascade."""
+        with self._lock:
+            return list(self._stats)
+
+    def accepts(self, tag: MaskedTag) -> bool:
+        """Whether the content of a filled tag passes its regex and its validator.
+
+        Empty content never passes, and a validator raising a `ValueError` rejects the
+        content like one returning False.
+        """
+        if not tag.content or not tag.content_matches_regex():
+            return False
+        validator = self.validators.get(tag.name) if tag.name is not None else None
+        if validator is None:
+            return True
+        try:
+            return bool(validator(tag.content))
+        except ValueError:
+            return False
+
+    def _record(self, tier: int, counts: tuple[int, int], started_at: float) -> None:
+        num_tags, num_accepted = counts
+        with self._lock:
+            calls, tags, accepted, seconds = self._stats[tier]
+            self._stats[tier] = TierStats(
+                calls + 1,
+                tags + num_tags,
+                accepted + num_accepted,
+                seconds + time.monotonic() - started_at,
+            )
+        if num_accepted < num_tags and tier + 1 < len(self._models):
+            logger.debug(f"Escalating {num_tags - num_accepted} tag(s) to tier {tier + 1}.")
+
+
+def _is_async(model: Any) -> bool:
+    return inspect.iscoroutinefunction(model if inspect.isroutine(model) else type(model).__call__)
+
+
+class Cascade(_CascadeBase[SyncTier]):
+    """A cascade of synchronous models, from the cheapest to the strongest.
+
+    Inference kwargs are passed to every model, so they should suit all of them.
+
+    Args:
+        models: The models to call in turn, e.g. from `from_vllm` or `from_openai`.
+        validators: Checks of tag content by tag name, on top of the tag regexes.
+    """
+
+    def __init__(
+        self, models: Sequence[SyncTier], validators: Mapping[str, Validator] | None = None
+    ) -> None:
+        if any(_is_async(model) for model in models):
+            raise ValueError("Cascade expects synchronous models, use AsyncCascade instead.")
+        super().__init__(models, validators)
+
+    def __call__(self, model_input: ContextInput | Query, **inference_kwargs: Any) -> CascadeResult:
+        escalation = _Escalation(
+            model_input if isinstance(model_input, Query) else Query(model_input)
+        )
+        for tier, model in enumerate(self._models):
+            started_at = time.monotonic()
+            result = model(escalation.next_query(), **inference_kwargs)
+            self._record(tier, escalation.update(tier, result, self.accepts), started_at)
+            if not escalation.pending:
+                break
+        return escalation.result()
+
+    def map(
+        self,
+        model_inputs: Iterable[ContextInput | Query],
+        max_workers: int = 8,
+        ordered: bool = False,
+        **inference_kwargs: Any,
+    ) -> Iterator[BatchItem[ContextInput | Query]]:
+        """Run the cascade on every input from a thread pool, yielding items as they finish.
+
+        See `VLLM.map`. Results are `CascadeResult`s.
+        """
+        call = partial(self.__call__, **inference_kwargs)
+        return _map(call, model_inputs, max_workers, ordered)
+
+
+class AsyncCascade(_CascadeBase[AsyncTier]):
+    """A cascade of asynchronous models, from the cheapest to the strongest.
+
+    Inference kwargs are passed to every model, so they should suit all of them.
+
+    Args:
+        models: The models to call in turn, e.g. from `from_vllm` or `from_vllm_pool`.
+        validators: Checks of tag content by tag name, on top of the tag regexes.
+    """
+
+    def __init__(
+        self, models: Sequence[AsyncTier], validators: Mapping[str, Validator] | None = None
+    ) -> None:
+        if not all(_is_async(model) for model in models):
+            raise ValueError("AsyncCascade expects asynchronous models, use Cascade instead.")
+        super().__init__(models, validators)
+
+    async def __call__(
+        self, model_input: ContextInput | Query, **inference_kwargs: Any
+    ) -> CascadeResult:
+        escalation = _Escalation(
+            model_input if isinstance(model_input, Query) else Query(model_input)
+        )
+        for tier, model in enumerate(self._models):
+            started_at = time.monotonic()
+            result = await model(escalation.next_query(), **inference_kwargs)
+            self._record(tier, escalation.update(tier, result, self.accepts), started_at)
+            if not escalation.pending:
+                break
+        return escalation.result()
+
+    def amap(
+        self,
+        model_inputs: Iterable[ContextInput | Query] | AsyncIterable[ContextInput | Query],
+        concurrency: int = 8,
+        ordered: bool = False,
+        **inference_kwargs: Any,
+    ) -> AsyncIterator[BatchItem[ContextInput | Query]]:
+        """Run the cascade on every input with bounded concurrency, yielding items as they finish.
+
+        See `AsyncVLLM.amap`. Results are `CascadeResult`s.
+        """
+        call = partial(self.__call__, **inference_kwargs)
+        return _amap(call, model_inputs, concurrency, ordered)
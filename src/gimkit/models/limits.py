@@ -0,0 +1,687 @@
+"""Admission control for model calls.
+
+`AIMDLimiter` adapts the number of requests in flight to what the server sustains:
+the limit grows additively while requests complete with a healthy latency, and is cut
+multiplicatively on timeouts, rate-limit errors and latency spikes, as in TCP
+congestion control. Requests over the limit are dispatched by priority, then by
+earliest deadline, and requests whose deadline passes while queued are dropped.
+
+`RateLimiter` admits requests through token buckets for the request and token rate
+limits of hosted endpoints, and slows down when the endpoint answers with a 429.
+
+`HedgePolicy` decides when a slow request is worth duplicating to cut tail latency,
+within a budget of extra load."""
+
+import asyncio
+import bisect
+import heapq
+import itertools
+import math
+import threading
+import time
+
+from collections import deque
+from collections.abc import Callable
+from enum import IntEnum
+from typing import Any, NamedTuple, TypeAlias, TypeVar
+
+import openai
+
+from gimkit.caches import LRUCache
+from gimkit.contexts import Query
+from gimkit.exceptions import DeadlineExceededError
+from gimkit.models.utils import PreparedQuery
+from gimkit.schemas import RESPONSE_PREFIX, RESPONSE_SUFFIX, TAG_END, TAG_OPEN_LEFT, TAG_OPEN_RIGHT
+
+
+_E = TypeVar("_E", bound=BaseException)
+
+
+def _find_cause(error: BaseException | None, error_type: type[_E]) -> _E | None:
+    """Return the first of an error and its causes that is an instance of `error_type`."""
+    # Recent Outlines versions wrap provider errors, keeping the original one as the cause.
+    while error is not None:
+        if isinstance(error, error_type):
+            return error
+        error = error.__cause__
+    return None
+
+
+def _caused_by(error: BaseException | None, types: tuple[type[BaseException], ...]) -> bool:
+    """Whether an error, or one of its causes, is an instance of `types`."""
+    return any(_find_cause(error, error_type) is not None for error_type in types)
+
+
+def is_overload_error(error: BaseException | None) -> bool:
+    """Whether an error signals that the server is overloaded: a timeout or a 429."""
+    return _caused_by(
+        error,
+        (TimeoutError, asyncio.TimeoutError, openai.APITimeoutError, openai.RateLimitError),
+    )
+
+
+class Priority(IntEnum):
+    """Priority classes of requests. Lower values are dispatched first."""
+
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+
+class QueueStats(NamedTuple):
+    """Queueing statistics of one priority class."""
+
+    waiting: int
+    """The number of requests in the queue."""
+    dispatched: int
+    """The number of requests that got a slot, queued or not."""
+    expired: int
+    """The number of requests dropped because their deadline passed."""
+    mean_wait: float
+    """The mean time dispatched requests spent queued, in seconds."""
+    max_wait: float
+    """The longest time a dispatched request spent queued, in seconds."""
+
+
+class _QueueCounters:
+    __slots__ = ("dispatched", "expired", "max_wait", "total_wait", "waiting")
+
+    def __init__(self) -> None:
+        self.waiting = 0
+        self.dispatched = 0
+        self.expired = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def dispatch(self, wait: float) -> None:
+        self.dispatched += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+    def stats(self) -> QueueStats:
+        mean_wait = self.total_wait / self.dispatched if self.dispatched else 0.0
+        return QueueStats(self.waiting, self.dispatched, self.expired, mean_wait, self.max_wait)
+
+
+# A queued request: priority, deadline, arrival order, enqueue time and the future
+# resolved when it gets a slot.
+_QueueEntry: TypeAlias = tuple[int, float, int, float, "asyncio.Future[None]"]
+
+
+def _deadline_error(priority: int) -> DeadlineExceededError:
+    return DeadlineExceededError(
+        f"The deadline of a request of priority {priority} passed before it was sent."
+    )
+
+
+def check_deadline(deadline: float | None, priority: int = Priority.NORMAL) -> None:
+    """Raise `DeadlineExceededError` if a deadline (in `time.monotonic()` time) has passed."""
+    if deadline is not None and deadline <= time.monotonic():
+        raise _deadline_error(priority)
+
+
+class LimiterInfo(NamedTuple):
+    """A snapshot of the state of a limiter."""
+
+    limit: int
+    in_flight: int
+    waiting: int
+    increases: int
+    """The number of completions that raised the limit."""
+    decreases: int
+    """The number of times the limit was cut."""
+
+
+class AIMDLimiter:
+    """An adaptive limit on the number of requests in flight (additive increase,
+    multiplicative decrease).
+
+    Each request completing with a latency under `latency_tolerance` times the usual
+    one raises the limit by about one per round of `limit` requests, as long as the
+    limit is actually used. A timeout, a 429 or a latency spike multiplies the limit
+    by `backoff`, at most once per congestion event: requests started before a cut do
+    not cut it again.
+
+    Requests over the limit wait in line for a slot: those of a lower `priority` go
+    first, then those with the earliest deadline, then the oldest. A request whose
+    deadline passes while it waits leaves the line with a `DeadlineExceededError`.
+    Use `queue_stats()` to monitor the queue of each priority class, and set
+    `min_limit == max_limit` for a fixed limit.
+
+    The usual latency is a moving average of healthy latencies. Set
+    `latency_tolerance` to None to only react to errors, e.g. when response lengths
+    vary a lot. A limiter is not thread-safe, and should be used from one event loop.
+
+    Args:
+        initial_limit (int): The limit to start from.
+        min_limit (int): The lowest limit.
+        max_limit (int): The highest limit.
+        backoff (float): The factor applied to the limit on congestion, in (0, 1).
+        latency_tolerance (float | None): How many times the usual latency counts as
+            a spike.
+        smoothing (float): The weight of new latencies in their moving average.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 256,
+        backoff: float = 0.5,
+        latency_tolerance: float | None = 3.0,
+        smoothing: float = 0.1,
+    ) -> None:
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError(
+                "Limits should satisfy 1 <= min_limit <= initial_limit <= max_limit, got "
+                f"{min_limit}, {initial_limit} and {max_limit}."
+            )
+        if not 0 < backoff < 1:
+            raise ValueError(f"backoff should be in (0, 1), got {backoff}.")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._queue: list[_QueueEntry] = []
+        self._num_waiting = 0
+        self._arrivals = itertools.count()
+        self._queues: dict[int, _QueueCounters] = {}
+        self._latency: float | None = None
+        self._last_decrease = -math.inf
+        self._increases = 0
+        self._decreases = 0
+
+    @property
+    def limit(self) -> int:
+        """The current number of requests allowed in flight."""
+        return int(self._limit)
+
+    @property
+    def latency(self) -> float | None:
+        """The moving average of healthy latencies in seconds, if any was measured."""
+        return self._latency
+
+    def info(self) -> LimiterInfo:
+        return LimiterInfo(
+            self.limit, self._in_flight, self._num_waiting, self._increases, self._decreases
+        )
+
+    def queue_stats(self) -> dict[int, QueueStats]:
+        """Return the queueing statistics of each priority class seen so far."""
+        return {priority: counters.stats() for priority, counters in sorted(self._queues.items())}
+
+    async def acquire(
+        self, priority: int = Priority.NORMAL, deadline: float | None = None
+    ) -> float:
+        """Wait for a slot, and return the start time to pass to `release`.
+
+        Args:
+            priority: The priority class of the request. Lower values go first.
+            deadline: The `time.monotonic()` time after which the request is dropped
+                if it has not got a slot yet.
+
+        Raises:
+            DeadlineExceededError: If the deadline passes before a slot is free.
+        """
+        counters = self._queues.setdefault(priority, _QueueCounters())
+        try:
+            check_deadline(deadline, priority)
+        except DeadlineExceededError:
+            counters.expired += 1
+            raise
+        if self._in_flight < self.limit and not self._num_waiting:
+            self._in_flight += 1
+            counters.dispatch(0.0)
+            return time.monotonic()
+
+        now = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        entry = (
+            priority,
+            deadline if deadline is not None else math.inf,
+            next(self._arrivals),
+            now,
+            future,
+        )
+        heapq.heappush(self._queue, entry)
+        self._num_waiting += 1
+        counters.waiting += 1
+        try:
+            if deadline is None:
+                await future
+            else:
+                await asyncio.wait_for(asyncio.shield(future), deadline - now)
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just before, so pass it on.
+                self._in_flight -= 1
+                self._wake()
+            else:
+                # Entries are left in the queue, and skipped once their future is done.
+                future.cancel()
+                self._num_waiting -= 1
+                counters.waiting -= 1
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            counters.expired += 1
+            raise _deadline_error(priority) from None
+        return time.monotonic()
+
+    def release(self, started_at: float, error: BaseException | None = None) -> None:
+        """Free the slot of a request, and adapt the limit to its outcome.
+
+        Errors other than overload signals, including cancellations, leave the limit
+        unchanged.
+        """
+        now = time.monotonic()
+        was_used = self._in_flight >= self.limit / 2
+        self._in_flight -= 1
+        latency = now - started_at
+        if is_overload_error(error) or (error is None and self._is_spike(latency)):
+            if started_at >= self._last_decrease:
+                self._limit = max(self.min_limit, self._limit * self.backoff)
+                self._last_decrease = now
+                self._decreases += 1
+        elif error is None:
+            self._latency = (
+                latency
+                if self._latency is None
+                else self._latency + self.smoothing * (latency - self._latency)
+            )
+            if was_used and self._limit < self.max_limit:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+                self._increases += 1
+        self._wake()
+
+    def _is_spike(self, latency: float) -> bool:
+        return (
+            self.latency_tolerance is not None
+            and self._latency is not None
+            and latency > self.latency_tolerance * self._latency
+        )
+
+    def _wake(self) -> None:
+        now = time.monotonic()
+        while self._queue and self._in_flight < self.limit:
+            priority, deadline, _, enqueued_at, future = heapq.heappop(self._queue)
+            # Expired requests are dropped by their own timeout.
+            if future.done() or deadline <= now:
+                continue
+            self._in_flight += 1
+            self._num_waiting -= 1
+            counters = self._queues[priority]
+            counters.waiting -= 1
+            counters.dispatch(now - enqueued_at)
+            future.set_result(None)
+
+
+# ─── Rate Limits ──────────────────────────────────────────────────────────────
+
+
+class TokenBucket:
+    """A thread-safe token bucket refilled at `per_minute` tokens per minute.
+
+    Tokens are reserved ahead: a reservation always succeeds and returns how long to
+    wait before using it, so requests are served in order and large ones are not
+    starved by small ones.
+    """
+
+    def __init__(self, per_minute: float) -> None:
+        if per_minute <= 0:
+            raise ValueError(f"per_minute should be positive, got {per_minute}.")
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = -math.inf
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` tokens, and return the number of seconds to wait before use."""
+        with self._lock:
+            now = self._refill()
+            # A request larger than the bucket would never fit, so it waits for a full one.
+            self._tokens -= min(amount, self.capacity)
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._blocked_until - now)
+
+    def refund(self, amount: float) -> None:
+        """Give back tokens that were reserved but not used."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+    def pause(self, seconds: float) -> None:
+        """Hold new reservations for `seconds`, as asked by the server."""
+        with self._lock:
+            now = self._refill()
+            self._tokens = min(self._tokens, 0.0)
+            self._blocked_until = max(self._blocked_until, now + seconds)
+
+    def _refill(self) -> float:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return now
+
+
+class TokenEstimate(NamedTuple):
+    """The estimated tokens of a request, counted against the token rate limit."""
+
+    prompt: int
+    completion: int
+
+    @property
+    def total(self) -> int:
+        return self.prompt + self.completion
+
+
+class RateLimiterInfo(NamedTuple):
+    """Counters of a rate limiter."""
+
+    requests: int
+    """The number of requests admitted, retries included."""
+    tokens: int
+    """The number of tokens counted against the token rate limit."""
+    waited: float
+    """The total time requests waited for admission, in seconds."""
+    rate_limited: int
+    """The number of requests rejected by the endpoint with a 429."""
+
+
+# Above this many characters, the content of a tag is considered unbounded.
+_MAX_BOUNDED_CHARS = 4096
+
+_REGEX_WIDTH_CACHE: LRUCache[str, int | None] = LRUCache(maxsize=256)
+
+
+def _regex_max_chars(regex: str) -> int | None:
+    """Return the maximum length of the strings matched by a regex, or None if unbounded."""
+
+    def compute() -> int | None:
+        try:
+            from re import _parser as sre_parse  # type: ignore[attr-defined]
+        except ImportError:  # pragma: no cover - Python 3.10
+            import sre_parse
+        try:
+            max_chars = sre_parse.parse(regex).getwidth()[1]
+        except Exception:  # noqa: BLE001
+            return None
+        return max_chars if max_chars <= _MAX_BOUNDED_CHARS else None
+
+    return _REGEX_WIDTH_CACHE.get_or_create(regex, compute)
+
+
+class RateLimiter:
+    """Admit requests to a hosted endpoint within its request and token rate limits.
+
+    The tokens of a request are estimated before sending it: the rendered prompt,
+    plus a bound of the response derived from the tags of the query (their regex
+    gives the longest content they can hold) and capped by `max_tokens`. Once the
+    response is received, the reserved completion tokens it did not use are given
+    back. A 429 pauses both buckets for the time given by the `retry-after` headers
+    of the response, or an exponential backoff, and the request is retried up to
+    `max_retries` times.
+
+    Args:
+        requests_per_minute (float | None): The request rate limit, or None.
+        tokens_per_minute (float | None): The token rate limit, or None.
+        max_retries (int): How many times a rate-limited request is retried.
+        chars_per_token (float): The average number of characters per token, used to
+            estimate token counts when `count_tokens` is not given.
+        tag_tokens (int): The tokens allowed for the content of a tag without a
+            bounded regex.
+        count_tokens (Callable[[str], int] | None): A function counting the tokens of
+            a text, such as a tokenizer's.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        max_retries: int = 3,
+        chars_per_token: float = 4.0,
+        tag_tokens: int = 64,
+        count_tokens: Callable[[str], int] | None = None,
+    ) -> None:
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.chars_per_token = chars_per_token
+        self.tag_tokens = tag_tokens
+        self.count_tokens = count_tokens
+        self._lock = threading.Lock()
+        self._info = RateLimiterInfo(0, 0, 0.0, 0)
+
+    def info(self) -> RateLimiterInfo:
+        return self._info
+
+    def estimate(self, prepared: PreparedQuery, inference_kwargs: dict[str, Any]) -> TokenEstimate:
+        """Estimate the prompt and completion tokens of a request."""
+        model_input = prepared.model_input
+        if isinstance(model_input, str):
+            prompt = self._count(model_input)
+        else:
+            # Chat formats add a few tokens around each message.
+            prompt = sum(
+                self._count(str(message.get("content", ""))) + 4 for message in model_input.messages
+            )
+        completion = self._completion_bound(prepared.query, prepared.output_type == "json")
+        max_tokens = inference_kwargs.get("max_completion_tokens") or inference_kwargs.get(
+            "max_tokens"
+        )
+        if max_tokens is not None:
+            completion = min(completion, max_tokens)
+        return TokenEstimate(prompt, completion * inference_kwargs.get("n", 1))
+
+    def reserve(self, estimate: TokenEstimate) -> float:
+        """Reserve the request and its tokens, and return the number of seconds to wait."""
+        wait = 0.0
+        if self.requests is not None:
+            wait = self.requests.reserve(1)
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(estimate.total))
+        with self._lock:
+            requests, tokens, waited, rate_limited = self._info
+            self._info = RateLimiterInfo(
+                requests + 1, tokens + estimate.total, waited + wait, rate_limited
+            )
+        return wait
+
+    def settle(self, estimate: TokenEstimate, raw_responses: str | list[str]) -> None:
+        """Give back the completion tokens reserved for a request but not used."""
+        if self.tokens is None:
+            return
+        texts = [raw_responses] if isinstance(raw_responses, str) else raw_responses
+        unused = estimate.completion - sum(self._count(text) for text in texts)
+        if unused > 0:
+            self.tokens.refund(unused)
+            with self._lock:
+                requests, tokens, waited, rate_limited = self._info
+                self._info = RateLimiterInfo(requests, tokens - unused, waited, rate_limited)
+
+    def cancel(self, estimate: TokenEstimate) -> None:
+        """Give back the whole reservation of a request that was not sent."""
+        if self.requests is not None:
+            self.requests.refund(1)
+        if self.tokens is not None:
+            self.tokens.refund(estimate.total)
+        with self._lock:
+            requests, tokens, waited, rate_limited = self._info
+            self._info = RateLimiterInfo(
+                requests - 1, tokens - estimate.total, waited, rate_limited
+            )
+
+    def backoff(self, error: BaseException, attempt: int) -> float | None:
+        """Return how long to pause after a failed attempt, or None if not to retry.
+
+        Only rate-limit errors are retried, and they pause the buckets for everyone.
+        """
+        rate_limit_error = _find_cause(error, openai.RateLimitError)
+        if rate_limit_error is None or attempt >= self.max_retries:
+            return None
+        delay = _retry_after(rate_limit_error)
+        if delay is None:
+            delay = 2.0**attempt
+        for bucket in (self.requests, self.tokens):
+            if bucket is not None:
+                bucket.pause(delay)
+        with self._lock:
+            requests, tokens, waited, rate_limited = self._info
+            self._info = RateLimiterInfo(requests, tokens, waited, rate_limited + 1)
+        return delay
+
+    def _count(self, text: str) -> int:
+        if self.count_tokens is not None:
+            return self.count_tokens(text)
+        return self._chars_to_tokens(len(text))
+
+    def _chars_to_tokens(self, num_chars: int) -> int:
+        return math.ceil(num_chars / self.chars_per_token)
+
+    def _completion_bound(self, query: Query, json_responses: bool) -> int:
+        markup_chars = 0 if json_responses else len(RESPONSE_PREFIX) + len(RESPONSE_SUFFIX)
+        content_tokens = 0
+        for i, tag in enumerate(query.tags):
+            if json_responses:
+                markup_chars += len(f'"m_{i}": "", ')
+            else:
+                markup_chars += len(f'{TAG_OPEN_LEFT} id="m_{i}"{TAG_OPEN_RIGHT}{TAG_END}')
+            max_chars = _regex_max_chars(tag.regex) if tag.regex is not None else None
+            content_tokens += (
+                self._chars_to_tokens(max_chars) if max_chars is not None else self.tag_tokens
+            )
+        return self._chars_to_tokens(markup_chars) + content_tokens
+
+
+def _retry_after(error: openai.RateLimitError) -> float | None:
+    headers = getattr(error.response, "headers", None) or {}
+    for header, scale in (("retry-after-ms", 1e-3), ("retry-after", 1.0)):
+        try:
+            return float(headers[header]) * scale
+        except (KeyError, TypeError, ValueError):
+            continue
+    return None
+
+
+# ─── Hedging ──────────────────────────────────────────────────────────────────
+
+
+class HedgeInfo(NamedTuple):
+    """A snapshot of the activity of a hedge policy."""
+
+    requests: int
+    """The number of calls made under the policy."""
+    hedges: int
+    """The number of duplicate requests sent."""
+    wins: int
+    """The number of hedges that finished before the request they duplicated."""
+    denied: int
+    """The number of hedges not sent because the extra load budget was spent."""
+    delay: float | None
+    """The current hedge delay in seconds, or None while latencies are too few."""
+
+    @property
+    def hedge_rate(self) -> float:
+        """The fraction of calls that sent a hedge."""
+        return self.hedges / self.requests if self.requests else 0.0
+
+    @property
+    def win_rate(self) -> float:
+        """The fraction of hedges that won."""
+        return self.wins / self.hedges if self.hedges else 0.0
+
+
+class HedgePolicy:
+    """Decide when to duplicate a slow request, as in "The Tail at Scale".
+
+    A call still running after the `percentile` of recent call latencies is sent
+    again, and the first response wins. Hedging starts once `min_samples` latencies are
+    known. The extra load is bounded by a budget: each call adds `max_extra_load` to it,
+    up to `burst`, and each hedge spends 1, so hedges stay within `max_extra_load` of
+    the calls over time even when the server slows down as a whole.
+
+    The policy is not thread-safe: share it between async calls of one event loop.
+
+    Args:
+        percentile: The percentile of recent latencies after which a hedge is sent.
+        max_extra_load: The fraction of extra requests that hedges may add.
+        burst: The number of hedges that may be sent in a row.
+        min_delay: The shortest hedge delay, in seconds.
+        window: The number of recent latencies to compute the percentile from.
+        min_samples: The number of latencies needed before hedging.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        max_extra_load: float = 0.05,
+        burst: float = 10.0,
+        min_delay: float = 0.0,
+        window: int = 1000,
+        min_samples: int = 20,
+    ) -> None:
+        if not 0 < percentile < 100:
+            raise ValueError(f"percentile should be in (0, 100), got {percentile}.")
+        if not 0 <= max_extra_load <= 1 or burst < 1:
+            raise ValueError(
+                "max_extra_load should be in [0, 1] and burst at least 1, "
+                f"got {max_extra_load} and {burst}."
+            )
+        self.percentile = percentile
+        self.max_extra_load = max_extra_load
+        self.burst = burst
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.window = window
+        # Latencies in arrival order, to evict the oldest, and sorted, to read percentiles
+        self._latencies: deque[float] = deque()
+        self._sorted_latencies: list[float] = []
+        self._budget = 0.0
+        self._requests = 0
+        self._hedges = 0
+        self._wins = 0
+        self._denied = 0
+
+    @property
+    def delay(self) -> float | None:
+        """How long a request may run before it is hedged, or None to not hedge yet."""
+        ordered = self._sorted_latencies
+        if len(ordered) < max(self.min_samples, 1):
+            return None
+        rank = math.ceil(self.percentile / 100 * len(ordered)) - 1
+        return max(ordered[rank], self.min_delay)
+
+    def info(self) -> HedgeInfo:
+        return HedgeInfo(self._requests, self._hedges, self._wins, self._denied, self.delay)
+
+    def start(self) -> float | None:
+        """Count a new call, and return its hedge delay."""
+        self._requests += 1
+        self._budget = min(self._budget + self.max_extra_load, self.burst)
+        return self.delay
+
+    def try_hedge(self) -> bool:
+        """Spend the budget of one hedge, if available."""
+        if self._budget < 1:
+            self._denied += 1
+            return False
+        self._budget -= 1
+        self._hedges += 1
+        return True
+
+    def record(self, latency: float, hedge: bool = False) -> None:
+        """Record the latency of a successful call, and whether a hedge answered it.
+
+        The latency runs from the start of the call, whichever request answered it.
+        """
+        if len(self._latencies) >= self.window:
+            oldest = self._latencies.popleft()
+            del self._sorted_latencies[bisect.bisect_left(self._sorted_latencies, oldest)]
+        self._latencies.append(latency)
+        bisect.insort(self._sorted_latencies, latency)
+        if hedge:
+            self._wins += 1
@@ -10,14 +10,35 @@ from outlines.models.openai import AsyncOpenAI as OutlinesAsyncOpenAI
 from outlines.models.openai import OpenAI as OutlinesOpenAI
 
 from gimkit.contexts import Query, Result
-from gimkit.models.base import _acall, _call
+from gimkit.models.base import (
+    AsyncMapMixin,
+    AsyncStreamMixin,
+    ConcurrencyLimitMixin,
+    GeneratorCacheMixin,
+    HedgingMixin,
+    MapMixin,
+    RateLimitMixin,
+    RequestCoalescingMixin,
+    ResponseCacheMixin,
+    StreamMixin,
+    _acall,
+    _call,
+)
+from gimkit.models.utils import PreparedQuery
 from gimkit.schemas import ContextInput
 
 
-class OpenAI(OutlinesOpenAI):
+def _text_output_by_default(call_kwargs: dict[str, Any]) -> dict[str, Any]:
+    # OpenAI models do not support CFG, so their output is unconstrained unless asked.
+    return {"output_type": None, **call_kwargs}
+
+
+class OpenAI(  # type: ignore[misc]
+    MapMixin, StreamMixin, GeneratorCacheMixin, ResponseCacheMixin, RateLimitMixin, OutlinesOpenAI
+):
     def __call__(
         self,
-        model_input: ContextInput | Query,
+        model_input: ContextInput | Query | PreparedQuery,
         output_type: Literal["json"] | None = None,
         backend: str | None = None,
         use_gim_prompt: bool = False,
@@ -34,11 +55,23 @@ class OpenAI(OutlinesOpenAI):
             **inference_kwargs,
         )
 
+    _call_kwargs = staticmethod(_text_output_by_default)
 
-class AsyncOpenAI(OutlinesAsyncOpenAI):
+
+class AsyncOpenAI(
+    AsyncMapMixin,
+    AsyncStreamMixin,
+    GeneratorCacheMixin,
+    ResponseCacheMixin,
+    RequestCoalescingMixin,
+    ConcurrencyLimitMixin,
+    HedgingMixin,
+    RateLimitMixin,
+    OutlinesAsyncOpenAI,
+):
     async def __call__(
         self,
-        model_input: ContextInput | Query,
+        model_input: ContextInput | Query | PreparedQuery,
         output_type: Literal["json"] | None = None,
         backend: str | None = None,
         use_gim_prompt: bool = False,
@@ -55,6 +88,8 @@ class AsyncOpenAI(OutlinesAsyncOpenAI):
             **inference_kwargs,
         )
 
+    _call_kwargs = staticmethod(_text_output_by_default)
+
 
 @overload
 def from_openai(
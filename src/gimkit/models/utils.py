@@ -1,17 +1,29 @@
-from typing import Literal, overload
+import re
+
+from dataclasses import dataclass
+from typing import Literal, TypeAlias, cast, overload
 
 from outlines.inputs import Chat
 from outlines.types.dsl import CFG, JsonSchema
 
-from gimkit.contexts import Query, Response, Result, infill
-from gimkit.dsls import build_cfg, build_json_schema
+from gimkit.contexts import Query, Response, Result, infill, infill_many
+from gimkit.dsls import build_cfg, build_json_schema, build_json_validator
+from gimkit.exceptions import InvalidFormatError
 from gimkit.prompts import (
     DEMO_CONVERSATION_MSGS,
     DEMO_CONVERSATION_MSGS_JSON,
     SYSTEM_PROMPT_MSG,
     SYSTEM_PROMPT_MSG_JSON,
 )
-from gimkit.schemas import ContextInput, MaskedTag
+from gimkit.schemas import (
+    ContextInput,
+    ContextPart,
+    MaskedTag,
+    StreamingResponseParser,
+)
+
+
+_JSON_FIELD_NAME_PATTERN = re.compile(r"m_(\d+)")
 
 
 def get_outlines_model_input(
@@ -64,6 +76,59 @@ def get_outlines_output_type(
         raise ValueError(f"Invalid output type: {output_type}")
 
 
+@dataclass(frozen=True, slots=True)
+class PreparedQuery:
+    """A query parsed and rendered once, ready to be sent to a model any number of times.
+
+    Create it with `prepare_query` and pass it to a model in place of the raw input. The
+    preparation options stored here take precedence over those given in the model call.
+    """
+
+    query: Query
+    output_type: Literal["cfg", "json"] | None
+    use_gim_prompt: bool
+    include_grammar: bool
+    model_input: str | Chat
+    """The rendered prompt, or the chat messages when the GIM prompt is used."""
+    outlines_output_type: CFG | JsonSchema | None
+    """The CFG or JSON schema constraining the output, if any."""
+
+    def chat_input(self) -> Chat:
+        """Return the model input as chat messages, wrapping a plain prompt if needed."""
+        if isinstance(self.model_input, Chat):
+            return self.model_input
+        return Chat([{"role": "user", "content": self.model_input}])
+
+
+def prepare_query(
+    model_input: ContextInput | Query | PreparedQuery,
+    output_type: Literal["cfg", "json"] | None = "cfg",
+    use_gim_prompt: bool = False,
+    include_grammar: bool = False,
+) -> PreparedQuery:
+    """Parse the model input and render everything a model call needs from it.
+
+    An already prepared query is returned unchanged, whatever the other arguments are.
+    """
+    if isinstance(model_input, PreparedQuery):
+        return model_input
+    query_obj = Query(model_input) if not isinstance(model_input, Query) else model_input
+    return PreparedQuery(
+        query=query_obj,
+        output_type=output_type,
+        use_gim_prompt=use_gim_prompt,
+        include_grammar=include_grammar,
+        model_input=get_outlines_model_input(
+            query_obj, output_type, use_gim_prompt, include_grammar
+        ),
+        outlines_output_type=get_outlines_output_type(query_obj, output_type),
+    )
+
+
+# Anything a model can be called with.
+ModelInput: TypeAlias = ContextInput | Query | PreparedQuery
+
+
 def json_responses_to_gim_response(json_response: str) -> str:
     """Convert a JSON response string to a GIM response string.
 
@@ -76,8 +141,10 @@ def json_responses_to_gim_response(json_response: str) -> str:
     Raises:
         ValueError: If any key does not follow the "m_X" format where X is an integer.
     """
-    import re
+    return _json_obj_to_gim_response(_decode_json_response(json_response))
+
 
+def _decode_json_response(json_response: str) -> dict:
     import json_repair
 
     from gimkit.log import get_logger
@@ -99,10 +166,13 @@ def json_responses_to_gim_response(json_response: str) -> str:
         json_obj = result  # type: ignore[assignment]
     if not isinstance(json_obj, dict):
         raise ValueError(f"Expected JSON response to be a dictionary, got {type(json_obj)}")
+    return json_obj
 
+
+def _json_obj_to_gim_response(json_obj: dict) -> str:
     validated_items = []
     for field_name, content in json_obj.items():
-        match_result = re.fullmatch(r"m_(\d+)", field_name)
+        match_result = _JSON_FIELD_NAME_PATTERN.fullmatch(field_name)
         if not match_result:
             raise ValueError(
                 f"Invalid field name in JSON response: {field_name}. Expected format 'm_X' where X is an integer."
@@ -116,27 +186,60 @@ def json_responses_to_gim_response(json_response: str) -> str:
     )
 
 
+def _json_responses_to_gim_responses(
+    query: Query, json_responses: list[str], strict: bool
+) -> list[str]:
+    """Decode JSON responses and check them against the query's schema before conversion."""
+    from gimkit.log import get_logger
+
+    validator = build_json_validator(query)
+    gim_responses = []
+    for json_response in json_responses:
+        json_obj = _decode_json_response(json_response)
+        if errors := validator.errors(json_obj):
+            message = "Invalid JSON response: " + " ".join(errors)
+            if strict:
+                raise InvalidFormatError(message)
+            get_logger(__name__).warning("%s Response: %s", message, json_response)
+        gim_responses.append(_json_obj_to_gim_response(json_obj))
+    return gim_responses
+
+
 @overload
 def infill_responses(
-    query: ContextInput | Query, responses: str, json_responses: bool = False
+    query: ContextInput | Query,
+    responses: str,
+    json_responses: bool = False,
+    strict: bool = False,
 ) -> Result: ...
 
 
 @overload
 def infill_responses(
-    query: ContextInput | Query, responses: list[str], json_responses: bool = False
+    query: ContextInput | Query,
+    responses: list[str],
+    json_responses: bool = False,
+    strict: bool = False,
 ) -> list[Result]: ...
 
 
 def infill_responses(
-    query: ContextInput | Query, responses: str | list[str], json_responses: bool = False
+    query: ContextInput | Query,
+    responses: str | list[str],
+    json_responses: bool = False,
+    strict: bool = False,
 ) -> Result | list[Result]:
-    """Infill the provided query with content from the GIM responses or JSON responses."""
+    """Infill the provided query with content from the GIM responses or JSON responses.
+
+    JSON responses are checked against the query's JSON schema first. An invalid one
+    raises `InvalidFormatError` in strict mode and is logged as a warning otherwise.
+    """
     # Handle single string response
     if isinstance(responses, str):
         if json_responses:
-            responses = json_responses_to_gim_response(responses)
-        return infill(query, responses)
+            query = Query(query) if not isinstance(query, Query) else query
+            responses = _json_responses_to_gim_responses(query, [responses], strict)[0]
+        return infill(query, responses, strict=strict)
 
     # Handle list of responses
     if not isinstance(responses, list):
@@ -148,4 +251,73 @@ def infill_responses(
     if not all(isinstance(resp, str) for resp in responses):
         raise TypeError(f"All items in the response list must be strings, got: {responses}")
 
-    return [infill_responses(query, resp, json_responses=json_responses) for resp in responses]
+    if json_responses:
+        query = Query(query) if not isinstance(query, Query) else query
+        responses = _json_responses_to_gim_responses(query, responses, strict)
+    return infill_many(query, responses, strict=strict)
+
+
+class ProgressiveInfill:
+    """Infill a prepared query tag by tag while its response is streamed in.
+
+    `feed` returns a partial Result each time a delta completes at least one tag, where
+    the tags not received yet keep their query content. `finish` returns the final
+    Result, computed from the full response exactly as in a non-streaming call. JSON
+    responses cannot be split by tags, so they only produce the final Result.
+
+    Successive partial Results share the tags filled so far, which must not be modified.
+    """
+
+    def __init__(self, prepared: PreparedQuery) -> None:
+        self._prepared = prepared
+        self._parts: list[ContextPart] = [part for part in prepared.query.parts[1:-1] if part]
+        self._tag_positions = [
+            i for i, part in enumerate(self._parts) if isinstance(part, MaskedTag)
+        ]
+        self._num_filled = 0
+        self._chunks: list[str] = []
+        self._parser: StreamingResponseParser | None = (
+            StreamingResponseParser() if prepared.output_type != "json" else None
+        )
+
+    def feed(self, delta: str) -> Result | None:
+        """Consume a response delta and return a partial Result if tags were completed."""
+        self._chunks.append(delta)
+        if self._parser is None:
+            return None
+        try:
+            tags = self._parser.feed(delta)
+        except InvalidFormatError:
+            # Malformed responses are repaired, or rejected, by `finish` like in other calls.
+            self._parser = None
+            return None
+
+        filled = False
+        for tag in tags:
+            if self._num_filled == len(self._tag_positions):
+                break
+            position = self._tag_positions[self._num_filled]
+            query_tag = cast("MaskedTag", self._parts[position])
+            self._parts[position] = MaskedTag._trusted(
+                query_tag.id,
+                query_tag.name,
+                query_tag.desc,
+                query_tag.regex,
+                tag.content if tag.content is not None else query_tag.content,
+            )
+            self._num_filled += 1
+            filled = True
+        return Result._from_parts(self._parts[:]) if filled else None
+
+    @property
+    def text(self) -> str:
+        """The response received so far."""
+        return "".join(self._chunks)
+
+    def finish(self) -> Result:
+        """Return the Result of the complete response."""
+        return infill_responses(
+            self._prepared.query,
+            self.text,
+            json_responses=(self._prepared.output_type == "json"),
+        )
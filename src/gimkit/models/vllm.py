@@ -9,23 +9,42 @@ from outlines.models.vllm import VLLM as OutlinesVLLM
 from outlines.models.vllm import AsyncVLLM as OutlinesAsyncVLLM
 
 from gimkit.contexts import Query, Result
-from gimkit.models.base import _acall, _call
+from gimkit.models.base import (
+    AsyncMapMixin,
+    AsyncStreamMixin,
+    ConcurrencyLimitMixin,
+    GeneratorCacheMixin,
+    HedgingMixin,
+    MapMixin,
+    RequestCoalescingMixin,
+    ResponseCacheMixin,
+    StreamMixin,
+    _acall,
+    _call,
+)
+from gimkit.models.utils import PreparedQuery
 from gimkit.schemas import RESPONSE_SUFFIX, ContextInput
 
 
-class VLLM(OutlinesVLLM):
+def _stop_at_response_suffix(call_kwargs: dict[str, Any]) -> dict[str, Any]:
+    # Using `stop=RESPONSE_SUFFIX` is preferred for two reasons:
+    # 1. The model might not be trained well enough to generate EOS tokens immediately after RESPONSE_SUFFIX.
+    # 2. Even with CFG, inference engines like vLLM do not guarantee termination when the CFG is satisfied (See https://github.com/vllm-project/vllm/issues/29632).
+    return {"stop": RESPONSE_SUFFIX, **call_kwargs}
+
+
+class VLLM(  # type: ignore[misc]
+    MapMixin, StreamMixin, GeneratorCacheMixin, ResponseCacheMixin, OutlinesVLLM
+):
     def __call__(
         self,
-        model_input: ContextInput | Query,
+        model_input: ContextInput | Query | PreparedQuery,
         output_type: Literal["cfg", "json"] | None = "cfg",
         backend: str | None = None,
         use_gim_prompt: bool = False,
         include_grammar: bool = False,
         **inference_kwargs: Any,
     ) -> Result | list[Result]:
-        # Using `stop=RESPONSE_SUFFIX` is preferred for two reasons:
-        # 1. The model might not be trained well enough to generate EOS tokens immediately after RESPONSE_SUFFIX.
-        # 2. Even with CFG, inference engines like vLLM do not guarantee termination when the CFG is satisfied (See https://github.com/vllm-project/vllm/issues/29632).
         return _call(
             self,
             model_input,
@@ -33,15 +52,25 @@ class VLLM(OutlinesVLLM):
             backend,
             use_gim_prompt,
             include_grammar,
-            stop=RESPONSE_SUFFIX,
-            **inference_kwargs,
+            **self._call_kwargs(inference_kwargs),
         )
 
+    _call_kwargs = staticmethod(_stop_at_response_suffix)
 
-class AsyncVLLM(OutlinesAsyncVLLM):
+
+class AsyncVLLM(
+    AsyncMapMixin,
+    AsyncStreamMixin,
+    GeneratorCacheMixin,
+    ResponseCacheMixin,
+    RequestCoalescingMixin,
+    ConcurrencyLimitMixin,
+    HedgingMixin,
+    OutlinesAsyncVLLM,
+):
     async def __call__(
         self,
-        model_input: ContextInput | Query,
+        model_input: ContextInput | Query | PreparedQuery,
         output_type: Literal["cfg", "json"] | None = "cfg",
         backend: str | None = None,
         use_gim_prompt: bool = False,
@@ -55,10 +84,11 @@ class AsyncVLLM(OutlinesAsyncVLLM):
             backend,
             use_gim_prompt,
             include_grammar,
-            stop=RESPONSE_SUFFIX,
-            **inference_kwargs,
+            **self._call_kwargs(inference_kwargs),
         )
 
+    _call_kwargs = staticmethod(_stop_at_response_suffix)
+
 
 @overload
 def from_vllm(client: OpenAIClient, model_name: str | None = None) -> VLLM: ...
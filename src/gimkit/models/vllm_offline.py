@@ -1,15 +1,27 @@
 # Adapted from https://github.com/dottxt-ai/outlines/blob/main/outlines/models/vllm_offline.py
 
 
-from typing import TYPE_CHECKING, Any, Literal, cast
+import json
+
+from collections.abc import Iterator, Sequence
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, Literal, NamedTuple, cast
 
 from outlines.generator import Generator
 from outlines.models.vllm_offline import VLLMOffline as OutlinesVLLMOffline
 
+from gimkit.caches import LRUCache, RawResponse
 from gimkit.contexts import Query, Result
 from gimkit.log import get_logger
-from gimkit.models.utils import get_outlines_model_input, get_outlines_output_type, infill_responses
-from gimkit.schemas import RESPONSE_SUFFIX, ContextInput
+from gimkit.models.base import (
+    GeneratorCacheMixin,
+    ResponseCacheMixin,
+    _lookup_response,
+    _store_response,
+    generator_key,
+)
+from gimkit.models.utils import PreparedQuery, infill_responses, prepare_query
+from gimkit.schemas import QUERY_PREFIX, RESPONSE_SUFFIX, ContextInput
 
 
 logger = get_logger(__name__)
@@ -17,11 +29,22 @@ logger = get_logger(__name__)
 if TYPE_CHECKING:
     from vllm import LLM
 
+# Stands for the query when rendering a chat template, to split the result around it.
+_QUERY_SENTINEL = "\x00GIMKIT_QUERY\x00"
+
+
+class _PromptTemplate(NamedTuple):
+    """A chat-formatted prompt split around the query, with its prefix pre-tokenized."""
 
-class VLLMOffline(OutlinesVLLMOffline):
+    prefix_token_ids: tuple[int, ...] | None
+    """None if the chat template cannot be split."""
+    suffix: str
+
+
+class VLLMOffline(GeneratorCacheMixin, ResponseCacheMixin, OutlinesVLLMOffline):
     def __call__(
         self,
-        model_input: ContextInput | Query,
+        model_input: ContextInput | Query | PreparedQuery,
         output_type: Literal["cfg", "json"] | None = "cfg",
         backend: str | None = None,
         use_gim_prompt: bool = False,
@@ -29,33 +52,250 @@ class VLLMOffline(OutlinesVLLMOffline):
         **inference_kwargs: Any,
     ) -> Result | list[Result]:
         inference_kwargs = self._ensure_response_suffix(inference_kwargs)
+        prepared = prepare_query(model_input, output_type, use_gim_prompt, include_grammar)
+        use_cache = inference_kwargs.pop("use_cache", True)
+        key, raw_responses = _lookup_response(self, prepared, backend, inference_kwargs, use_cache)
+        if raw_responses is None:
+            raw_responses = self._generate(prepared, backend, inference_kwargs)
+            _store_response(self, key, raw_responses)
+        return infill_responses(
+            prepared.query,
+            raw_responses,
+            json_responses=(prepared.output_type == "json"),
+        )
+
+    def _generate(
+        self, prepared: PreparedQuery, backend: str | None, inference_kwargs: dict[str, Any]
+    ) -> RawResponse:
+        prompt_token_ids = (
+            self._prompt_token_ids(prepared)
+            if inference_kwargs.keys() == {"sampling_params"}
+            else None
+        )
+        if prompt_token_ids is not None:
+            from vllm.inputs import TokensPrompt
+
+            sampling_params = self._build_generation_args(
+                inference_kwargs, prepared.outlines_output_type
+            )
+            outputs = self.model.generate(
+                prompts=[TokensPrompt(prompt_token_ids=prompt_token_ids)],
+                sampling_params=sampling_params,
+            )
+            texts = [completion.text for completion in outputs[0].outputs]
+            raw_responses: RawResponse = texts[0] if len(texts) == 1 else texts
+        else:
+            outlines_model_input = (
+                prepared.chat_input() if self._force_chat_input() else prepared.model_input
+            )
+            generator = self.generator_cache.get_or_create(
+                generator_key(prepared.outlines_output_type, backend),
+                lambda: Generator(self, prepared.outlines_output_type, backend),
+            )
+            raw_responses = cast("RawResponse", generator(outlines_model_input, **inference_kwargs))
+        logger.debug(f"Raw responses of {self}: {raw_responses}")
+        return raw_responses
+
+    def stream(  # type: ignore[override]
+        self,
+        model_input: ContextInput | Query | PreparedQuery,
+        output_type: Literal["cfg", "json"] | None = "cfg",
+        backend: str | None = None,
+        use_gim_prompt: bool = False,
+        include_grammar: bool = False,
+        **inference_kwargs: Any,
+    ) -> Iterator[Result]:
+        """Yield the complete Result once generated, as `vllm.LLM` cannot stream.
 
+        This keeps the streaming interface of the other models usable offline.
+        """
+        yield cast(
+            "Result",
+            self(
+                model_input,
+                output_type,
+                backend,
+                use_gim_prompt,
+                include_grammar,
+                **inference_kwargs,
+            ),
+        )
+
+    def batch(  # type: ignore[override]
+        self,
+        model_input: Sequence[ContextInput | Query | PreparedQuery],
+        output_type: Literal["cfg", "json"] | None = "cfg",
+        backend: str | None = None,
+        use_gim_prompt: bool = False,
+        include_grammar: bool = False,
+        **inference_kwargs: Any,
+    ) -> list[Result | list[Result]]:
+        """Generate results for many queries in a single engine call.
+
+        Each query gets its own prompt and its own grammar or JSON schema (built once per
+        tag structure and cached), passed to vLLM as per-request sampling parameters, so
+        queries with different structures are still batched together by the engine.
+        Queries whose response is in `response_cache` are not sent to the engine.
+
+        Args:
+            model_input: The queries, possibly already prepared.
+            output_type: The output type of queries that are not prepared yet.
+            backend: Unused, as vLLM applies the structured outputs itself. Accepted for
+                compatibility with `__call__`.
+            use_gim_prompt: Whether to use the GIM prompt for queries not prepared yet.
+            include_grammar: Whether to include regexes in queries not prepared yet.
+            **inference_kwargs: Passed to `vllm.LLM.generate` or `vllm.LLM.chat`.
+                `sampling_params` is used as the base of every request's parameters.
+
+        Returns:
+            One entry per query, in input order: a Result, or a list of Results when
+            the sampling parameters ask for several samples.
+        """
+        if not model_input:
+            return []
+        inference_kwargs = self._ensure_response_suffix(inference_kwargs)
+        all_queries = [
+            prepare_query(item, output_type, use_gim_prompt, include_grammar)
+            for item in model_input
+        ]
+        use_cache = inference_kwargs.pop("use_cache", True)
+        lookups = [
+            _lookup_response(self, prepared, backend, inference_kwargs, use_cache)
+            for prepared in all_queries
+        ]
+        misses = [i for i, (_, raw_responses) in enumerate(lookups) if raw_responses is None]
+        all_raw_responses = [raw_responses for _, raw_responses in lookups]
+        if misses:
+            generated = self._generate_batch([all_queries[i] for i in misses], inference_kwargs)
+            for i, raw_responses in zip(misses, generated, strict=True):
+                _store_response(self, lookups[i][0], raw_responses)
+                all_raw_responses[i] = raw_responses
+
+        return [
+            infill_responses(
+                prepared.query,
+                cast("RawResponse", raw_responses),
+                json_responses=(prepared.output_type == "json"),
+            )
+            for prepared, raw_responses in zip(all_queries, all_raw_responses, strict=True)
+        ]
+
+    def _generate_batch(
+        self, prepared_queries: list[PreparedQuery], inference_kwargs: dict[str, Any]
+    ) -> list[RawResponse]:
+        inference_kwargs = dict(inference_kwargs)
+        base_sampling_params = inference_kwargs.pop("sampling_params")
+        force_chat_input = self._force_chat_input()
+        prompt_token_ids = (
+            [self._prompt_token_ids(prepared) for prepared in prepared_queries]
+            if not inference_kwargs
+            else []
+        )
+        engine_inputs: list[Any]
+        if prompt_token_ids and all(ids is not None for ids in prompt_token_ids):
+            from vllm.inputs import TokensPrompt
+
+            engine_inputs = [TokensPrompt(prompt_token_ids=ids) for ids in prompt_token_ids]
+        else:
+            engine_inputs = [
+                self.type_adapter.format_input(
+                    prepared.chat_input() if force_chat_input else prepared.model_input
+                )
+                for prepared in prepared_queries
+            ]
+        sampling_params = [
+            self._build_generation_args(
+                {"sampling_params": base_sampling_params}, prepared.outlines_output_type
+            )
+            for prepared in prepared_queries
+        ]
+
+        num_chats = sum(isinstance(engine_input, list) for engine_input in engine_inputs)
+        if num_chats == len(engine_inputs):
+            outputs = self.model.chat(
+                messages=engine_inputs, sampling_params=sampling_params, **inference_kwargs
+            )
+        elif num_chats == 0:
+            outputs = self.model.generate(
+                prompts=engine_inputs, sampling_params=sampling_params, **inference_kwargs
+            )
+        else:
+            raise ValueError(
+                "Cannot batch chat inputs with plain prompts in one call. "
+                "Prepare all queries with the same `use_gim_prompt`."
+            )
+
+        all_raw_responses: list[RawResponse] = []
+        for output in outputs:
+            texts = [completion.text for completion in output.outputs]
+            logger.debug(f"Raw responses of {self}: {texts}")
+            all_raw_responses.append(texts[0] if len(texts) == 1 else texts)
+        return all_raw_responses
+
+    def _force_chat_input(self) -> bool:
+        return self._has_chat_template
+
+    @cached_property
+    def _has_chat_template(self) -> bool:
         # Use force_chat_input=True to ensure proper prompt formatting.
         # TODO: Remove this once Outlines fixes https://github.com/dottxt-ai/outlines/issues/1784
-        force_chat_input = False
         try:
             chat_template = self.model.get_tokenizer().get_chat_template()  # type: ignore[union-attr]
-            if chat_template:
-                force_chat_input = True
         except ValueError:  # pragma: no cover
-            pass
-
-        outlines_model_input = get_outlines_model_input(
-            model_input,
-            output_type,
-            use_gim_prompt,
-            force_chat_input=force_chat_input,
-            include_grammar=include_grammar,
-        )
-        outlines_output_type = get_outlines_output_type(model_input, output_type)
-        generator = Generator(self, outlines_output_type, backend)
-        raw_responses = generator(outlines_model_input, **inference_kwargs)
-        logger.debug(f"Raw responses of {self}: {raw_responses}")
-        return infill_responses(
-            model_input,
-            cast("str | list[str]", raw_responses),
-            json_responses=(output_type == "json"),
+            return False
+        return bool(chat_template)
+
+    @cached_property
+    def _prompt_templates(self) -> LRUCache[str, _PromptTemplate]:
+        return LRUCache(maxsize=8)
+
+    def _prompt_token_ids(self, prepared: PreparedQuery) -> list[int] | None:
+        """Return the token ids of the chat-formatted prompt, or None if unavailable.
+
+        The conversation before the query (the GIM system prompt and demos, if any) is
+        rendered and tokenized once per model, so only the query itself is tokenized for
+        each request.
+        """
+        if not self._has_chat_template:
+            return None
+        *history, last_message = prepared.chat_input().messages
+        if last_message["role"] != "user" or not isinstance(last_message["content"], str):
+            return None
+        template = self._prompt_templates.get_or_create(
+            json.dumps(history, sort_keys=True), lambda: self._render_prompt_template(history)
         )
+        if template.prefix_token_ids is None:
+            return None
+        return [
+            *template.prefix_token_ids,
+            *self._encode(last_message["content"] + template.suffix),
+        ]
+
+    def _render_prompt_template(self, history: list[dict[str, Any]]) -> _PromptTemplate:
+        unsupported = _PromptTemplate(None, "")
+        try:
+            rendered = self.tokenizer.apply_chat_template(  # type: ignore[union-attr]
+                [*history, {"role": "user", "content": _QUERY_SENTINEL}],
+                tokenize=False,
+                add_generation_prompt=True,
+            )
+        except Exception:  # noqa: BLE001
+            return unsupported
+        if not isinstance(rendered, str) or rendered.count(_QUERY_SENTINEL) != 1:
+            return unsupported
+        prefix, suffix = rendered.split(_QUERY_SENTINEL)
+        prefix_token_ids = self._encode(prefix)
+        # Tokenizing the prefix apart is only valid if no token spans the boundary with
+        # the query. Every query starts with QUERY_PREFIX, so checking it covers them all.
+        probe = QUERY_PREFIX + suffix
+        if self._encode(prefix + probe) != prefix_token_ids + self._encode(probe):
+            logger.debug(f"Chat template of {self} cannot be split, prompts are not cached.")
+            return unsupported
+        return _PromptTemplate(tuple(prefix_token_ids), suffix)
+
+    def _encode(self, text: str) -> list[int]:
+        # Chat templates already contain the special tokens, as in `vllm.LLM.chat`.
+        return list(self.tokenizer.encode(text, add_special_tokens=False))  # type: ignore[union-attr]
 
     def _ensure_response_suffix(self, inference_kwargs: dict[str, Any]) -> dict[str, Any]:
         # Using `stop=RESPONSE_SUFFIX` is preferred for two reasons:
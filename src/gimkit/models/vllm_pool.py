@@ -0,0 +1,348 @@
+"""Spread calls over several vLLM servers from a single model.
+
+Each call is dispatched to the endpoint with the fewest requests in flight, ties being
+broken in turn. Endpoints that keep failing with connection or server errors are
+ejected for a cooldown period, after which they are re-admitted on probation: one more
+failure ejects them again, while a success restores them fully. Async pools can also
+hedge slow calls on a second endpoint."""
+
+import threading
+import time
+
+from collections.abc import AsyncIterator, Callable, Iterator, Sequence
+from typing import Any, Generic, Literal, NamedTuple, TypeVar, overload
+
+import openai
+
+from openai import AsyncOpenAI as AsyncOpenAIClient
+from openai import OpenAI as OpenAIClient
+
+from gimkit.contexts import Query, Result
+from gimkit.log import get_logger
+from gimkit.models.base import AsyncMapMixin, HedgingMixin, MapMixin, _hedged
+from gimkit.models.limits import _caused_by
+from gimkit.models.utils import ModelInput, PreparedQuery
+from gimkit.models.vllm import VLLM, AsyncVLLM
+from gimkit.schemas import ContextInput
+
+
+logger = get_logger(__name__)
+
+_M = TypeVar("_M", bound=VLLM | AsyncVLLM)
+_R = TypeVar("_R")
+
+
+class EndpointStats(NamedTuple):
+    """A snapshot of the load and health of one endpoint of a pool."""
+
+    base_url: str
+    outstanding: int
+    """The number of requests in flight."""
+    requests: int
+    """The number of requests dispatched so far."""
+    failures: int
+    """The number of requests that failed with a connection or server error."""
+    healthy: bool
+    """False while the endpoint is ejected."""
+
+
+def _is_endpoint_error(error: BaseException | None) -> bool:
+    """Whether an error is the endpoint's fault rather than the request's."""
+    return _caused_by(error, (openai.APIConnectionError, openai.InternalServerError))
+
+
+class _Endpoint(Generic[_M]):
+    __slots__ = ("ejected_until", "failures", "model", "outstanding", "requests", "strikes")
+
+    def __init__(self, model: _M) -> None:
+        self.model = model
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        # Consecutive failures, reset by a success
+        self.strikes = 0
+        self.ejected_until: float | None = None
+
+
+class _Router(Generic[_M]):
+    """Pick endpoints by least outstanding requests, and track their health.
+
+    The bookkeeping is guarded by a lock, so one router can serve many threads.
+    """
+
+    def __init__(self, models: Sequence[_M], max_failures: int, cooldown: float) -> None:
+        if not models:
+            raise ValueError("A pool needs at least one endpoint.")
+        if max_failures < 1:
+            raise ValueError(f"max_failures should be a positive integer, got {max_failures}.")
+        self.endpoints = [_Endpoint(model) for model in models]
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self._turn = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, exclude: Sequence[_Endpoint[_M]] = ()) -> _Endpoint[_M]:
+        """Pick an endpoint and count a request in flight on it.
+
+        Endpoints in `exclude` (already tried by the call) are only picked if no other
+        endpoint is available, and ejected endpoints only if all of them are ejected.
+        """
+        with self._lock:
+            now = time.monotonic()
+            for endpoint in self.endpoints:
+                if endpoint.ejected_until is not None and endpoint.ejected_until <= now:
+                    endpoint.ejected_until = None
+                    endpoint.strikes = self.max_failures - 1
+                    logger.info(f"Re-admitted endpoint {_base_url(endpoint.model)} on probation.")
+
+            # Rotating the scan start spreads ties evenly over the endpoints.
+            start = self._turn % len(self.endpoints)
+            self._turn += 1
+            rotated = self.endpoints[start:] + self.endpoints[:start]
+            healthy = [endpoint for endpoint in rotated if endpoint.ejected_until is None]
+            candidates = [endpoint for endpoint in healthy if endpoint not in exclude] or healthy
+            if candidates:
+                endpoint = min(candidates, key=lambda endpoint: endpoint.outstanding)
+            else:
+                endpoint = min(rotated, key=lambda endpoint: endpoint.ejected_until or now)
+                logger.warning(
+                    f"All endpoints are ejected, trying {_base_url(endpoint.model)} anyway."
+                )
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def release(self, endpoint: _Endpoint[_M], failed: bool) -> None:
+        """Count a request of an endpoint as finished, and update its health."""
+        with self._lock:
+            endpoint.outstanding -= 1
+            if not failed:
+                endpoint.strikes = 0
+                return
+            endpoint.failures += 1
+            endpoint.strikes += 1
+            if endpoint.strikes >= self.max_failures and endpoint.ejected_until is None:
+                endpoint.ejected_until = time.monotonic() + self.cooldown
+                logger.warning(
+                    f"Ejected endpoint {_base_url(endpoint.model)} for {self.cooldown}s "
+                    f"after {endpoint.strikes} consecutive failures."
+                )
+
+    def stats(self) -> list[EndpointStats]:
+        with self._lock:
+            now = time.monotonic()
+            return [
+                EndpointStats(
+                    _base_url(endpoint.model),
+                    endpoint.outstanding,
+                    endpoint.requests,
+                    endpoint.failures,
+                    endpoint.ejected_until is None or endpoint.ejected_until <= now,
+                )
+                for endpoint in self.endpoints
+            ]
+
+
+def _base_url(model: VLLM | AsyncVLLM) -> str:
+    return str(model.client.base_url)
+
+
+class _PoolBase(Generic[_M]):
+    def __init__(self, models: Sequence[_M], max_failures: int = 3, cooldown: float = 30.0):
+        self._router: _Router[_M] = _Router(models, max_failures, cooldown)
+
+    @property
+    def models(self) -> list[_M]:
+        """The models of the endpoints, in the order they were given."""
+        return [endpoint.model for endpoint in self._router.endpoints]
+
+    def stats(self) -> list[EndpointStats]:
+        """Return the load and health of every endpoint."""
+        return self._router.stats()
+
+
+class VLLMPool(MapMixin, _PoolBase[VLLM]):
+    """A model calling a pool of vLLM servers, with the interface of `VLLM`.
+
+    A call that fails with a connection or server error is retried on the other
+    endpoints before giving up. Other errors are raised at once.
+
+    Args:
+        models: One model per server.
+        max_failures: The number of consecutive failures that ejects an endpoint.
+        cooldown: How long an ejected endpoint is left out, in seconds.
+    """
+
+    def __call__(
+        self,
+        model_input: ContextInput | Query | PreparedQuery,
+        output_type: Literal["cfg", "json"] | None = "cfg",
+        backend: str | None = None,
+        use_gim_prompt: bool = False,
+        include_grammar: bool = False,
+        **inference_kwargs: Any,
+    ) -> Result | list[Result]:
+        return self._dispatch(
+            lambda model: model(
+                model_input,
+                output_type,
+                backend,
+                use_gim_prompt,
+                include_grammar,
+                **inference_kwargs,
+            )
+        )
+
+    def stream(self, model_input: ModelInput, **call_kwargs: Any) -> Iterator[Result]:
+        """Stream the response from one endpoint, as in `VLLM.stream`.
+
+        The request counts as in flight until the iterator is exhausted or closed. A
+        stream is not retried on another endpoint once started.
+        """
+        endpoint = self._router.acquire()
+        failed = False
+        try:
+            yield from endpoint.model.stream(model_input, **call_kwargs)
+        except Exception as e:
+            failed = _is_endpoint_error(e)
+            raise
+        finally:
+            self._router.release(endpoint, failed)
+
+    def _dispatch(self, call: Callable[[VLLM], _R]) -> _R:
+        tried: list[_Endpoint[VLLM]] = []
+        while True:
+            endpoint = self._router.acquire(tried)
+            failed = False
+            try:
+                return call(endpoint.model)
+            except Exception as e:
+                failed = _is_endpoint_error(e)
+                tried.append(endpoint)
+                if not failed or len(tried) >= len(self._router.endpoints):
+                    raise
+                logger.warning(f"Retrying on another endpoint after: {e!r}")
+            finally:
+                self._router.release(endpoint, failed)
+
+
+class AsyncVLLMPool(AsyncMapMixin, HedgingMixin, _PoolBase[AsyncVLLM]):
+    """A model calling a pool of vLLM servers, with the interface of `AsyncVLLM`.
+
+    A call that fails with a connection or server error is retried on the other
+    endpoints before giving up. Other errors are raised at once, and a cancelled call
+    does not count against its endpoint. With a `HedgePolicy` assigned to
+    `pool.hedging`, slow calls are duplicated on another endpoint than the one serving
+    them. The `concurrency` of `amap` bounds the calls in flight over the whole pool,
+    so it should grow with the number of endpoints.
+
+    Args:
+        models: One model per server.
+        max_failures: The number of consecutive failures that ejects an endpoint.
+        cooldown: How long an ejected endpoint is left out, in seconds.
+    """
+
+    async def __call__(
+        self,
+        model_input: ContextInput | Query | PreparedQuery,
+        output_type: Literal["cfg", "json"] | None = "cfg",
+        backend: str | None = None,
+        use_gim_prompt: bool = False,
+        include_grammar: bool = False,
+        **inference_kwargs: Any,
+    ) -> Result | list[Result]:
+        # Endpoints used by any attempt of this call, which hedges try to avoid
+        used: list[_Endpoint[AsyncVLLM]] = []
+
+        async def attempt() -> Result | list[Result]:
+            tried = 0
+            while True:
+                endpoint = self._router.acquire(used)
+                used.append(endpoint)
+                tried += 1
+                failed = False
+                try:
+                    return await endpoint.model(
+                        model_input,
+                        output_type,
+                        backend,
+                        use_gim_prompt,
+                        include_grammar,
+                        **inference_kwargs,
+                    )
+                except Exception as e:
+                    failed = _is_endpoint_error(e)
+                    if not failed or tried >= len(self._router.endpoints):
+                        raise
+                    logger.warning(f"Retrying on another endpoint after: {e!r}")
+                finally:
+                    self._router.release(endpoint, failed)
+
+        return await _hedged(self, attempt)
+
+    async def astream(self, model_input: ModelInput, **call_kwargs: Any) -> AsyncIterator[Result]:
+        """Stream the response from one endpoint, as in `AsyncVLLM.astream`.
+
+        The request counts as in flight until the iterator is exhausted or closed. A
+        stream is not retried on another endpoint once started.
+        """
+        endpoint = self._router.acquire()
+        failed = False
+        try:
+            async for result in endpoint.model.astream(model_input, **call_kwargs):
+                yield result
+        except Exception as e:
+            failed = _is_endpoint_error(e)
+            raise
+        finally:
+            self._router.release(endpoint, failed)
+
+
+@overload
+def from_vllm_pool(
+    clients: Sequence[OpenAIClient],
+    model_name: str | None = None,
+    max_failures: int = 3,
+    cooldown: float = 30.0,
+) -> VLLMPool: ...
+
+
+@overload
+def from_vllm_pool(
+    clients: Sequence[AsyncOpenAIClient],
+    model_name: str | None = None,
+    max_failures: int = 3,
+    cooldown: float = 30.0,
+) -> AsyncVLLMPool: ...
+
+
+def from_vllm_pool(
+    clients: Sequence[OpenAIClient] | Sequence[AsyncOpenAIClient],
+    model_name: str | None = None,
+    max_failures: int = 3,
+    cooldown: float = 30.0,
+) -> VLLMPool | AsyncVLLMPool:
+    """Create a model balancing calls over several vLLM servers serving the same model.
+
+    Args:
+        clients: One client per server, either all synchronous or all asynchronous.
+        model_name: The name of the model served by every server.
+        max_failures: The number of consecutive failures that ejects an endpoint.
+        cooldown: How long an ejected endpoint is left out, in seconds.
+    """
+    if clients and all(isinstance(client, OpenAIClient) for client in clients):
+        return VLLMPool(
+            [VLLM(client, model_name) for client in clients],  # type: ignore[arg-type]
+            max_failures,
+            cooldown,
+        )
+    if clients and all(isinstance(client, AsyncOpenAIClient) for client in clients):
+        return AsyncVLLMPool(
+            [AsyncVLLM(client, model_name) for client in clients],  # type: ignore[arg-type]
+            max_failures,
+            cooldown,
+        )
+    raise ValueError(
+        "Please provide a non-empty list of clients that are either all OpenAI "
+        "or all AsyncOpenAI instances."
+    )
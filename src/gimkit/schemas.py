@@ -8,6 +8,7 @@ from dataclasses import dataclass
 from types import MappingProxyType
 from typing import ClassVar, Literal, TypeAlias, cast
 
+from gimkit.caches import LRUCache
 from gimkit.exceptions import InvalidFormatError
 
 
@@ -70,10 +71,30 @@ TAG_FULL_PATTERN = re.compile(
 # so parsing favors simplicity and performance over covering every exotic edge case.
 
 
+# ─── Compiled Regex Cache ─────────────────────────────────────────────────────
+
+# Process-wide cache of compiled tag regexes keyed by pattern and flags, used by tag
+# validation and post-hoc content checks.
+REGEX_CACHE: LRUCache[tuple[str, int], re.Pattern[str]] = LRUCache(maxsize=256)
+
+
+def compile_regex(pattern: str, flags: int = 0) -> re.Pattern[str]:
+    """Compile a regex pattern through the shared `REGEX_CACHE`.
+
+    Raises:
+        re.error: If the pattern is invalid. Invalid patterns are not cached.
+    """
+    return REGEX_CACHE.get_or_create((pattern, flags), lambda: re.compile(pattern, flags))
+
+
 # ─── MaskedTag Definition ─────────────────────────────────────────────────────
 
+# TAG_OPEN_RIGHT is common in text, so we allow it in content.
+# But other magic strings are not allowed.
+_CONTENT_SPECIAL_MARKS = tuple(s for s in MAGIC_STRINGS if s != TAG_OPEN_RIGHT)
+
 
-@dataclass
+@dataclass(slots=True)
 class MaskedTag:
     """Represents a masked tag in the GIM schema.
 
@@ -137,13 +158,10 @@ class MaskedTag:
 
         # 3. Validate content
         if isinstance(self.content, str):
-            # TAG_OPEN_RIGHT is common in text, so we allow it in content.
-            # But other magic strings are not allowed.
-            special_marks = [s for s in MAGIC_STRINGS if s != TAG_OPEN_RIGHT]
-            if any(special_mark in self.content for special_mark in special_marks):
+            if any(special_mark in self.content for special_mark in _CONTENT_SPECIAL_MARKS):
                 raise ValueError(
                     "content should not contain special marks like "
-                    + " or ".join(f"`{x}`" for x in special_marks)
+                    + " or ".join(f"`{x}`" for x in _CONTENT_SPECIAL_MARKS)
                 )
         elif self.content is not None:
             raise ValueError(f"{type(self.content)=}, {self.content=}, should be str or None")
@@ -163,10 +181,43 @@ class MaskedTag:
             if self.regex == "":
                 raise ValueError("regex should not be an empty string.")
             try:
-                re.compile(self.regex)
+                compile_regex(self.regex)
             except re.error as e:
                 raise ValueError(f"Invalid regex pattern: {self.regex}") from e
 
+    @classmethod
+    def _trusted(
+        cls,
+        id: int | str | None,
+        name: str | None,
+        desc: str | None,
+        regex: str | None,
+        content: str | None,
+    ) -> "MaskedTag":
+        """Build a tag from fields that come from already-validated tags.
+
+        It skips `__post_init__`, so the attributes must already be unescaped and
+        the content and regex must already have passed validation.
+        """
+        tag = object.__new__(cls)
+        tag.id = id
+        tag.name = name
+        tag.desc = desc
+        tag.regex = regex
+        tag.content = content
+        return tag
+
+    def content_matches_regex(self) -> bool:
+        """Check whether `content` fully matches `regex`, using the shared regex cache.
+
+        A tag without a regex always matches; a tag with a regex but no content does not.
+        """
+        if self.regex is None:
+            return True
+        if self.content is None:
+            return False
+        return compile_regex(self.regex).fullmatch(self.content) is not None
+
     def to_string(
         self,
         fields: list[TagField] | Literal["all"] = "all",
@@ -209,31 +260,51 @@ ContextInput: TypeAlias = ContextPart | list[ContextPart]
 # ─── Schema Parsing And Validation ────────────────────────────────────────────
 
 
-def parse_parts(s: str) -> list[ContextPart]:
-    """Parse a string into a list of ContextParts (str or MaskedTag).
+def scan_parts(s: str) -> tuple[list[ContextPart], list[tuple[int, int]]]:
+    """Scan a string into ContextParts and their spans in a single left-to-right pass.
+
+    Tag markers are located with `str.find`, and only the attributes of each opening
+    tag are matched (anchored) with `TAG_OPEN_PATTERN`, so the input is walked once.
+    Mismatched or nested tags are detected during the same pass.
 
     Args:
-        s (str): The string to be parsed. Note it only contains masked tags or plain texts.
+        s (str): The string to be scanned. Note it only contains masked tags or plain texts.
             Tag id may start from any non-negative integer, but must be in order 0, 1, 2, ...
 
     Returns:
-        list[ContextPart]: A list of ContextParts (str or MaskedTag).
-    """
-    open_matches = list(TAG_OPEN_PATTERN.finditer(s))
-    end_matches = list(TAG_END_PATTERN.finditer(s))
-    full_matches = list(TAG_FULL_PATTERN.finditer(s))
-    if not (len(open_matches) == len(end_matches) == len(full_matches)):
-        raise InvalidFormatError(f"Mismatched or nested masked tags in {s}")
+        tuple[list[ContextPart], list[tuple[int, int]]]: The parsed parts (str or MaskedTag)
+            and the `(start, end)` offsets of each part in `s`.
 
+    Raises:
+        InvalidFormatError: If tags are mismatched, nested, or their ids are out of order.
+    """
     parts: list[ContextPart] = []
+    spans: list[tuple[int, int]] = []
     curr_tag_id = None
     last_end = 0
-    for match in full_matches:
-        start, end = match.span()
-        if start > last_end:
-            parts.append(s[last_end:start])
-
-        fields = match.groupdict()
+    open_start = s.find(TAG_OPEN_LEFT)
+    while open_start != -1:
+        end_start = s.find(TAG_END, last_end)
+        if end_start != -1 and end_start < open_start:
+            raise InvalidFormatError(f"Mismatched or nested masked tags in {s}")
+
+        open_match = TAG_OPEN_PATTERN.match(s, open_start)
+        if open_match is None:
+            # Not a well-formed opening tag, so it is kept as plain text.
+            open_start = s.find(TAG_OPEN_LEFT, open_start + len(TAG_OPEN_LEFT))
+            continue
+        content_start = open_match.end()
+        if end_start < content_start:
+            end_start = s.find(TAG_END, content_start)
+        next_open_start = s.find(TAG_OPEN_LEFT, content_start)
+        if end_start == -1 or (next_open_start != -1 and next_open_start < end_start):
+            raise InvalidFormatError(f"Mismatched or nested masked tags in {s}")
+
+        if open_start > last_end:
+            parts.append(s[last_end:open_start])
+            spans.append((last_end, open_start))
+
+        fields = open_match.groupdict()
         tag_id = fields.get("id")
         if tag_id is not None:
             tag_id = int(tag_id)
@@ -245,12 +316,31 @@ def parse_parts(s: str) -> list[ContextPart]:
                 )
         if curr_tag_id is not None:
             curr_tag_id += 1
-        parts.append(MaskedTag(**fields))
+        last_end = end_start + len(TAG_END)
+        parts.append(MaskedTag(**fields, content=s[content_start:end_start]))
+        spans.append((open_start, last_end))
+        open_start = next_open_start
+
+    if s.find(TAG_END, last_end) != -1:
+        raise InvalidFormatError(f"Mismatched or nested masked tags in {s}")
 
-        last_end = end
     if last_end < len(s):
         parts.append(s[last_end:])
-    return parts
+        spans.append((last_end, len(s)))
+    return parts, spans
+
+
+def parse_parts(s: str) -> list[ContextPart]:
+    """Parse a string into a list of ContextParts (str or MaskedTag).
+
+    Args:
+        s (str): The string to be parsed. Note it only contains masked tags or plain texts.
+            Tag id may start from any non-negative integer, but must be in order 0, 1, 2, ...
+
+    Returns:
+        list[ContextPart]: A list of ContextParts (str or MaskedTag).
+    """
+    return scan_parts(s)[0]
 
 
 def parse_tags(s: str, prefix: str | None = None, suffix: str | None = None) -> list[MaskedTag]:
@@ -319,3 +409,148 @@ def validate(query: str | None, response: str | None):
         response_tags = parse_tags(response, RESPONSE_PREFIX, RESPONSE_SUFFIX)
     if query is not None and response is not None and len(query_tags) != len(response_tags):
         raise InvalidFormatError("Mismatched number of masked tags between query and response.")
+
+
+# ─── Streaming Response Parsing ───────────────────────────────────────────────
+
+
+class StreamingResponseParser:
+    """Incrementally parse a GIM response and emit each masked tag as soon as it closes.
+
+    Text deltas are passed to `feed`, which returns the tags completed by that delta.
+    Between calls only a short tail (enough to hold a marker split across two chunks)
+    and the content of the currently open tag are kept, so the parsing work per delta
+    is proportional to the delta itself.
+
+    Example:
+        ```python
+        parser = StreamingResponseParser()
+        for delta in ['<|GIM_RESPONSE|><|MASKED id="m_0"|>wor', 'ld<|/MAS', "KED|>"]:
+            for tag in parser.feed(delta):
+                print(tag.id, tag.content)  # Prints `0 world` after the third delta
+        parser.close()
+        ```
+    """
+
+    # Number of trailing characters that may hold the beginning of a split marker.
+    _TAIL_SIZE = max(len(TAG_OPEN_LEFT), len(TAG_END)) - 1
+
+    def __init__(self, strict: bool = False) -> None:
+        """
+        Args:
+            strict (bool): If True, `close` raises an error when the last tag is left open.
+                Otherwise, the unclosed tag is emitted with the content received so far.
+        """
+        self.strict = strict
+        self._buffer = ""
+        self._open_fields: dict[str, str | None] | None = None
+        self._content_chunks: list[str] = []
+        self._curr_tag_id: int | None = None
+        self._num_tags = 0
+        self._closed = False
+
+    @property
+    def num_tags(self) -> int:
+        """The number of tags emitted so far."""
+        return self._num_tags
+
+    def feed(self, delta: str) -> list[MaskedTag]:
+        """Consume a text delta and return the tags completed by it, in order.
+
+        Raises:
+            InvalidFormatError: If tags are mismatched, nested, or their ids are out of order.
+        """
+        if self._closed:
+            raise ValueError("Cannot feed a closed StreamingResponseParser.")
+
+        tags: list[MaskedTag] = []
+        buf = self._buffer + delta
+        while True:
+            if self._open_fields is None:
+                open_start = buf.find(TAG_OPEN_LEFT)
+                end_start = buf.find(TAG_END)
+                if end_start != -1 and (open_start == -1 or end_start < open_start):
+                    raise InvalidFormatError(f"Mismatched or nested masked tags near {buf}")
+                if open_start == -1:
+                    # Text outside tags (prefix, suffix, whitespace) is dropped.
+                    buf = buf[-self._TAIL_SIZE :]
+                    break
+                open_end = buf.find(TAG_OPEN_RIGHT, open_start + len(TAG_OPEN_LEFT))
+                if open_end == -1:
+                    buf = buf[open_start:]
+                    break
+                open_match = TAG_OPEN_PATTERN.fullmatch(
+                    buf, open_start, open_end + len(TAG_OPEN_RIGHT)
+                )
+                if open_match is None:
+                    # Not a well-formed opening tag, so it is skipped as plain text.
+                    buf = buf[open_start + len(TAG_OPEN_LEFT) :]
+                    continue
+                self._open_fields = open_match.groupdict()
+                buf = buf[open_match.end() :]
+            else:
+                end_start = buf.find(TAG_END)
+                open_start = buf.find(TAG_OPEN_LEFT)
+                if open_start != -1 and (end_start == -1 or open_start < end_start):
+                    raise InvalidFormatError(f"Mismatched or nested masked tags near {buf}")
+                if end_start == -1:
+                    if len(buf) > self._TAIL_SIZE:
+                        self._content_chunks.append(buf[: -self._TAIL_SIZE])
+                        buf = buf[-self._TAIL_SIZE :]
+                    break
+                self._content_chunks.append(buf[:end_start])
+                tags.append(self._emit_tag())
+                buf = buf[end_start + len(TAG_END) :]
+        self._buffer = buf
+        return tags
+
+    def close(self) -> list[MaskedTag]:
+        """Finish the stream and return the tags completed by it.
+
+        Raises:
+            InvalidFormatError: If `strict` is True and the last tag is left open.
+        """
+        if self._closed:
+            return []
+        self._closed = True
+        if self._open_fields is None:
+            if self.strict and TAG_OPEN_LEFT in self._buffer:
+                raise InvalidFormatError("Response ends with an incomplete masked tag.")
+            return []
+        if self.strict:
+            raise InvalidFormatError("Response ends with an unclosed masked tag.")
+
+        content = "".join(self._content_chunks) + self._buffer
+        # The response may end without closing the tag, and text after it is not content.
+        content = content.partition(RESPONSE_SUFFIX)[0]
+        # Drop a partial TAG_END or RESPONSE_SUFFIX (at least "<|/") cut off at the end.
+        for marker in (TAG_END, RESPONSE_SUFFIX):
+            for i in range(len(marker) - 1, 2, -1):
+                if content.endswith(marker[:i]):
+                    content = content[:-i]
+                    break
+        self._content_chunks = [content]
+        self._buffer = ""
+        return [self._emit_tag()]
+
+    def _emit_tag(self) -> MaskedTag:
+        fields = cast("dict[str, str | None]", self._open_fields)
+        tag_id = fields.get("id")
+        if tag_id is not None:
+            if self._curr_tag_id is None:
+                self._curr_tag_id = int(tag_id)
+            elif int(tag_id) != self._curr_tag_id:
+                raise InvalidFormatError(
+                    f"Tag ids should be in order, got {tag_id} at position {self._curr_tag_id}."
+                )
+        if self._curr_tag_id is not None:
+            self._curr_tag_id += 1
+
+        content = "".join(self._content_chunks)
+        if any(special_mark in content for special_mark in _CONTENT_SPECIAL_MARKS):
+            raise InvalidFormatError(f"Special marks are not allowed in tag content: {content}")
+        tag = MaskedTag(**fields, content=content)
+        self._open_fields = None
+        self._content_chunks = []
+        self._num_tags += 1
+        return tag
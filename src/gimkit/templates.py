@@ -0,0 +1,157 @@
+"""Compiled query templates for instantiating many queries from one layout.
+
+A `QueryTemplate` parses and validates a query layout once. Literal text may contain
+`str.format` fields such as `{topic}` (use `{{` and `}}` for literal braces), and named
+tags may receive pre-filled content. Instantiating the template only substitutes these
+values, and the CFG and JSON schema built for the layout are shared by every instance,
+because they only depend on the tags' structure."""
+
+from __future__ import annotations
+
+from string import Formatter
+from typing import Any
+
+from gimkit.contexts import Query
+from gimkit.dsls import build_cfg, build_json_schema
+from gimkit.exceptions import InvalidFormatError
+from gimkit.schemas import _CONTENT_SPECIAL_MARKS, ContextInput, ContextPart, MaskedTag
+
+
+# A compiled literal segment is either plain text or a format field, stored as
+# `(field_name, conversion, format_spec)`.
+_Segment = str | tuple[str, str | None, str]
+
+
+class QueryTemplate:
+    """A query layout compiled once and instantiated many times without re-parsing.
+
+    Example:
+        ```python
+        from gimkit import guide as g
+
+        template = QueryTemplate("Translate {text} into French: ", g(name="translation"))
+        query = template.instantiate(text="Good morning")
+        grammar = template.cfg  # Built once and shared by all instances
+        ```
+    """
+
+    _formatter = Formatter()
+
+    def __init__(self, *args: ContextInput) -> None:
+        self._layout = Query(*args)
+        self._segments: list[list[_Segment] | MaskedTag] = []
+        fields: list[str] = []
+        for part in self._layout.parts[1:-1]:
+            if isinstance(part, MaskedTag):
+                self._segments.append(part)
+                continue
+            text_segments: list[_Segment] = []
+            for literal, field_name, format_spec, conversion in self._formatter.parse(part):
+                if literal:
+                    text_segments.append(literal)
+                if field_name is None:
+                    continue
+                if not field_name.isidentifier():
+                    raise ValueError(
+                        f"Template fields must be plain identifiers, got {{{field_name}}}."
+                    )
+                text_segments.append((field_name, conversion, format_spec or ""))
+                if field_name not in fields:
+                    fields.append(field_name)
+            self._segments.append(text_segments)
+
+        self._fields = tuple(fields)
+        self._tag_names = tuple(tag.name for tag in self._layout.tags if tag.name is not None)
+        if overlap := set(self._fields) & set(self._tag_names):
+            raise ValueError(
+                f"Names {sorted(overlap)} are used both as text fields and as tag names."
+            )
+        self._cfg: str | None = None
+        self._json_schema: dict | None = None
+
+    @property
+    def fields(self) -> tuple[str, ...]:
+        """Names of the format fields in the literal text, in order of first appearance."""
+        return self._fields
+
+    @property
+    def tag_names(self) -> tuple[str, ...]:
+        """Names of the tags whose content can be pre-filled when instantiating."""
+        return self._tag_names
+
+    @property
+    def tags(self) -> list[MaskedTag]:
+        """The tags of the layout. They are shared by the template and must not be modified."""
+        return self._layout.tags[:]
+
+    @property
+    def cfg(self) -> str:
+        """The CFG of the layout, built on first access and shared by every instance."""
+        if self._cfg is None:
+            self._cfg = build_cfg(self._layout)
+        return self._cfg
+
+    @property
+    def json_schema(self) -> dict:
+        """The JSON schema of the layout, built on first access and shared by every instance."""
+        if self._json_schema is None:
+            self._json_schema = build_json_schema(self._layout)
+        return self._json_schema
+
+    def instantiate(self, **values: Any) -> Query:
+        """Build a Query by filling the text fields and pre-filling named tags.
+
+        Args:
+            **values: A value for every text field, and optionally a `str` content for
+                any named tag. Text values are formatted like `str.format` does.
+
+        Raises:
+            KeyError: If a text field has no value.
+            TypeError: If a keyword is neither a text field nor a tag name.
+            InvalidFormatError: If a value contains GIM special marks.
+        """
+        if unknown := values.keys() - {*self._fields, *self._tag_names}:
+            raise TypeError(f"Unexpected template values: {', '.join(sorted(unknown))}.")
+
+        parts: list[ContextPart] = []
+        for segment in self._segments:
+            if isinstance(segment, MaskedTag):
+                content = segment.content
+                if segment.name is not None and segment.name in values:
+                    content = values[segment.name]
+                    if not isinstance(content, str):
+                        raise TypeError(
+                            f"Content of tag '{segment.name}' should be str, got {type(content)}."
+                        )
+                    self._check_value(segment.name, content)
+                parts.append(
+                    MaskedTag._trusted(
+                        segment.id, segment.name, segment.desc, segment.regex, content or None
+                    )
+                )
+                continue
+            text = "".join(
+                item if isinstance(item, str) else self._format_field(item, values)
+                for item in segment
+            )
+            # Check the joined text, as a value may complete a mark started by the literal.
+            if any(mark in text for mark in _CONTENT_SPECIAL_MARKS):
+                names = dict.fromkeys(item[0] for item in segment if not isinstance(item, str))
+                self._check_value("', '".join(names), text)
+            if text:
+                parts.append(text)
+        return Query._from_parts(parts)
+
+    def _format_field(self, field: tuple[str, str | None, str], values: dict[str, Any]) -> str:
+        field_name, conversion, format_spec = field
+        value = self._formatter.convert_field(values[field_name], conversion)
+        return self._formatter.format_field(value, format_spec)
+
+    @staticmethod
+    def _check_value(name: str, value: str) -> None:
+        # Special marks would change the layout if the query were parsed from its string.
+        if any(mark in value for mark in _CONTENT_SPECIAL_MARKS):
+            raise InvalidFormatError(
+                f"Value of '{name}' should not contain or form special marks like "
+                + " or ".join(f"`{x}`" for x in _CONTENT_SPECIAL_MARKS)
+            )
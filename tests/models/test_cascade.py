@@ -0,0 +1,117 @@
+import datetime
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from openai import AsyncOpenAI
+
+from gimkit.contexts import Query, Response, Result
+from gimkit.guides import guide
+from gimkit.models.cascade import AsyncCascade, Cascade, CascadeResult, TierStats
+from gimkit.models.openai import from_openai
+from gimkit.schemas import MaskedTag
+
+
+class FakeModel:
+    """Fill each tag with the answer given for its name."""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.queries = []
+
+    def __call__(self, query, **kwargs):
+        self.queries.append(query)
+        tags = [
+            MaskedTag(id=i, content=self.answers.get(tag.name)) for i, tag in enumerate(query.tags)
+        ]
+        return query.infill(Response(tags))
+
+
+def make_query():
+    return Query(
+        "Born on ",
+        guide.datetime(name="date", require_time=False),
+        " in ",
+        guide.select(name="city", choices=["Paris", "Rome"]),
+        ", ",
+        guide(name="bio", desc="A short bio."),
+    )
+
+
+def test_cascade_escalates_failed_tags():
+    small = FakeModel({"date": "1990-02-30", "city": "Paris", "bio": ""})
+    large = FakeModel({"date": "1990-02-03", "bio": "A painter."})
+    cascade = Cascade(
+        [small, large],
+        validators={"date": lambda text: bool(datetime.date.fromisoformat(text))},
+    )
+
+    result = cascade(make_query(), temperature=0)
+    assert isinstance(result, CascadeResult)
+    assert str(result) == "Born on 1990-02-03 in Paris, A painter."
+    assert result.tiers == [1, 0, 1]
+    assert result.accepted == [True, True, True]
+
+    # The large model only fills the failed tags, with the accepted one as context
+    (escalated,) = large.queries
+    assert [tag.name for tag in escalated.tags] == ["date", "bio"]
+    assert [tag.id for tag in escalated.tags] == [0, 1]
+    assert " in Paris, " in str(escalated)
+    assert cascade.stats()[0][:3] == (1, 3, 1)
+    assert cascade.stats()[1][:3] == (1, 2, 2)
+
+    # Queries that the small model handles stop there
+    small.answers.update(date="1990-02-03", bio="A poet.")
+    result = cascade(make_query())
+    assert result.tiers == [0, 0, 0]
+    assert len(large.queries) == 1
+
+    # Content failing at the last tier is kept, and reported
+    small.answers["city"] = "Berlin"
+    large.answers["city"] = "Oslo"
+    result = cascade(make_query())
+    assert result.tags["city"].content == "Oslo"
+    assert result.accepted == [True, False, True]
+
+
+def test_cascade_errors():
+    with pytest.raises(ValueError, match="at least one model"):
+        Cascade([])
+
+    async def async_model(query, **kwargs): ...
+
+    with pytest.raises(ValueError, match="use AsyncCascade instead"):
+        Cascade([async_model])
+    with pytest.raises(ValueError, match="use Cascade instead"):
+        AsyncCascade([FakeModel({})])
+    with pytest.raises(TypeError, match="one result per call"):
+        Cascade([lambda query, **kwargs: [Result("x")]])(make_query())
+
+
+@pytest.mark.asyncio
+async def test_async_cascade():
+    def make_client(content):
+        async def create(**kwargs):
+            response = MagicMock()
+            response.choices = [MagicMock()]
+            response.choices[0].message.content = content
+            response.choices[0].message.refusal = None
+            return response
+
+        client = AsyncOpenAI(api_key="test")
+        client.chat.completions.create = create  # type: ignore[method-assign]
+        return client
+
+    small = from_openai(make_client('{"m_0": "Dec 1st", "m_1": "Rome", "m_2": "A poet."}'))
+    large = from_openai(make_client('{"m_0": "2024-12-01"}'))
+    cascade = AsyncCascade([small, large])
+
+    result = await cascade(make_query(), output_type="json")
+    assert str(result) == "Born on 2024-12-01 in Rome, A poet."
+    assert result.tiers == [1, 0, 0]
+
+    items = [item async for item in cascade.amap([make_query()] * 3, output_type="json")]
+    assert all(item.ok for item in items)
+    calls, tags, accepted, _ = cascade.stats()[1]
+    assert TierStats(calls, tags, accepted, 0.0) == TierStats(4, 4, 4, 0.0)
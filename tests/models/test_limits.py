@@ -0,0 +1,440 @@
+import asyncio
+import time
+
+from unittest.mock import MagicMock
+
+import openai
+import pytest
+
+from openai import AsyncOpenAI, OpenAI
+
+from gimkit.contexts import Query
+from gimkit.exceptions import DeadlineExceededError
+from gimkit.guides import guide
+from gimkit.models.limits import (
+    AIMDLimiter,
+    HedgePolicy,
+    LimiterInfo,
+    Priority,
+    RateLimiter,
+    TokenBucket,
+    TokenEstimate,
+    is_overload_error,
+)
+from gimkit.models.openai import from_openai
+from gimkit.models.utils import prepare_query
+
+
+def rate_limit_error(headers=None):
+    return openai.RateLimitError(
+        "slow down", response=MagicMock(status_code=429, headers=headers or {}), body=None
+    )
+
+
+def make_response(content='<|MASKED id="m_0"|>ok<|/MASKED|>'):
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = content
+    response.choices[0].message.refusal = None
+    return response
+
+
+def test_is_overload_error():
+    assert is_overload_error(rate_limit_error())
+    assert is_overload_error(TimeoutError())
+    wrapped = RuntimeError("wrapped")
+    wrapped.__cause__ = rate_limit_error()
+    assert is_overload_error(wrapped)
+    assert not is_overload_error(ValueError())
+    assert not is_overload_error(None)
+
+
+@pytest.mark.asyncio
+async def test_aimd_limiter():
+    limiter = AIMDLimiter(initial_limit=2, max_limit=3, latency_tolerance=None)
+
+    # Requests over the limit wait for a slot
+    first = await limiter.acquire()
+    second = await limiter.acquire()
+    third = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    assert limiter.info() == LimiterInfo(2, 2, 1, 0, 0)
+
+    # Healthy completions raise the limit additively, up to max_limit
+    limiter.release(first)
+    third_started_at = await third
+    limiter.release(third_started_at)
+    assert limiter.limit == 2
+    for _ in range(5):
+        slots = [await limiter.acquire() for _ in range(limiter.limit - 1)]
+        for started_at in slots:
+            limiter.release(started_at)
+    assert limiter.limit == 3
+
+    # An overload cuts the limit once, even if several requests in flight fail
+    started_at = await limiter.acquire()
+    limiter.release(second, rate_limit_error())
+    limiter.release(started_at, rate_limit_error())
+    assert limiter.limit == 1
+    assert limiter.info().decreases == 1
+
+    # Other errors and cancellations leave the limit unchanged
+    limiter.release(await limiter.acquire(), ValueError())
+    limiter.release(await limiter.acquire(), asyncio.CancelledError())
+    assert limiter.limit == 1
+
+    # Cancelled waiters leave the line
+    held = await limiter.acquire()
+    waiter = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert limiter.info().waiting == 0
+    limiter.release(held)
+
+    with pytest.raises(ValueError, match="Limits should satisfy"):
+        AIMDLimiter(initial_limit=0)
+    with pytest.raises(ValueError, match="backoff should be in"):
+        AIMDLimiter(backoff=1)
+
+
+@pytest.mark.asyncio
+async def test_aimd_limiter_latency_spike():
+    limiter = AIMDLimiter(initial_limit=4, latency_tolerance=2.0)
+    limiter.release(await limiter.acquire())
+    started_at = await limiter.acquire()
+    # Fake a request ten times slower than the usual latency
+    limiter.release(started_at - 10 * max(limiter.latency or 0.0, 1e-3))
+    assert limiter.limit == 2
+
+
+@pytest.mark.asyncio
+async def test_limiter_on_saturated_server():
+    """A stub server serving `capacity` requests at once, and rejecting the others with 429."""
+    capacity = 6
+    in_flight = 0
+
+    async def create(**kwargs):
+        nonlocal in_flight
+        if in_flight >= capacity:
+            raise rate_limit_error()
+        in_flight += 1
+        try:
+            await asyncio.sleep(0.002)
+        finally:
+            in_flight -= 1
+        return make_response()
+
+    client = AsyncOpenAI(api_key="test", max_retries=0)
+    client.chat.completions.create = create  # type: ignore[method-assign]
+    model = from_openai(client, model_name="gpt-4o")
+    model.limiter = AIMDLimiter(initial_limit=1, latency_tolerance=None)
+
+    items = [item async for item in model.amap(["Hello, " + guide()] * 400, concurrency=64)]
+    num_rejected = sum(not item.ok for item in items)
+
+    # The limit probes past the capacity, backs off, and settles around it
+    info = model.limiter.info()
+    assert info.increases > 0
+    assert info.decreases > 0
+    assert capacity / 2 <= info.limit <= 2 * capacity
+    assert num_rejected < len(items) / 10
+    assert info.in_flight == info.waiting == 0
+
+
+@pytest.mark.asyncio
+async def test_priority_scheduling():
+    limiter = AIMDLimiter(initial_limit=1, max_limit=1, latency_tolerance=None)
+    held = await limiter.acquire()
+    order = []
+
+    async def request(name, priority, deadline=None):
+        limiter.release(await limiter.acquire(priority, deadline))
+        order.append(name)
+
+    now = time.monotonic()
+    tasks = [
+        asyncio.ensure_future(request("low", Priority.LOW)),
+        asyncio.ensure_future(request("normal", Priority.NORMAL)),
+        asyncio.ensure_future(request("high, late deadline", Priority.HIGH, now + 60)),
+        asyncio.ensure_future(request("high, early deadline", Priority.HIGH, now + 30)),
+        asyncio.ensure_future(request("high, no deadline", Priority.HIGH)),
+    ]
+    await asyncio.sleep(0)
+    assert limiter.queue_stats()[Priority.HIGH].waiting == 3
+
+    # Waiters are served by priority, then by earliest deadline
+    limiter.release(held)
+    await asyncio.gather(*tasks)
+    assert order == [
+        "high, early deadline",
+        "high, late deadline",
+        "high, no deadline",
+        "normal",
+        "low",
+    ]
+    stats = limiter.queue_stats()
+    assert list(stats) == [Priority.HIGH, Priority.NORMAL, Priority.LOW]
+    assert stats[Priority.HIGH].dispatched == 3
+    assert stats[Priority.LOW].mean_wait >= stats[Priority.HIGH].mean_wait > 0
+    assert limiter.info().waiting == 0
+
+
+@pytest.mark.asyncio
+async def test_expired_requests_are_dropped():
+    limiter = AIMDLimiter(initial_limit=1, max_limit=1, latency_tolerance=None)
+    held = await limiter.acquire()
+
+    # A request still queued at its deadline leaves the line
+    with pytest.raises(DeadlineExceededError, match="priority 2"):
+        await limiter.acquire(Priority.LOW, time.monotonic() + 0.01)
+    with pytest.raises(DeadlineExceededError):
+        await limiter.acquire(deadline=time.monotonic() - 1)
+    limiter.release(held)
+    assert limiter.info() == LimiterInfo(1, 0, 0, 0, 0)
+    assert limiter.queue_stats()[Priority.LOW].expired == 1
+    assert limiter.queue_stats()[Priority.NORMAL].expired == 1
+
+    calls = 0
+
+    async def create(**kwargs):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return make_response()
+
+    client = AsyncOpenAI(api_key="test", max_retries=0)
+    client.chat.completions.create = create  # type: ignore[method-assign]
+    model = from_openai(client, model_name="gpt-4o")
+
+    # Expired calls are not sent, with or without a limiter
+    with pytest.raises(DeadlineExceededError):
+        await model("Hello, " + guide(), deadline=time.monotonic())
+    assert calls == 0
+
+    model.limiter = limiter
+    slow = asyncio.ensure_future(model("Hello, " + guide(), priority=Priority.LOW))
+    urgent = asyncio.ensure_future(model("Hi, " + guide(), deadline=time.monotonic() + 0.01))
+    with pytest.raises(DeadlineExceededError):
+        await urgent
+    assert (await slow).tags[0].content == "ok"  # type: ignore[union-attr]
+    assert calls == 1
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 3))
+        self.now += seconds
+
+
+def test_token_bucket(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, "monotonic", clock.monotonic)
+
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.reserve(60) == 0
+    # Reservations past the budget wait for the refill, in order
+    assert bucket.reserve(1) == pytest.approx(1)
+    assert bucket.reserve(2) == pytest.approx(3)
+    clock.now = 3
+    bucket.refund(2)
+    assert bucket.reserve(1) == 0
+
+    # A retry-after pauses everyone
+    bucket.pause(10)
+    assert bucket.reserve(1) == pytest.approx(10)
+
+    with pytest.raises(ValueError, match="per_minute should be positive"):
+        TokenBucket(0)
+
+
+def test_rate_limiter_estimate():
+    rate_limiter = RateLimiter(tokens_per_minute=1000)
+    query = Query("Date: ", guide(regex=r"\d{4}-\d{2}-\d{2}"), " Note: ", guide())
+    prepared = prepare_query(query, output_type=None)
+    estimate = rate_limiter.estimate(prepared, {})
+    assert estimate.prompt > 0
+    # The date fits in 3 tokens, the free-form tag gets the default allowance
+    markup_only = rate_limiter.estimate(prepare_query(Query("Date: "), output_type=None), {})
+    assert estimate.completion > 3 + rate_limiter.tag_tokens
+    assert estimate.completion < 3 + rate_limiter.tag_tokens + 20 + markup_only.completion
+
+    assert rate_limiter.estimate(prepared, {"max_tokens": 10}).completion == 10
+    assert rate_limiter.estimate(prepared, {"n": 2}).completion == 2 * estimate.completion
+
+    # Unused completion tokens are given back
+    rate_limiter.reserve(estimate)
+    rate_limiter.settle(estimate, "")
+    assert rate_limiter.info().tokens == estimate.prompt
+    assert TokenEstimate(1, 2).total == 3
+
+
+def test_rate_limited_calls(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(time, "sleep", clock.sleep)
+
+    responses = [rate_limit_error({"retry-after-ms": "500"}), make_response(), make_response()]
+
+    def create(**kwargs):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    client = OpenAI(api_key="test", max_retries=0)
+    monkeypatch.setattr(client.chat.completions, "create", create)
+    model = from_openai(client, model_name="gpt-4o")
+    model.rate_limiter = RateLimiter(requests_per_minute=60)
+
+    # The 429 pauses the buckets for its retry-after, and the call is retried
+    assert model("Hello, " + guide()).tags[0].content == "ok"  # type: ignore[union-attr]
+    assert clock.sleeps == [0, 1.0]
+    # The next request waits for its turn in the request bucket
+    model("Hello, " + guide())
+    assert clock.sleeps[-1] == pytest.approx(1.0)
+    assert model.rate_limiter.info().requests == 3
+    assert model.rate_limiter.info().rate_limited == 1
+
+    # Other errors are not retried, and rate limits are not retried forever
+    model.rate_limiter.max_retries = 1
+    responses[:] = [rate_limit_error(), rate_limit_error()]
+    with pytest.raises(Exception, match="slow down"):
+        model("Hello, " + guide())
+    assert not responses
+
+
+@pytest.mark.asyncio
+async def test_async_rate_limited_calls():
+    responses = [rate_limit_error({"retry-after": "0.01"}), make_response()]
+
+    async def create(**kwargs):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    client = AsyncOpenAI(api_key="test", max_retries=0)
+    client.chat.completions.create = create  # type: ignore[method-assign]
+    model = from_openai(client, model_name="gpt-4o")
+    model.rate_limiter = RateLimiter(tokens_per_minute=100_000)
+
+    result = await model("Hello, " + guide())
+    assert result.tags[0].content == "ok"  # type: ignore[union-attr]
+    assert model.rate_limiter.info().rate_limited == 1
+    assert not responses
+
+
+def test_hedge_policy():
+    policy = HedgePolicy(percentile=90, max_extra_load=0.5, burst=1, min_samples=10)
+    assert policy.start() is None
+    for latency in range(1, 11):
+        policy.record(latency / 100)
+    assert policy.delay == pytest.approx(0.09)
+
+    # Hedges are bounded by the budget accrued by calls
+    assert not policy.try_hedge()
+    policy.start()
+    policy.start()
+    assert policy.try_hedge()
+    assert not policy.try_hedge()
+    policy.record(0.01, hedge=True)
+    info = policy.info()
+    assert (info.requests, info.hedges, info.wins, info.denied) == (3, 1, 1, 2)
+    assert info.win_rate == 1
+
+    # Only the latest latencies of the window count
+    policy = HedgePolicy(percentile=90, min_samples=1, window=3)
+    for latency in [0.5, 0.1, 0.2]:
+        policy.record(latency)
+    assert policy.delay == pytest.approx(0.5)
+    policy.record(0.3)
+    assert policy.delay == pytest.approx(0.3)
+
+    with pytest.raises(ValueError, match="percentile should be in"):
+        HedgePolicy(percentile=100)
+    with pytest.raises(ValueError, match="burst at least 1"):
+        HedgePolicy(burst=0)
+
+
+@pytest.mark.asyncio
+async def test_hedged_calls():
+    delays = []
+    cancelled = 0
+
+    async def create(**kwargs):
+        nonlocal cancelled
+        try:
+            await asyncio.sleep(delays.pop(0))
+        except asyncio.CancelledError:
+            cancelled += 1
+            raise
+        return make_response()
+
+    client = AsyncOpenAI(api_key="test", max_retries=0)
+    client.chat.completions.create = create  # type: ignore[method-assign]
+    model = from_openai(client, model_name="gpt-4o")
+    model.hedging = HedgePolicy(max_extra_load=0.5, burst=1, min_samples=3)
+    model.limiter = AIMDLimiter(latency_tolerance=None)
+    model.rate_limiter = RateLimiter(requests_per_minute=600)
+
+    # Calls are not hedged until enough latencies are known
+    delays[:] = [0.01] * 3
+    for _ in range(3):
+        await model("Hello, " + guide())
+    assert model.hedging.info().hedges == 0
+
+    # A stuck request is hedged, the hedge wins and the stuck request is cancelled
+    delays[:] = [10, 0.01]
+    result = await asyncio.wait_for(model("Hello, " + guide()), timeout=5)
+    assert result.tags[0].content == "ok"  # type: ignore[union-attr]
+    await asyncio.sleep(0)
+    assert cancelled == 1
+    assert model.limiter.info().in_flight == 0
+    # The call is timed from its start, not from the start of the winning hedge
+    assert model.hedging._latencies[-1] > 0.015
+
+    # Without budget left, slow requests are awaited
+    delays[:] = [0.05]
+    await model("Hello, " + guide())
+    info = model.hedging.info()
+    assert (info.requests, info.hedges, info.wins, info.denied) == (5, 1, 1, 1)
+    assert info.hedge_rate == 0.2
+    # Hedges are charged to the rate limits like any other request
+    assert model.rate_limiter.info().requests == 6
+
+
+@pytest.mark.asyncio
+async def test_failed_calls_give_back_reservations():
+    async def create(**kwargs):
+        raise ValueError("bad request")
+
+    client = AsyncOpenAI(api_key="test", max_retries=0)
+    client.chat.completions.create = create  # type: ignore[method-assign]
+    model = from_openai(client, model_name="gpt-4o")
+    model.rate_limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=100_000)
+    estimate = model.rate_limiter.estimate(prepare_query("Hello, " + guide(), output_type=None), {})
+
+    # Requests that reached the endpoint keep their prompt tokens only
+    with pytest.raises(Exception, match="bad request"):
+        await model("Hello, " + guide())
+    assert model.rate_limiter.info().tokens == estimate.prompt
+
+    # Requests dropped before they are sent give back their whole reservation
+    with pytest.raises(DeadlineExceededError):
+        await model("Hello, " + guide(), deadline=time.monotonic() - 1)
+    with pytest.raises(DeadlineExceededError):
+        async for _ in model.astream("Hello, " + guide(), deadline=time.monotonic() - 1):
+            pass
+    info = model.rate_limiter.info()
+    assert (info.requests, info.tokens) == (1, estimate.prompt)
+    assert model.rate_limiter.tokens.reserve(0) == 0  # type: ignore[union-attr]
+    assert model.rate_limiter.requests.reserve(59) == 0  # type: ignore[union-attr]
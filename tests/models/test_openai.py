@@ -1,3 +1,7 @@
+import asyncio
+import threading
+import time
+
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
@@ -6,11 +10,15 @@ from openai import AsyncOpenAI, OpenAI
 from outlines import AsyncOpenAI as OutlinesAsyncOpenAI
 from outlines import OpenAI as OutlinesOpenAI
 
+from gimkit.caches import ResponseCache
 from gimkit.contexts import Query, Result
+from gimkit.exceptions import DeadlineExceededError
 from gimkit.guides import guide
+from gimkit.models.limits import AIMDLimiter
 from gimkit.models.openai import AsyncOpenAI as GIMAsyncOpenAI
 from gimkit.models.openai import OpenAI as GIMOpenAI
 from gimkit.models.openai import from_openai
+from gimkit.models.utils import prepare_query
 from gimkit.schemas import MaskedTag
 
 
@@ -63,6 +71,51 @@ def test_sync_call():
         model(Query("Hello, ", guide()), output_type=None, include_grammar=True)
         model(["Hello, " + guide()], output_type=None)
 
+        # A prepared query is reused as is, and its options win over the call's
+        prepared = prepare_query("Hello, " + guide(), output_type=None, include_grammar=True)
+        result = model(prepared, include_grammar=False)
+        assert result.tags[0].content == "world"
+        assert mock_create.call_args.kwargs["messages"][-1]["content"] == prepared.model_input
+
+
+def test_response_cache():
+    client = OpenAI(api_key="test", timeout=0, max_retries=0)
+
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock()]
+    mock_response.choices[
+        0
+    ].message.content = '<|GIM_RESPONSE|><|MASKED id="m_0"|>world<|/MASKED|><|/GIM_RESPONSE|>'
+    mock_response.choices[0].message.refusal = None
+
+    with patch.object(client.chat.completions, "create", return_value=mock_response) as mock_create:
+        model = from_openai(client, model_name="gpt-4o")
+        model.response_cache = ResponseCache()
+
+        first = model("Hello, " + guide(), temperature=0)
+        second = model("Hello, " + guide(), temperature=0)
+        assert mock_create.call_count == 1
+        assert isinstance(second, Result)
+        assert second.tags[0].content == "world"
+        assert second is not first
+        assert model.response_cache.info().hits == 1
+
+        # Different inference kwargs or prompts are different requests
+        model("Hello, " + guide(), temperature=1)
+        model("Hello, " + guide(), use_gim_prompt=True, temperature=0)
+        assert mock_create.call_count == 3
+
+        # Bypass and refresh
+        model("Hello, " + guide(), temperature=0, use_cache=False)
+        model("Hello, " + guide(), temperature=0, use_cache="refresh")
+        assert mock_create.call_count == 5
+        assert "use_cache" not in mock_create.call_args.kwargs
+
+        # A cached streamed call yields the final result at once
+        (streamed,) = model.stream("Hello, " + guide(), temperature=0)
+        assert streamed.tags[0].content == "world"
+        assert mock_create.call_count == 5
+
 
 @pytest.mark.asyncio
 async def test_async_call():
@@ -83,3 +136,225 @@ async def test_async_call():
         assert isinstance(result, Result)
         assert result.tags[0] == MaskedTag(id=0, content="world")
         mock_create.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_async_request_coalescing():
+    client = AsyncOpenAI(api_key="test", timeout=0, max_retries=0)
+    release = asyncio.Event()
+
+    async def create(**kwargs):
+        await release.wait()
+        if kwargs["messages"][-1]["content"].startswith("<|GIM_QUERY|>fail"):
+            raise RuntimeError("boom")
+        response = MagicMock()
+        response.choices = [MagicMock()]
+        response.choices[0].message.content = '<|MASKED id="m_0"|>world<|/MASKED|>'
+        response.choices[0].message.refusal = None
+        return response
+
+    with patch.object(client.chat.completions, "create", side_effect=create) as mock_create:
+        model = from_openai(client, model_name="gpt-4o")
+
+        async def call_many(prompt, num_calls, **kwargs):
+            tasks = [asyncio.ensure_future(model(prompt, **kwargs)) for _ in range(num_calls)]
+            await asyncio.sleep(0)
+            release.set()
+            try:
+                return await asyncio.gather(*tasks, return_exceptions=True)
+            finally:
+                release.clear()
+
+        # Identical deterministic calls share one request, but not their results
+        results = await call_many("Hello, " + guide(), 5, temperature=0)
+        assert mock_create.call_count == 1
+        assert [result.tags[0].content for result in results] == ["world"] * 5
+        assert len({id(result) for result in results}) == 5
+        assert not model.inflight_requests
+
+        # Non-deterministic calls are sent separately
+        await call_many("Hello, " + guide(), 3, temperature=0.7)
+        assert mock_create.call_count == 4
+
+        # Errors are shared too
+        errors = await call_many("fail " + guide(), 2, temperature=0)
+        assert mock_create.call_count == 5
+        assert all(isinstance(error, RuntimeError) for error in errors)
+
+        # Cancelling one caller leaves the shared request running for the others
+        first = asyncio.ensure_future(model("Bye, " + guide(), temperature=0))
+        second = asyncio.ensure_future(model("Bye, " + guide(), temperature=0))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert (await second).tags[0].content == "world"  # type: ignore[union-attr]
+        assert first.cancelled()
+        assert mock_create.call_count == 6
+
+        # Calls with different deadlines are scheduled on their own
+        model.limiter = AIMDLimiter(initial_limit=1, max_limit=1, latency_tolerance=None)
+        held = await model.limiter.acquire()
+        urgent = asyncio.ensure_future(
+            model("Hi, " + guide(), temperature=0, deadline=time.monotonic() + 0.01)
+        )
+        relaxed = [asyncio.ensure_future(model("Hi, " + guide(), temperature=0)) for _ in range(2)]
+        with pytest.raises(DeadlineExceededError):
+            await urgent
+        model.limiter.release(held)
+        release.set()
+        results = await asyncio.gather(*relaxed)
+        assert [result.tags[0].content for result in results] == ["world"] * 2  # type: ignore[union-attr]
+        assert mock_create.call_count == 7
+
+
+@pytest.mark.asyncio
+async def test_async_amap():
+    client = AsyncOpenAI(api_key="test", timeout=0, max_retries=0)
+    in_flight = 0
+    max_in_flight = 0
+
+    async def create(**kwargs):
+        nonlocal in_flight, max_in_flight
+        prompt = kwargs["messages"][-1]["content"]
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        # Later inputs finish first
+        await asyncio.sleep(0.01 * (10 - int(prompt[len("<|GIM_QUERY|>") :][0])))
+        in_flight -= 1
+        if "fail" in prompt:
+            raise RuntimeError("boom")
+        response = MagicMock()
+        response.choices = [MagicMock()]
+        response.choices[0].message.content = f'<|MASKED id="m_0"|>{prompt[13]}<|/MASKED|>'
+        response.choices[0].message.refusal = None
+        return response
+
+    pulled = []
+
+    def inputs():
+        for i in range(6):
+            pulled.append(i)
+            yield f"{i}{' fail' if i == 3 else ''} " + str(guide())
+
+    with patch.object(client.chat.completions, "create", side_effect=create):
+        model = from_openai(client, model_name="gpt-4o")
+
+        items = [item async for item in model.amap(inputs(), concurrency=2, ordered=True)]
+        assert [item.index for item in items] == list(range(6))
+        assert max_in_flight == 2
+        assert [item.result.tags[0].content for item in items if item.ok] == list("01245")  # type: ignore[union-attr]
+        failed = items[3]
+        assert not failed.ok
+        assert isinstance(failed.error, RuntimeError)
+        assert failed.input.startswith("3 fail")
+
+        # Unordered mode yields items as they complete
+        items = [item async for item in model.amap(inputs(), concurrency=6)]
+        assert [item.index for item in items] == [5, 4, 3, 2, 1, 0]
+
+        # Inputs are only pulled when a slot is free
+        pulled.clear()
+        stream = model.amap(inputs(), concurrency=2)
+        await anext(stream)
+        assert pulled == [0, 1]
+        await stream.aclose()
+
+        with pytest.raises(ValueError, match="concurrency should be a positive integer"):
+            await anext(model.amap([], concurrency=0))
+
+
+def test_sync_map():
+    client = OpenAI(api_key="test", timeout=0, max_retries=0)
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+
+    def create(**kwargs):
+        nonlocal in_flight, max_in_flight
+        prompt = kwargs["messages"][-1]["content"]
+        with lock:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+        time.sleep(0.01 * (10 - int(prompt[13])))
+        with lock:
+            in_flight -= 1
+        if "fail" in prompt:
+            raise RuntimeError("boom")
+        response = MagicMock()
+        response.choices = [MagicMock()]
+        response.choices[0].message.content = f'<|MASKED id="m_0"|>{prompt[13]}<|/MASKED|>'
+        response.choices[0].message.refusal = None
+        return response
+
+    inputs = [f"{i}{' fail' if i == 3 else ''} " + str(guide()) for i in range(6)]
+    with patch.object(client.chat.completions, "create", side_effect=create):
+        model = from_openai(client, model_name="gpt-4o")
+
+        items = list(model.map(inputs, max_workers=3, ordered=True))
+        assert [item.index for item in items] == list(range(6))
+        assert max_in_flight == 3
+        assert [item.result.tags[0].content for item in items if item.ok] == list("01245")  # type: ignore[union-attr]
+        assert isinstance(items[3].error, RuntimeError)
+        assert items[3].input == inputs[3]
+
+        items = list(model.map(inputs, max_workers=6))
+        assert [item.index for item in items] == [5, 4, 3, 2, 1, 0]
+
+        with pytest.raises(ValueError, match="max_workers should be a positive integer"):
+            next(model.map(inputs, max_workers=0))
+
+
+def make_stream_chunks(text, size=5):
+    chunks = []
+    for i in range(0, len(text), size):
+        chunk = MagicMock()
+        chunk.choices = [MagicMock()]
+        chunk.choices[0].delta.content = text[i : i + size]
+        chunks.append(chunk)
+    return chunks
+
+
+STREAMED_RESPONSE = '<|GIM_RESPONSE|><|MASKED id="m_0"|>Ada<|/MASKED|><|MASKED id="m_1"|>London<|/MASKED|><|/GIM_RESPONSE|>'
+
+
+def test_sync_stream():
+    client = OpenAI(api_key="test", timeout=0, max_retries=0)
+    query = Query("Name: ", guide(), ", city: ", guide())
+
+    with patch.object(
+        client.chat.completions, "create", return_value=iter(make_stream_chunks(STREAMED_RESPONSE))
+    ) as mock_create:
+        model = from_openai(client, model_name="gpt-4o")
+        results = list(model.stream(query))
+        assert mock_create.call_args.kwargs["stream"] is True
+
+    assert [[tag.content for tag in result.tags] for result in results] == [
+        ["Ada", None],
+        ["Ada", "London"],
+        ["Ada", "London"],
+    ]
+    assert results[-1].parts == query.infill(STREAMED_RESPONSE).parts
+
+
+@pytest.mark.asyncio
+async def test_async_stream():
+    client = AsyncOpenAI(api_key="test", timeout=0, max_retries=0)
+    query = Query("Name: ", guide(), ", city: ", guide())
+
+    async def create(**kwargs):
+        async def chunks():
+            for chunk in make_stream_chunks(STREAMED_RESPONSE):
+                yield chunk
+
+        return chunks()
+
+    with patch.object(client.chat.completions, "create", side_effect=create):
+        model = from_openai(client, model_name="gpt-4o")
+        results = [result async for result in model.astream(query)]
+
+    assert [[tag.content for tag in result.tags] for result in results] == [
+        ["Ada", None],
+        ["Ada", "London"],
+        ["Ada", "London"],
+    ]
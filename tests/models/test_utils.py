@@ -4,11 +4,14 @@ from outlines.inputs import Chat
 from outlines.types.dsl import CFG, JsonSchema
 
 from gimkit.contexts import Query, Result
+from gimkit.exceptions import InvalidFormatError
 from gimkit.models.utils import (
+    ProgressiveInfill,
     get_outlines_model_input,
     get_outlines_output_type,
     infill_responses,
     json_responses_to_gim_response,
+    prepare_query,
 )
 from gimkit.prompts import SYSTEM_PROMPT_MSG, SYSTEM_PROMPT_MSG_JSON
 from gimkit.schemas import MaskedTag
@@ -76,6 +79,25 @@ def test_get_outlines_output_type():
         get_outlines_output_type(query, "xxx")
 
 
+def test_prepare_query():
+    prepared = prepare_query("Hello, " + str(MaskedTag(regex=r"\w+")), output_type="cfg")
+    assert isinstance(prepared.query, Query)
+    assert prepared.model_input == str(prepared.query)
+    assert prepared.outlines_output_type == get_outlines_output_type(prepared.query, "cfg")
+    assert prepare_query(prepared, output_type="json") is prepared
+
+    chat = prepared.chat_input()
+    assert isinstance(chat, Chat)
+    assert chat.messages == [{"role": "user", "content": prepared.model_input}]
+
+    query = Query("Hello, ", MaskedTag())
+    prepared = prepare_query(query, output_type="json", use_gim_prompt=True)
+    assert prepared.query is query
+    assert isinstance(prepared.model_input, Chat)
+    assert prepared.chat_input() is prepared.model_input
+    assert isinstance(prepared.outlines_output_type, JsonSchema)
+
+
 def test_json_responses_to_gim_response():
     json_str = '{"m_0": "John", "m_1": "Doe"}'
     expected_gim_str = '<|GIM_RESPONSE|><|MASKED id="m_0"|>John<|/MASKED|><|MASKED id="m_1"|>Doe<|/MASKED|><|/GIM_RESPONSE|>'
@@ -141,6 +163,16 @@ def test_infill_responses():
     assert isinstance(result_from_json, Result)
     assert str(result_from_json) == "Hello, world and friend"
 
+    # JSON responses that do not conform to the schema are rejected in strict mode
+    query_with_regex = Query("Age: ", MaskedTag(regex=r"\d+"))
+    with pytest.raises(InvalidFormatError, match="Field m_0 does not match regex"):
+        infill_responses(query_with_regex, ['{"m_0": "ten"}'], json_responses=True, strict=True)
+    with pytest.raises(InvalidFormatError, match="Missing field m_0"):
+        infill_responses(query_with_regex, "{}", json_responses=True, strict=True)
+    result_from_json = infill_responses(query_with_regex, '{"m_0": "ten"}', json_responses=True)
+    assert result_from_json.tags[0].content == "ten"
+    assert not result_from_json.tags[0].content_matches_regex()
+
     # Test invalid response type
     with pytest.raises(TypeError, match="Expected responses to be str or list of str, got"):
         infill_responses(query, 123)
@@ -152,3 +184,27 @@ def test_infill_responses():
     # Test list with non-string items
     with pytest.raises(TypeError, match="All items in the response list must be strings, got"):
         infill_responses(query, ["a", 1])
+
+
+def test_progressive_infill():
+    query = Query("Name: ", MaskedTag(name="name"), ", city: ", MaskedTag(regex=r"\w+"), ".")
+    response = '<|GIM_RESPONSE|><|MASKED id="m_0"|>Ada<|/MASKED|> <|MASKED id="m_1"|>London<|/MASKED|><|/GIM_RESPONSE|>'
+    infill = ProgressiveInfill(prepare_query(query))
+
+    partial_results = []
+    for i in range(0, len(response), 7):
+        if (partial_result := infill.feed(response[i : i + 7])) is not None:
+            partial_results.append([tag.content for tag in partial_result.tags])
+    assert partial_results == [["Ada", None], ["Ada", "London"]]
+    final = infill.finish()
+    assert final.parts == infill_responses(query, response).parts
+    assert final.tags["name"].content == "Ada"
+
+    # JSON responses and malformed streams only produce the final result
+    infill = ProgressiveInfill(prepare_query(query, output_type="json"))
+    assert infill.feed('{"m_0": "Ada", "m_1": "London"}') is None
+    assert str(infill.finish()) == "Name: Ada, city: London."
+
+    infill = ProgressiveInfill(prepare_query(query))
+    assert infill.feed("<|/MASKED|>") is None
+    assert infill.feed('<|MASKED id="m_0"|>Ada<|/MASKED|>') is None
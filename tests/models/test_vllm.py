@@ -5,9 +5,13 @@ import pytest
 from openai import AsyncOpenAI, OpenAI
 from outlines import VLLM as OutlinesVLLM
 from outlines import AsyncVLLM as OutlinesAsyncVLLM
+from outlines.types.dsl import CFG
 
+from gimkit.caches import CacheInfo, ResponseCache
 from gimkit.contexts import Query, Result
+from gimkit.dsls import build_cfg
 from gimkit.guides import guide
+from gimkit.models.base import generator_key
 from gimkit.models.vllm import VLLM as GIMVLLM
 from gimkit.models.vllm import AsyncVLLM as GIMAsyncVLLM
 from gimkit.models.vllm import from_vllm
@@ -36,6 +40,33 @@ def test_from_vllm():
         from_vllm("not a client")
 
 
+def test_shared_response_cache():
+    cache = ResponseCache()
+    models = []
+    for name in ("small", "large"):
+        client = OpenAI(api_key="test", base_url=f"http://{name}/v1", timeout=0, max_retries=0)
+        response = MagicMock()
+        response.choices = [MagicMock()]
+        response.choices[0].message.content = f'<|MASKED id="m_0"|>Hi {name}<|/MASKED|>'
+        response.choices[0].message.refusal = None
+        client.chat.completions.create = MagicMock(return_value=response)  # type: ignore[method-assign]
+        model = from_vllm(client)
+        model.response_cache = cache
+        models.append(model)
+
+    # Models on different servers do not share responses, even without a model name
+    small, large = models
+    for _ in range(2):
+        assert small("Hello, " + guide()).tags[0].content == "Hi small"  # type: ignore[union-attr]
+        assert large("Hello, " + guide()).tags[0].content == "Hi large"  # type: ignore[union-attr]
+    assert cache.info().hits == 2
+
+    # An explicit namespace lets them share anyway
+    small.cache_namespace = large.cache_namespace = "shared"
+    small("Bye, " + guide())
+    assert large("Bye, " + guide()).tags[0].content == "Hi small"  # type: ignore[union-attr]
+
+
 def test_sync_call():
     client = OpenAI(api_key="test", timeout=0, max_retries=0)
 
@@ -59,6 +90,19 @@ def test_sync_call():
         model(Query("Hello, ", guide()), include_grammar=True)
         model(["Hello, " + guide()])
 
+        # Queries with the same tag structure share one generator
+        model.generator_cache.clear()
+        model(Query("Bye, ", guide()))
+        generator = model.generator_cache.get(generator_key(CFG(build_cfg(Query(guide()))), None))
+        assert generator is not None
+        model(Query("Hello again, ", guide(desc="other")))
+        model(Query("Age: ", guide(regex=r"\d+")))
+        assert model.generator_cache.info() == CacheInfo(hits=2, misses=2, maxsize=32, currsize=2)
+
+        items = list(model.map(["Hello, " + guide()] * 3, max_workers=2, ordered=True))
+        assert [item.result.tags[0].content for item in items] == ["world"] * 3  # type: ignore[union-attr]
+        assert mock_create.call_args[1]["stop"] == "<|/GIM_RESPONSE|>"
+
         # Model raises error on invalid output type
         with pytest.raises(ValueError, match="Invalid output type: xxx"):
             model(Query("hi"), output_type="xxx")
@@ -84,3 +128,7 @@ async def test_async_call():
         assert result.tags[0] == MaskedTag(id=0, content="world")
         mock_create.assert_awaited_once()
         assert mock_create.call_args[1]["stop"] == "<|/GIM_RESPONSE|>"
+
+        items = [item async for item in model.amap(["Hello, " + guide()] * 3, ordered=True)]
+        assert [item.result.tags[0].content for item in items] == ["world"] * 3  # type: ignore[union-attr]
+        assert mock_create.call_args[1]["stop"] == "<|/GIM_RESPONSE|>"
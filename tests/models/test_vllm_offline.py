@@ -6,7 +6,10 @@ import pytest
 
 from outlines.models.vllm_offline import VLLMOffline as OutlinesVLLMOffline
 
-from gimkit.contexts import Result
+from gimkit.caches import ResponseCache
+from gimkit.contexts import Query, Result
+from gimkit.dsls import build_cfg
+from gimkit.models.utils import prepare_query
 from gimkit.models.vllm_offline import VLLMOffline as GIMVLLMOffline
 from gimkit.models.vllm_offline import from_vllm_offline
 from gimkit.schemas import MaskedTag
@@ -43,6 +46,10 @@ def test_vllm_offline_call():
 
         model(MaskedTag(), include_grammar=True)
 
+        # Streaming falls back to a single complete result
+        (streamed,) = model.stream(MaskedTag())
+        assert streamed.tags[0].content == "hi"
+
 
 def test_vllm_offline_call_invalid_response():
     from vllm import LLM, SamplingParams
@@ -56,6 +63,8 @@ def test_vllm_offline_call_invalid_response():
         with pytest.raises(TypeError, match="Expected responses to be str or list of str, got"):
             model(MaskedTag())
 
+    # Generators are cached per model, so drop the one created with the previous patch
+    model.generator_cache.clear()
     with patch("gimkit.models.vllm_offline.Generator") as mock_generator:
         generator_instance = MagicMock()
         generator_instance.return_value = [object, "response2"]
@@ -63,9 +72,153 @@ def test_vllm_offline_call_invalid_response():
         with pytest.raises(TypeError, match="All items in the response list must be strings, got"):
             model(MaskedTag(), sampling_params=SamplingParams(n=2))
 
+    # Generators are cached per model, so drop the one created with the previous patch
+    model.generator_cache.clear()
     with patch("gimkit.models.vllm_offline.Generator") as mock_generator:
         generator_instance = MagicMock()
         generator_instance.return_value = []
         mock_generator.return_value = generator_instance
         with pytest.raises(ValueError, match="Response list is empty"):
             model(MaskedTag())
+
+
+def test_vllm_offline_batch():
+    from vllm import LLM, SamplingParams
+
+    mock_client = MagicMock(spec=LLM)
+    model = from_vllm_offline(mock_client)
+
+    def make_output(*texts):
+        output = MagicMock()
+        output.outputs = [MagicMock(text=text) for text in texts]
+        return output
+
+    mock_client.chat.return_value = [
+        make_output('<|MASKED id="m_0"|>hi<|/MASKED|>'),
+        make_output('{"m_0": "1", "m_1": "2"}'),
+    ]
+    prepared = prepare_query([MaskedTag(regex=r"\d"), MaskedTag()], output_type="json")
+    results = model.batch([MaskedTag(regex=r"\w+"), prepared], sampling_params=SamplingParams())
+    assert [str(result) for result in results] == ["hi", "12"]  # type: ignore[union-attr]
+
+    # A single engine call with per-request structured outputs
+    mock_client.chat.assert_called_once()
+    kwargs = mock_client.chat.call_args.kwargs
+    assert len(kwargs["messages"]) == 2
+    first, second = kwargs["sampling_params"]
+    assert first.structured_outputs.grammar == build_cfg(Query(MaskedTag(regex=r"\w+")))
+    assert second.structured_outputs.json is not None
+    assert "<|/GIM_RESPONSE|>" in first.stop
+
+    # Several samples per query give a list of results
+    mock_client.chat.return_value = [
+        make_output(*(f'<|MASKED id="m_0"|>{x}<|/MASKED|>' for x in "ab"))
+    ]
+    (samples,) = model.batch([MaskedTag()], sampling_params=SamplingParams(n=2))
+    assert isinstance(samples, list)
+    assert [str(result) for result in samples] == ["a", "b"]
+
+    assert model.batch([]) == []
+
+    # Cached queries are not sent to the engine
+    model.response_cache = ResponseCache()
+    mock_client.chat.reset_mock()
+    mock_client.chat.return_value = [make_output('<|MASKED id="m_0"|>x<|/MASKED|>')]
+    model.batch([MaskedTag()])
+    mock_client.chat.return_value = [make_output('<|MASKED id="m_0"|>1<|/MASKED|>')]
+    results = model.batch([MaskedTag(), MaskedTag(regex=r"\d")])
+    assert [str(result) for result in results] == ["x", "1"]  # type: ignore[union-attr]
+    assert mock_client.chat.call_count == 2
+    assert len(mock_client.chat.call_args.kwargs["messages"]) == 1
+
+
+def test_offline_models_sharing_a_cache():
+    from vllm import LLM
+
+    def make_engine(path):
+        engine = MagicMock(spec=LLM)
+        engine.llm_engine = MagicMock()
+        engine.llm_engine.model_config.model = path
+        return engine
+
+    cache = ResponseCache()
+    small, large, unnamed = (
+        from_vllm_offline(engine)
+        for engine in (make_engine("small"), make_engine("large"), MagicMock(spec=LLM))
+    )
+    for model, response in ((small, "s"), (large, "l"), (unnamed, "u")):
+        model.response_cache = cache
+        with patch.object(
+            model, "_generate", return_value=f'<|MASKED id="m_0"|>{response}<|/MASKED|>'
+        ):
+            model(MaskedTag())
+
+    # Each engine gets its own entries, keyed by model path when it is known
+    assert cache.info().currsize == 3
+    with patch.object(small, "_generate") as generate:
+        assert str(small(MaskedTag())) == "s"
+        generate.assert_not_called()
+
+
+class CharTokenizer:
+    """A tokenizer with one token per character and a ChatML-like template."""
+
+    def __init__(self):
+        self.num_renders = 0
+
+    def get_chat_template(self):
+        return "chatml"
+
+    def apply_chat_template(self, messages, tokenize, add_generation_prompt):
+        self.num_renders += 1
+        turns = "".join(f"<{m['role']}>{m['content']}</{m['role']}>" for m in messages)
+        return turns + "<assistant>"
+
+    def encode(self, text, add_special_tokens):
+        return [ord(c) for c in text]
+
+
+def test_vllm_offline_pretokenized_prompts():
+    from vllm import LLM, SamplingParams
+
+    tokenizer = CharTokenizer()
+    mock_client = MagicMock(spec=LLM)
+    mock_client.get_tokenizer.return_value = tokenizer
+    model = from_vllm_offline(mock_client)
+
+    output = MagicMock()
+    output.outputs = [MagicMock(text='<|MASKED id="m_0"|>hi<|/MASKED|>')]
+    mock_client.generate.return_value = [output]
+
+    for _ in range(3):
+        result = model(MaskedTag(), use_gim_prompt=True, sampling_params=SamplingParams())
+        assert isinstance(result, Result)
+        assert result.tags[0].content == "hi"
+
+    # The few-shot conversation is rendered once, and prompts are sent as token ids
+    assert tokenizer.num_renders == 1
+    mock_client.chat.assert_not_called()
+    (prompt,) = mock_client.generate.call_args.kwargs["prompts"]
+    chat = prepare_query(MaskedTag(), use_gim_prompt=True).chat_input()
+    expected = tokenizer.apply_chat_template(chat.messages, False, True)
+    assert prompt["prompt_token_ids"] == tokenizer.encode(expected, False)
+
+    # Batches are pre-tokenized too
+    mock_client.generate.return_value = [output, output]
+    model.batch([MaskedTag(), MaskedTag()], sampling_params=SamplingParams())
+    prompts = mock_client.generate.call_args.kwargs["prompts"]
+    assert all("prompt_token_ids" in prompt for prompt in prompts)
+
+    # Templates whose tokens would span the query boundary are not split
+    class MergingTokenizer(CharTokenizer):
+        def encode(self, text, add_special_tokens):
+            return [ord(c) for c in text.replace("><", "\x01")]
+
+    mock_client = MagicMock(spec=LLM)
+    mock_client.get_tokenizer.return_value = MergingTokenizer()
+    mock_client.chat.return_value = [output]
+    model = from_vllm_offline(mock_client)
+    with patch("gimkit.models.vllm_offline.Generator") as mock_generator:
+        mock_generator.return_value = MagicMock(return_value='<|MASKED id="m_0"|>hi<|/MASKED|>')
+        assert model(MaskedTag(), sampling_params=SamplingParams()).tags[0].content == "hi"  # type: ignore[union-attr]
+        mock_generator.assert_called_once()
@@ -0,0 +1,157 @@
+import asyncio
+import time
+
+from unittest.mock import MagicMock
+
+import openai
+import pytest
+
+from openai import AsyncOpenAI, OpenAI
+
+from gimkit.guides import guide
+from gimkit.models.limits import HedgePolicy
+from gimkit.models.vllm import VLLM
+from gimkit.models.vllm_pool import AsyncVLLMPool, VLLMPool, from_vllm_pool
+
+
+def make_response():
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[
+        0
+    ].message.content = '<|GIM_RESPONSE|><|MASKED id="m_0"|>world<|/MASKED|><|/GIM_RESPONSE|>'
+    response.choices[0].message.refusal = None
+    return response
+
+
+def test_from_vllm_pool():
+    clients = [OpenAI(api_key="test", base_url=f"http://{name}/v1") for name in "ab"]
+    pool = from_vllm_pool(clients, model_name="m")
+    assert type(pool) is VLLMPool
+    assert all(type(model) is VLLM for model in pool.models)
+    assert [stats.base_url for stats in pool.stats()] == ["http://a/v1/", "http://b/v1/"]
+
+    async_pool = from_vllm_pool([AsyncOpenAI(api_key="test")])
+    assert type(async_pool) is AsyncVLLMPool
+
+    with pytest.raises(ValueError, match="non-empty list of clients"):
+        from_vllm_pool([])
+    with pytest.raises(ValueError, match="non-empty list of clients"):
+        from_vllm_pool([clients[0], AsyncOpenAI(api_key="test")])  # type: ignore[list-item]
+    with pytest.raises(ValueError, match="max_failures should be a positive integer"):
+        from_vllm_pool(clients, max_failures=0)
+
+
+def test_sync_pool_ejects_and_readmits(monkeypatch):
+    clients = {name: OpenAI(api_key="test", base_url=f"http://{name}/v1") for name in "abc"}
+    healthy = dict.fromkeys(clients, True)
+
+    def stub_server(name):
+        def create(**kwargs):
+            if not healthy[name]:
+                raise openai.APIConnectionError(request=MagicMock())
+            return make_response()
+
+        return create
+
+    for name, client in clients.items():
+        monkeypatch.setattr(client.chat.completions, "create", stub_server(name))
+
+    pool = from_vllm_pool(list(clients.values()), max_failures=2, cooldown=10)
+    for _ in range(3):
+        assert pool("Hello, " + guide()).tags[0].content == "world"  # type: ignore[union-attr]
+    assert [stats.requests for stats in pool.stats()] == [1, 1, 1]
+
+    # Failed calls are retried on the other endpoints, and "b" gets ejected
+    healthy["b"] = False
+    for _ in range(6):
+        assert pool("Hello, " + guide()).tags[0].content == "world"  # type: ignore[union-attr]
+    a, b, c = pool.stats()
+    assert b.failures == 2
+    assert not b.healthy
+    assert a.healthy and c.healthy
+    assert a.outstanding == b.outstanding == c.outstanding == 0
+
+    # Errors are raised once every endpoint has failed
+    healthy.update(a=False, c=False)
+    with pytest.raises(Exception, match="Connection error"):
+        pool("Hello, " + guide())
+    healthy.update(a=True, c=True)
+
+    # Other errors are not retried
+    with pytest.raises(ValueError, match="Invalid output type"):
+        pool("Hello, " + guide(), output_type="xxx")  # type: ignore[arg-type]
+
+    # After the cooldown, "b" is re-admitted on probation and recovers on success
+    healthy["b"] = True
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 20)
+    assert all(stats.healthy for stats in pool.stats())
+    for _ in range(3):
+        pool("Hello, " + guide())
+    assert pool.stats()[1].requests > b.requests
+
+
+@pytest.mark.asyncio
+async def test_async_pool_balances_load(monkeypatch):
+    async def run(num_servers, num_calls=16, delay=0.02):
+        # Each stub server processes one request at a time
+        clients = [
+            AsyncOpenAI(api_key="test", base_url=f"http://s{i}/v1") for i in range(num_servers)
+        ]
+        counts = [0] * num_servers
+        for i, client in enumerate(clients):
+            lock = asyncio.Lock()
+
+            async def create(i=i, lock=lock, **kwargs):
+                async with lock:
+                    counts[i] += 1
+                    await asyncio.sleep(delay)
+                return make_response()
+
+            monkeypatch.setattr(client.chat.completions, "create", create)
+
+        pool = from_vllm_pool(clients)
+        start = time.perf_counter()
+        results = await asyncio.gather(*(pool("Hello, " + guide()) for _ in range(num_calls)))
+        elapsed = time.perf_counter() - start
+        items = [item async for item in pool.amap(["Hello, " + guide()] * 8, concurrency=8)]
+        assert all(result.tags[0].content == "world" for result in results)  # type: ignore[union-attr]
+        assert all(item.ok for item in items)
+        return elapsed, counts, pool
+
+    elapsed_single, _, _ = await run(1)
+    elapsed_pool, counts, pool = await run(4)
+
+    # Requests are spread evenly, and serving them takes a fraction of the time
+    assert counts == [6, 6, 6, 6]
+    assert [stats.requests for stats in pool.stats()] == [6, 6, 6, 6]
+    assert [stats.outstanding for stats in pool.stats()] == [0, 0, 0, 0]
+    assert elapsed_pool < elapsed_single / 2
+
+
+@pytest.mark.asyncio
+async def test_async_pool_hedges_on_another_endpoint(monkeypatch):
+    clients = [AsyncOpenAI(api_key="test", base_url=f"http://{name}/v1") for name in "ab"]
+    delays = {"a": 0.01, "b": 0.01}
+    for name, client in zip("ab", clients, strict=True):
+
+        async def create(name=name, **kwargs):
+            await asyncio.sleep(delays[name])
+            return make_response()
+
+        monkeypatch.setattr(client.chat.completions, "create", create)
+
+    pool = from_vllm_pool(clients)
+    pool.hedging = HedgePolicy(max_extra_load=1, burst=1, min_samples=2)
+    for _ in range(2):
+        await pool("Hello, " + guide())
+
+    # "a" gets stuck: the call is hedged on "b", which answers first
+    delays["a"] = 10
+    result = await asyncio.wait_for(pool("Hello, " + guide()), timeout=5)
+    assert result.tags[0].content == "world"  # type: ignore[union-attr]
+    await asyncio.sleep(0)
+    assert [stats.requests for stats in pool.stats()] == [2, 2]
+    assert [stats.outstanding for stats in pool.stats()] == [0, 0]
+    assert pool.hedging.info().wins == 1
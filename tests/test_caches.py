@@ -0,0 +1,116 @@
+import time
+
+import pytest
+
+from gimkit.caches import CacheInfo, DiskCache, LRUCache, ResponseCache
+
+
+def test_lru_cache_eviction():
+    cache: LRUCache[str, int] = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "a" becomes the most recently used entry
+    cache.put("c", 3)
+    assert "b" not in cache
+    assert "a" in cache
+    assert "c" in cache
+    assert len(cache) == 2
+
+    cache.maxsize = 1
+    assert len(cache) == 1
+    assert "c" in cache
+    assert cache.pop("c") == 3
+    assert cache.pop("c") is None
+
+
+def test_lru_cache_info_and_clear():
+    cache: LRUCache[str, int] = LRUCache(maxsize=4)
+    assert cache.info() == CacheInfo(hits=0, misses=0, maxsize=4, currsize=0)
+    assert cache.info().hit_rate == 0.0
+
+    calls = []
+
+    def factory() -> int:
+        calls.append(1)
+        return 42
+
+    assert cache.get_or_create("k", factory) == 42
+    assert cache.get_or_create("k", factory) == 42
+    assert len(calls) == 1
+    assert cache.info() == CacheInfo(hits=1, misses=1, maxsize=4, currsize=1)
+    assert cache.info().hit_rate == 0.5
+
+    cache.clear()
+    assert cache.info() == CacheInfo(hits=0, misses=0, maxsize=4, currsize=0)
+
+
+def test_lru_cache_disabled_and_invalid():
+    cache: LRUCache[str, int] = LRUCache(maxsize=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+    with pytest.raises(ValueError, match="maxsize should be a non-negative integer"):
+        LRUCache(maxsize=-1)
+    with pytest.raises(ValueError, match="maxsize should be a non-negative integer"):
+        cache.maxsize = -1
+
+    def failing_factory() -> int:
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        cache.get_or_create("a", failing_factory)
+
+
+def test_disk_cache(tmp_path):
+    cache = DiskCache(tmp_path / "sub")
+    assert cache.get("k") is None
+    assert cache.info() == CacheInfo(hits=0, misses=1, maxsize=None, currsize=0)
+
+    cache.put("k", "välue")
+    assert cache.get("k") == "välue"
+    # Another instance on the same directory sees the stored value
+    assert DiskCache(tmp_path / "sub").get("k") == "välue"
+    assert cache.info() == CacheInfo(hits=1, misses=1, maxsize=None, currsize=1)
+
+    cache.clear()
+    assert cache.get("k") is None
+    assert cache.info().currsize == 0
+
+    # Write failures are swallowed
+    (tmp_path / "file").write_text("")
+    DiskCache(tmp_path / "file").put("k", "v")
+
+
+def test_response_cache(tmp_path, monkeypatch):
+    key = ResponseCache.make_key("model", [{"role": "user", "content": "hi"}], {"n": 2})
+    assert key == ResponseCache.make_key("model", [{"content": "hi", "role": "user"}], {"n": 2})
+    assert key != ResponseCache.make_key("model", [{"role": "user", "content": "hi"}], {"n": 3})
+
+    cache = ResponseCache(maxsize=1, path=tmp_path / "responses.sqlite")
+    assert cache.get(key) is None
+    cache.put(key, ["a", "b"])
+    cache.put("other", "c")
+    # Entries evicted from memory are still found in the database
+    assert cache.get(key) == ["a", "b"]
+    assert cache.info() == CacheInfo(hits=1, misses=1, maxsize=1, currsize=1)
+
+    # The database is shared with new instances
+    assert ResponseCache(path=tmp_path / "responses.sqlite").get("other") == "c"
+
+    # Entries expire after their time to live
+    now = time.time()
+    cache.put("short", "d", ttl=10)
+    monkeypatch.setattr(time, "time", lambda: now + 20)
+    assert cache.get("short") is None
+    assert cache.get(key) == ["a", "b"]
+
+    cache.clear()
+    assert cache.get(key) is None
+    assert cache.info() == CacheInfo(hits=0, misses=1, maxsize=1, currsize=0)
+    cache.close()
+
+    memory_cache = ResponseCache(ttl=10)
+    memory_cache.put(key, "e")
+    assert memory_cache.get(key) == "e"
+    monkeypatch.setattr(time, "time", lambda: now + 40)
+    assert memory_cache.get(key) is None
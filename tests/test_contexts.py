@@ -1,6 +1,6 @@
 import pytest
 
-from gimkit.contexts import Context, Query, Response, Result, infill
+from gimkit.contexts import Context, Query, Response, Result, infill, infill_many
 from gimkit.exceptions import InvalidFormatError
 from gimkit.guides import guide as g
 from gimkit.schemas import QUERY_PREFIX, QUERY_SUFFIX, RESPONSE_PREFIX, RESPONSE_SUFFIX, MaskedTag
@@ -180,6 +180,64 @@ def test_result_tags_modify():
         tags[None] = "new value"
 
 
+def test_tags_view_index():
+    query = Query("a", g(name="x"), "b", g(name="y"), "c", g())
+    tags = query.tags
+    assert query.tags is tags
+    assert [tag.name for tag in tags] == ["x", "y", None]
+    assert tags[-1] is query.parts[6]
+    assert tags["y"] is query.parts[4]
+
+    # Replacing a tag through the view updates the index incrementally
+    tags["x"] = MaskedTag(name="z")
+    assert tags[0].name == "z"
+    assert tags["z"] is query.parts[2]
+    with pytest.raises(KeyError, match=r"Tag name 'x' does not exist."):
+        tags["x"]
+    tags[-1] = "text"
+    assert len(tags) == 2
+    assert tags[1].name == "y"
+    tags["y"] = MaskedTag(name="y", content="same name")
+    assert tags["y"].content == "same name"
+
+    # Renaming a tag in place is picked up on the next lookup
+    tags[0].name = "renamed"
+    assert tags["renamed"] is tags[0]
+    with pytest.raises(KeyError, match=r"Tag name 'z' does not exist."):
+        tags["z"]
+
+    # Changes made directly to the parts list are detected
+    query.parts.append(MaskedTag(name="appended"))
+    assert len(tags) == 3
+    assert tags["appended"] is query.parts[-1]
+    query.parts[2] = "no longer a tag"
+    assert tags[0].name == "y"
+    assert tags[:] == [query.parts[4], query.parts[-1]]
+
+    # Including replacements that keep the length of the parts list
+    query.parts[1] = MaskedTag(name="x")
+    assert len(tags) == 3
+    assert [tag.name for tag in tags] == ["x", "y", "appended"]
+
+
+def test_tags_view_duplicate_names():
+    result = Result(g(name="dup", content="1"), g(name="dup", content="2"), g(name="other"))
+    tags = result.tags
+    assert tags["dup"].content == "2"
+    tags[1] = "removed"
+    assert tags["dup"].content == "1"
+    tags["other"] = MaskedTag(name="dup", content="3")
+    assert tags["dup"].content == "3"
+
+    # A tag renamed in place to a duplicate name wins once the index is rebuilt
+    result = Result(g(name="a", content="1"), g(name="b", content="2"))
+    assert result.tags["a"].content == "1"
+    result.tags[1].name = "a"
+    assert result.tags["a"].content == "1"
+    result.parts.append("")
+    assert result.tags["a"].content == "2"
+
+
 def test_infill_non_strict():
     query = Query(f"Hello, {g(name='obj')}")
 
@@ -232,3 +290,29 @@ def test_infill_strict():
         InvalidFormatError, match=r"Mismatch in number of tags between query and response"
     ):
         infill(query, response, strict=True)
+
+
+def test_infill_many():
+    query = Query(f"{QUERY_PREFIX}Hello, ", g(name="a"), " and ", g(name="b", content="x"))
+    responses = [
+        f'{RESPONSE_PREFIX}<|MASKED id="m_0"|>world<|/MASKED|><|MASKED id="m_1"|>y',
+        Response(MaskedTag(id=0, content="mars"), MaskedTag(id=1)),
+    ]
+    with pytest.warns(UserWarning, match=r"Response has missing ending tags"):
+        results = infill_many(query, responses)
+    assert [str(result) for result in results] == ["Hello, world and y", "Hello, mars and x"]
+    assert [tag.name for tag in results[0].tags] == ["a", "b"]
+    assert "" not in results[0].parts[1:-1]
+    assert results[0].tags["a"] is not query.tags["a"]
+    assert infill_many(query, []) == []
+
+    # The query is parsed once for all responses
+    assert [str(r) for r in infill_many("Hi " + g(), [g(content="1"), g(content="2")])] == [
+        "Hi 1",
+        "Hi 2",
+    ]
+
+    with pytest.raises(
+        InvalidFormatError, match=r"Mismatch in number of tags between query and response"
+    ):
+        infill_many(query, [Response(g(content="only one"))], strict=True)
@@ -1,10 +1,17 @@
 import pytest
 
+from gimkit import dsls
 from gimkit.contexts import Query
 from gimkit.dsls import (
+    CFG_CACHE,
     build_cfg,
     build_json_schema,
+    build_json_validator,
+    cfg_signature,
+    get_cfg_disk_cache,
+    set_cfg_cache_dir,
 )
+from gimkit.exceptions import InvalidFormatError
 from gimkit.schemas import MaskedTag
 
 
@@ -83,3 +90,59 @@ def test_build_json_schema():
         "additionalProperties": False,
     }
     assert schema == expected_schema
+
+    # Schemas are shared by queries with the same structure
+    assert build_json_schema(Query("Who? ", *query.tags[:])) is schema
+
+
+def test_build_json_validator():
+    query = Query("Name: ", MaskedTag(regex="[a-zA-Z]+"), ", Age: ", MaskedTag(desc="age"))
+    validator = build_json_validator(query)
+    assert validator is build_json_validator(query)
+    assert validator.schema is build_json_schema(query)
+
+    assert validator.errors({"m_0": "Alice", "m_1": "anything"}) == []
+    validator.validate({"m_0": "Alice", "m_1": ""})
+
+    assert validator.errors(["Alice"]) == ["Expected a JSON object, got list."]
+    assert validator.errors({"m_0": "Al1ce", "m_1": 3, "m_2": "x"}) == [
+        "Field m_0 does not match regex `[a-zA-Z]+`.",
+        "Field m_1 should be a string, got int.",
+        "Unexpected field m_2.",
+    ]
+    with pytest.raises(InvalidFormatError, match=r"Invalid JSON response: Missing field m_1\."):
+        validator.validate({"m_0": "Alice"})
+
+
+def test_build_cfg_cache(tmp_path, monkeypatch):
+    CFG_CACHE.clear()
+    query = Query("Hello, ", MaskedTag(regex=r"\w+"), " and ", MaskedTag())
+    other = Query("Bye ", MaskedTag(regex=r"\w+"), "!", MaskedTag(desc="anything"))
+    assert cfg_signature(query) == cfg_signature(other) == (r"\w+", None)
+
+    grammar = build_cfg(query)
+    assert build_cfg(other) is grammar
+    assert CFG_CACHE.info().hits == 1
+    assert CFG_CACHE.info().misses == 1
+
+    # The on-disk layer serves grammars to fresh processes without validating them again
+    set_cfg_cache_dir(tmp_path)
+    try:
+        disk_cache = get_cfg_disk_cache()
+        assert disk_cache is not None
+        CFG_CACHE.clear()
+        assert build_cfg(query) == grammar
+        assert disk_cache.info().currsize == 1
+
+        CFG_CACHE.clear()
+
+        def fail_validation(grammar_spec):
+            raise AssertionError("Grammar should not be validated again")
+
+        monkeypatch.setattr(dsls, "validate_grammar_spec", fail_validation)
+        assert build_cfg(query) == grammar
+        assert disk_cache.info().hits == 1
+    finally:
+        set_cfg_cache_dir(None)
+        CFG_CACHE.clear()
+    assert get_cfg_disk_cache() is None
@@ -1,4 +1,6 @@
 import re
+import subprocess
+import sys
 
 import gimkit
 
@@ -13,3 +15,16 @@ def test_gimkit_version():
             r"^([1-9][0-9]*!)?(0|[1-9][0-9]*)(\.(0|[1-9][0-9]*))*((a|b|rc)(0|[1-9][0-9]*))?(\.post(0|[1-9][0-9]*))?(\.dev(0|[1-9][0-9]*))?$",
             v,
         )
+
+
+def test_import_is_lazy():
+    # Run in a fresh interpreter, since the test session has already imported the backends.
+    code = (
+        "import sys, logging, gimkit\n"
+        "heavy = [m for m in ('outlines', 'openai', 'llguidance', 'json_repair') if m in sys.modules]\n"
+        "assert not heavy, heavy\n"
+        "assert not logging.getLogger().handlers\n"
+        "assert gimkit.from_openai is gimkit.models.from_openai\n"
+        "assert 'openai' in sys.modules\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
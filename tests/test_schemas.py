@@ -11,14 +11,20 @@ from gimkit.schemas import (
     COMMON_ATTRS,
     QUERY_PREFIX,
     QUERY_SUFFIX,
+    REGEX_CACHE,
     RESPONSE_PREFIX,
     RESPONSE_SUFFIX,
+    TAG_END,
     TAG_END_PATTERN,
     TAG_FULL_PATTERN,
     TAG_OPEN_PATTERN,
     MaskedTag,
+    StreamingResponseParser,
     TagField,
+    compile_regex,
+    parse_parts,
     parse_tags,
+    scan_parts,
     validate,
 )
 
@@ -85,6 +91,49 @@ def test_masked_tag_init_with_regex():
         MaskedTag(regex="[")
 
 
+def test_compile_regex_cache():
+    REGEX_CACHE.clear()
+    pattern = compile_regex(r"\d+-cache-test")
+    assert compile_regex(r"\d+-cache-test") is pattern
+    assert compile_regex(r"\d+-cache-test", re.IGNORECASE) is not pattern
+    info = REGEX_CACHE.info()
+    assert (info.hits, info.misses, info.currsize) == (1, 2, 2)
+
+    # Tag validation goes through the same cache
+    MaskedTag(regex=r"\d+-cache-test")
+    assert REGEX_CACHE.info().hits == 2
+
+    with pytest.raises(re.error):
+        compile_regex("[")
+    assert REGEX_CACHE.info().currsize == 2
+
+
+def test_masked_tag_content_matches_regex():
+    assert MaskedTag().content_matches_regex()
+    assert MaskedTag(content="x").content_matches_regex()
+    assert not MaskedTag(regex=r"\d+").content_matches_regex()
+    assert MaskedTag(regex=r"\d+", content="123").content_matches_regex()
+    assert not MaskedTag(regex=r"\d+", content="123a").content_matches_regex()
+
+
+def test_masked_tag_slots():
+    tag = MaskedTag(id=0, content="x")
+    assert not hasattr(tag, "__dict__")
+    with pytest.raises(AttributeError):
+        tag.extra = 1  # type: ignore[attr-defined]
+
+
+def test_masked_tag_trusted():
+    tag = MaskedTag(id="1", name="n", desc="a &amp; b", regex=r"\w+", content="c")
+    trusted = MaskedTag._trusted(tag.id, tag.name, tag.desc, tag.regex, tag.content)
+    assert trusted == tag
+    assert trusted is not tag
+    assert trusted.desc == "a & b"
+
+    # No validation nor unescaping happens on the trusted path
+    assert MaskedTag._trusted(None, None, "&amp;", None, None).desc == "&amp;"
+
+
 def test_masked_tag_attr_escape():
     original = "& < > \" ' \t \n \r"
     escaped = MaskedTag.attr_escape(original)
@@ -174,6 +223,42 @@ def test_parse_tags_invalid():
         )
 
 
+def test_scan_parts():
+    s = 'Hi <|MASKED id="m_0" desc="x"|>a<|/MASKED|>, <|MASKED|>b<|/MASKED|>!'
+    parts, spans = scan_parts(s)
+    assert parts == [
+        "Hi ",
+        MaskedTag(id=0, desc="x", content="a"),
+        ", ",
+        MaskedTag(content="b"),
+        "!",
+    ]
+    assert [s[start:end] for start, end in spans] == [
+        "Hi ",
+        '<|MASKED id="m_0" desc="x"|>a<|/MASKED|>',
+        ", ",
+        "<|MASKED|>b<|/MASKED|>",
+        "!",
+    ]
+    assert parse_parts(s) == parts
+    assert scan_parts("") == ([], [])
+
+    # A malformed opening marker is kept as plain text
+    assert parse_parts("<|MASKED foo") == ["<|MASKED foo"]
+
+
+def test_scan_parts_invalid():
+    for s in (
+        "<|MASKED|>no end",
+        "no open<|/MASKED|>",
+        "<|MASKED|><|/MASKED|><|/MASKED|>",
+        "<|MASKED|>a<|MASKED|>b<|/MASKED|><|/MASKED|>",
+        "<|MASKED|>a<|MASKED foo<|/MASKED|>",
+    ):
+        with pytest.raises(InvalidFormatError, match="Mismatched or nested masked tags"):
+            scan_parts(s)
+
+
 def test_validate_wrapped_masked_io_yes():
     # Valid: simple case
     query = '<|GIM_QUERY|>This is an <|MASKED id="m_0"|><|/MASKED|> text.<|/GIM_QUERY|>'
@@ -240,3 +325,79 @@ def test_validate_wrapped_masked_io_no():
         InvalidFormatError, match=r"Mismatched number of masked tags between query and response"
     ):
         validate(query, response)
+
+
+def test_streaming_response_parser():
+    response = (
+        f'{RESPONSE_PREFIX}\n<|MASKED id="m_0"|>Hello<|/MASKED|>'
+        f'<|MASKED id="m_1"|>a |> b<|/MASKED|><|MASKED id="m_2"|><|/MASKED|>{RESPONSE_SUFFIX}'
+    )
+    expected = parse_tags(response, RESPONSE_PREFIX, RESPONSE_SUFFIX)
+
+    # Every split point, including markers split across two chunks
+    for i in range(len(response) + 1):
+        parser = StreamingResponseParser(strict=True)
+        tags = parser.feed(response[:i]) + parser.feed(response[i:]) + parser.close()
+        assert tags == expected
+        assert parser.num_tags == 3
+
+    # Character by character, each tag is emitted as soon as its end marker arrives
+    parser = StreamingResponseParser()
+    emitted_at = {}
+    for i, char in enumerate(response):
+        for tag in parser.feed(char):
+            emitted_at[tag.id] = i
+    assert emitted_at[0] == response.index(TAG_END) + len(TAG_END) - 1
+    assert parser.close() == []
+    assert parser.close() == []
+    with pytest.raises(ValueError, match="Cannot feed a closed StreamingResponseParser"):
+        parser.feed("")
+
+
+def test_streaming_response_parser_unclosed():
+    parser = StreamingResponseParser()
+    assert parser.feed('<|MASKED id="m_0"|>wor') == []
+    assert parser.feed("ld<|/MASK") == []
+    assert parser.close() == [MaskedTag(id=0, content="world")]
+
+    # The response suffix ends an unclosed tag, even when split across deltas
+    response = f'<|MASKED id="m_0"|>world{RESPONSE_SUFFIX}\n'
+    for i in range(len(response) + 1):
+        parser = StreamingResponseParser()
+        tags = parser.feed(response[:i]) + parser.feed(response[i:]) + parser.close()
+        assert tags == [MaskedTag(id=0, content="world")]
+    parser = StreamingResponseParser()
+    parser.feed('<|MASKED id="m_0"|>world<|/GIM_RESP')
+    assert parser.close() == [MaskedTag(id=0, content="world")]
+
+    parser = StreamingResponseParser(strict=True)
+    parser.feed('<|MASKED id="m_0"|>world')
+    with pytest.raises(InvalidFormatError, match="Response ends with an unclosed masked tag"):
+        parser.close()
+
+    parser = StreamingResponseParser(strict=True)
+    parser.feed('<|MASKED id="m_0"')
+    with pytest.raises(InvalidFormatError, match="Response ends with an incomplete masked tag"):
+        parser.close()
+
+
+def test_streaming_response_parser_invalid():
+    with pytest.raises(InvalidFormatError, match="Mismatched or nested masked tags"):
+        StreamingResponseParser().feed("text<|/MASKED|>")
+    with pytest.raises(InvalidFormatError, match="Mismatched or nested masked tags"):
+        StreamingResponseParser().feed("<|MASKED|>a<|MASKED|>")
+    with pytest.raises(
+        InvalidFormatError, match=r"Tag ids should be in order, got 2 at position 1"
+    ):
+        StreamingResponseParser().feed(
+            '<|MASKED id="m_0"|><|/MASKED|><|MASKED id="m_2"|><|/MASKED|>'
+        )
+
+    parser = StreamingResponseParser()
+    parser.feed(f'<|MASKED id="m_0"|>a{QUERY_PREFIX}b')
+    with pytest.raises(InvalidFormatError, match="Special marks are not allowed"):
+        parser.close()
+
+    # A malformed opening marker is skipped
+    parser = StreamingResponseParser()
+    assert parser.feed("<|MASKED foo|><|MASKED|>x<|/MASKED|>") == [MaskedTag(content="x")]
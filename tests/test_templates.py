@@ -0,0 +1,73 @@
+import pytest
+
+from gimkit.contexts import Query
+from gimkit.dsls import build_cfg, build_json_schema
+from gimkit.exceptions import InvalidFormatError
+from gimkit.guides import guide as g
+from gimkit.schemas import QUERY_PREFIX, QUERY_SUFFIX
+from gimkit.templates import QueryTemplate
+
+
+def test_template_instantiate_matches_query():
+    template = QueryTemplate(
+        "Translate {text} into {lang!r:>8}: ", g(name="out", regex=r"\w+"), " {{done}}"
+    )
+    assert template.fields == ("text", "lang")
+    assert template.tag_names == ("out",)
+
+    query = template.instantiate(text="Hello", lang="French")
+    expected = Query(
+        f"Translate Hello into {'French'!r:>8}: ", g(name="out", regex=r"\w+"), " {done}"
+    )
+    assert query.parts == expected.parts
+    assert str(query) == str(expected)
+    assert str(query).startswith(QUERY_PREFIX)
+    assert str(query).endswith(QUERY_SUFFIX)
+    assert query.tags["out"].id == 0
+
+
+def test_template_prefill_tags():
+    template = QueryTemplate("Name: ", g(name="name"), ", age: ", g(name="age"))
+    query = template.instantiate(name="Alice")
+    assert query.tags["name"].content == "Alice"
+    assert query.tags["age"].content is None
+    assert template.instantiate(name="").tags["name"].content is None
+
+    # Instances never share tag objects with each other or the template
+    query.tags["name"].content = "Bob"
+    assert template.instantiate().tags["name"].content is None
+    assert template.tags[0].content is None
+
+
+def test_template_shared_grammar():
+    template = QueryTemplate("{a} ", g(name="x", regex=r"\d+"), " {b} ", g(desc="word"))
+    query = template.instantiate(a="one", b="two")
+    assert template.cfg == build_cfg(query)
+    assert template.json_schema == build_json_schema(query)
+    assert template.cfg is template.cfg
+
+
+def test_template_invalid():
+    template = QueryTemplate("Hello {who}", g(name="x"))
+    with pytest.raises(KeyError, match="who"):
+        template.instantiate()
+    with pytest.raises(TypeError, match="Unexpected template values: y"):
+        template.instantiate(who="you", y="1")
+    with pytest.raises(TypeError, match="should be str"):
+        template.instantiate(who="you", x=1)
+    with pytest.raises(InvalidFormatError, match="special marks"):
+        template.instantiate(who="<|MASKED|>")
+    with pytest.raises(InvalidFormatError, match="special marks"):
+        template.instantiate(who="you", x="a<|/MASKED|>")
+    # A mark split between the literal and the value is rejected too
+    with pytest.raises(InvalidFormatError, match="'who' should not contain or form special marks"):
+        QueryTemplate("Hello <{who}").instantiate(who="|MASKED|>")
+    with pytest.raises(InvalidFormatError, match="special marks"):
+        QueryTemplate("{a}{b}").instantiate(a="<|/MAS", b="KED|>")
+
+    with pytest.raises(ValueError, match="both as text fields and as tag names"):
+        QueryTemplate("{x}", g(name="x"))
+    with pytest.raises(ValueError, match="plain identifiers"):
+        QueryTemplate("{0}", g(name="x"))
+    with pytest.raises(InvalidFormatError):
+        QueryTemplate("Hello", g(name="x"), g(name="x"))